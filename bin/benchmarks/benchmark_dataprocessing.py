@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+'''
+The script benchmarks bin/dataprocessing.py: the row by row date
+derivation with the python parser (previous implementation) is compared
+with the vectorized one with the C parser (process_csvfile).
+If no csv file is provided, a synthetic OWID-shaped one is generated.
+'''
+from bin.dataprocessing import (process_csvfile, convert_to_datetime,
+                                get_years, get_semester)
+from bin.benchmarks.synthetic_data import generate_owid_frame
+from pandas.testing import assert_frame_equal
+import pandas as pd
+import argparse
+import os
+import tempfile
+import time
+
+
+def process_csvfile_rowwise(filename):
+    '''Previous implementation of process_csvfile, kept as reference.
+
+    Args:
+        filename (str): the path to the csv file
+
+    Returns:
+        pd.DataFrame'''
+    df = pd.read_csv(filename, engine='python')
+    df.date = df.date.apply(convert_to_datetime)
+    df['year'] = df.date.apply(get_years)
+    df['month'] = df.date.dt.to_period('M')
+    df['semester'] = df.date.apply(get_semester)
+    return df
+
+
+def best_time(function, filename, repeat):
+    '''The function returns the best wall time over repeat runs
+    of function(filename) together with the last result.'''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(filename)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(csvfile, n_countries, n_days, repeat):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if csvfile is None:
+            csvfile = os.path.join(tmpdir, 'owid-covid-data.csv')
+            generate_owid_frame(n_countries, n_days).to_csv(csvfile,
+                                                            index=False)
+        t_rowwise, expected = best_time(process_csvfile_rowwise,
+                                        csvfile, repeat)
+        t_vectorized, actual = best_time(process_csvfile, csvfile, repeat)
+    assert_frame_equal(expected, actual)
+    print(f'rows: {len(actual)}')
+    print(f'row by row (python parser): {t_rowwise:.3f} s')
+    print(f'vectorized (C parser):      {t_vectorized:.3f} s')
+    print(f'speedup: {t_rowwise / t_vectorized:.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the general processing of the dataset')
+    parser.add_argument('-i', '--csvfile', type=str, default=None,
+                        help='raw csv file, if missing a synthetic \
+                            one is generated')
+    parser.add_argument('--countries', type=int, default=250,
+                        help='number of locations of the synthetic data')
+    parser.add_argument('--days', type=int, default=1500,
+                        help='number of days of the synthetic data')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timed runs per implementation')
+    args = parser.parse_args()
+    main(args.csvfile, args.countries, args.days, args.repeat)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+'''
+The script runs the micro-benchmarks of the components of the workflows
+on a seeded synthetic OWID-shaped dataset (countries x days x metrics),
+so that no download of the real dataset is needed.
+For each benchmark it reports the best wall time, the throughput (input
+rows per second) and the peak memory allocated during one run (traced
+with tracemalloc, in a separate run so that the timings are not
+affected).
+The results can be saved as a baseline and later runs compared with it:
+a benchmark slower or using more memory than the baseline by more than
+the tolerance is reported as a regression (exit status 1).
+'''
+from bin.benchmarks.synthetic_data import generate_owid_frame
+from bin.dataprocessing import process_csvfile
+from bin.snapshot import snapshot_tables
+from bin.window_metrics import window_metrics
+from bin.io_utils import write_processed
+from bin.workflow_1.dataprocessing_w1 import (process_csvfile_w1, sweep_w1,
+                                              create_categorical_variable)
+from bin.workflow_1.mann_whitney_u_w1 import (mann_whitney_u_test,
+                                              mann_whitney_u_batch)
+from bin.workflow_1.box_plot_w1 import draw_boxplot
+from bin.workflow_1.line_plot_w1 import draw_lineplot
+from bin.workflow_2.dataprocessing_w2 import process_csvfile_w2, aggregate_w2
+from bin.workflow_2.barplotdeathscases_w2 import barplot_by_continent
+from bin.workflow_3.dataprocessing_w3 import (process_csvfile_w3,
+                                              process_places_w3)
+from bin.workflow_3.correlationtest_w3 import (correlation_hptest,
+                                               spearman_matrix,
+                                               correlation_by_location)
+from bin.workflow_3.lagscan_w3 import lag_scan
+from bin.workflow_3.regressionplot_w3 import reg_plot
+from bin.workflow_3.trendplot_w3 import plot_trends
+import pandas as pd
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+LOGGER = logging.getLogger(__name__)
+COLUMNS = ['rows', 'time_s', 'rows_per_s', 'peak_mb']
+
+
+def prepare_inputs(tmpdir, n_countries, n_days, n_metrics, seed):
+    '''The function generates the synthetic raw dataset and the
+    intermediate datasets used as inputs by the benchmarks.
+
+    Args:
+        tmpdir (str): directory for the files
+        n_countries (int): number of locations
+        n_days (int): number of days per location
+        n_metrics (int): number of additional metric columns
+        seed (int): seed of the random generator
+
+    Returns:
+        dict: paths and dataframes'''
+    raw_csv = os.path.join(tmpdir, 'owid-covid-data.csv')
+    generate_owid_frame(n_countries, n_days, seed, n_metrics).to_csv(
+        raw_csv, index=False)
+    processed = process_csvfile(raw_csv)
+    processed_csv = os.path.join(tmpdir, 'owid-covid-data_processed.csv')
+    write_processed(processed, processed_csv)
+    year = int(processed['year'].min()) + 1
+    df_w1 = process_csvfile_w1(processed, 'median_age', year, 'Europe')
+    return {
+        'raw_csv': raw_csv,
+        'processed_csv': processed_csv,
+        'processed': processed,
+        'processed_rows': len(processed),
+        'year': year,
+        'w1': df_w1.reset_index(),
+        'w1_collapsed': df_w1.drop(columns='median_age_cat'),
+        'w1_sweep': sweep_w1(processed),
+        'snapshot_month': snapshot_tables(processed)['month'],
+        'w2': process_csvfile_w2(processed, False).reset_index(),
+        'w3': process_csvfile_w3(processed, 'month').reset_index(),
+        'outfile': os.path.join(tmpdir, 'mannwhitneyu.txt'),
+        'plot': os.path.join(tmpdir, 'plot.png'),
+    }
+
+
+def get_benchmarks(inputs):
+    '''The function returns the benchmarks on inputs
+    (see prepare_inputs) as {name: (input rows, function)}.
+
+    Args:
+        inputs (dict): inputs of the benchmarks
+
+    Returns:
+        dict'''
+    import matplotlib.pyplot as plt
+
+    def plot(draw):
+        # save and close the figure, as the workflows do
+        def run():
+            draw()
+            plt.savefig(inputs['plot'])
+            plt.close('all')
+        return run
+
+    w1, w2, w3 = inputs['w1'], inputs['w2'], inputs['w3']
+    n_processed = inputs['processed_rows']
+    return {
+        'process_csvfile': (
+            n_processed, lambda: process_csvfile(inputs['raw_csv'])),
+        'process_csvfile_w1': (
+            n_processed, lambda: process_csvfile_w1(
+                inputs['processed_csv'], 'median_age', inputs['year'],
+                'Europe')),
+        'snapshot_tables': (
+            n_processed, lambda: snapshot_tables(inputs['processed'])),
+        'window_metrics': (
+            n_processed, lambda: window_metrics(
+                inputs['processed'], ['new_cases', 'new_deaths'])),
+        'process_csvfile_w1_snapshot': (
+            len(inputs['snapshot_month']), lambda: process_csvfile_w1(
+                inputs['snapshot_month'], 'median_age', inputs['year'],
+                'Europe', snapshot=True)),
+        'process_csvfile_w2': (
+            n_processed, lambda: process_csvfile_w2(
+                inputs['processed_csv'], False)),
+        'aggregate_w2': (
+            n_processed, lambda: aggregate_w2(inputs['processed_csv'])),
+        'process_csvfile_w3': (
+            n_processed, lambda: process_csvfile_w3(
+                inputs['processed_csv'], 'month')),
+        'process_places_w3': (
+            n_processed, lambda: process_places_w3(
+                inputs['processed_csv'], 'month')),
+        'create_categorical_variable': (
+            len(w1), lambda: create_categorical_variable(
+                inputs['w1_collapsed'].copy(), 'median_age')),
+        'mann_whitney_u_test': (
+            len(w1), lambda: mann_whitney_u_test(
+                w1, 'median_age_cat', 'new_cases', inputs['outfile'],
+                LOGGER)),
+        'mann_whitney_u_batch': (
+            len(inputs['w1_sweep']), lambda: mann_whitney_u_batch(
+                inputs['w1_sweep'], ['continent', 'year', 'factor'], 'cat',
+                ['new_cases', 'new_deaths'])),
+        'correlation_hptest': (
+            len(w3), lambda: correlation_hptest(
+                w3['new_vaccinations'], w3['deaths_over_cases'])),
+        'correlation_by_location': (
+            n_processed, lambda: correlation_by_location(
+                inputs['processed'], 'new_cases', 'new_deaths', 0.85, 0.0)),
+        'lag_scan': (
+            len(w3), lambda: lag_scan(w3, 'month')),
+        'spearman_matrix': (
+            len(w3), lambda: spearman_matrix(
+                w3, ['new_deaths', 'new_cases', 'new_vaccinations',
+                     'deaths_over_cases'])),
+        'draw_boxplot': (
+            len(w1), plot(lambda: draw_boxplot(
+                w1, 'median_age_cat', 'new_cases', inputs['plot']))),
+        'draw_lineplot': (
+            len(w1), plot(lambda: draw_lineplot(
+                w1, 'median_age_cat', 'month', 'new_cases',
+                inputs['plot']))),
+        'barplot_by_continent': (
+            len(w2), plot(lambda: barplot_by_continent(
+                w2, 'total_cases', inputs['year']))),
+        'reg_plot': (
+            len(w3), plot(lambda: reg_plot(
+                'new_vaccinations', 'deaths_over_cases', w3, 'OLS'))),
+        'plot_trends': (
+            len(w3), plot(lambda: plot_trends(
+                w3['new_deaths'], w3['new_cases'], w3['month']))),
+    }
+
+
+def measure(function, repeat):
+    '''The function returns the best wall time over repeat runs of
+    function and the peak memory (MB) traced during one more run.
+
+    Args:
+        function (callable): benchmark
+        repeat (int): number of timed runs
+
+    Returns:
+        tuple: (time in s, peak memory in MB)'''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak / 2**20
+
+
+def run_benchmarks(n_countries=50, n_days=365, n_metrics=0, seed=0,
+                   repeat=3, names=None):
+    '''The function runs the benchmarks on a synthetic dataset.
+
+    Args:
+        n_countries (int): number of locations
+        n_days (int): number of days per location
+        n_metrics (int): number of additional metric columns
+        seed (int): seed of the random generator
+        repeat (int): number of timed runs per benchmark
+        names (list, optional): benchmarks to run. Defaults to all.
+
+    Returns:
+        pd.DataFrame: one row per benchmark with rows, time_s,
+                      rows_per_s and peak_mb'''
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        inputs = prepare_inputs(tmpdir, n_countries, n_days, n_metrics,
+                                seed)
+        for name, (rows, function) in get_benchmarks(inputs).items():
+            if names and name not in names:
+                continue
+            elapsed, peak = measure(function, repeat)
+            results[name] = [rows, elapsed, rows / elapsed, peak]
+    report = pd.DataFrame.from_dict(results, orient='index',
+                                    columns=COLUMNS)
+    report.index.name = 'benchmark'
+    return report
+
+
+def compare_to_baseline(report, baseline, tolerance=0.25):
+    '''The function compares the results of run_benchmarks with a
+    baseline (same format) and returns the regressions: the benchmarks
+    whose time or peak memory exceed the baseline by more than
+    tolerance (relative).
+
+    Args:
+        report (pd.DataFrame): results
+        baseline (pd.DataFrame): baseline results
+        tolerance (float): allowed relative increase
+
+    Returns:
+        pd.DataFrame: time and peak memory ratios (report / baseline)
+                      of the regressions'''
+    common = report.index.intersection(baseline.index)
+    ratios = pd.DataFrame({
+        'time_ratio': report.loc[common, 'time_s']
+        / baseline.loc[common, 'time_s'],
+        'peak_ratio': report.loc[common, 'peak_mb']
+        / baseline.loc[common, 'peak_mb'],
+    })
+    return ratios[(ratios > 1 + tolerance).any(axis=1)]
+
+
+def save_report(report, filename, scale):
+    '''The function saves report and the scale of the data
+    it was measured on (json).'''
+    with open(filename, 'w') as output:
+        json.dump({'scale': scale,
+                   'results': report.to_dict(orient='index')},
+                  output, indent=2)
+
+
+def load_report(filename):
+    '''The function loads a report saved by save_report.
+
+    Returns:
+        tuple: (report as pd.DataFrame, scale as dict)'''
+    with open(filename) as saved:
+        content = json.load(saved)
+    report = pd.DataFrame.from_dict(content['results'], orient='index')
+    report.index.name = 'benchmark'
+    return report[COLUMNS], content['scale']
+
+
+def main(n_countries, n_days, n_metrics, seed, repeat, names=None,
+         outfile=None, baseline=None, tolerance=0.25):
+    scale = {'countries': n_countries, 'days': n_days,
+             'metrics': n_metrics, 'seed': seed}
+    report = run_benchmarks(n_countries, n_days, n_metrics, seed, repeat,
+                            names)
+    print(report.to_string(float_format=lambda value: f'{value:.4g}'))
+    if outfile is not None:
+        save_report(report, outfile, scale)
+    if baseline is None:
+        return 0
+    baseline_report, baseline_scale = load_report(baseline)
+    if baseline_scale != scale:
+        print(f'Warning: the baseline was measured on {baseline_scale}')
+    regressions = compare_to_baseline(report, baseline_report, tolerance)
+    if regressions.empty:
+        print(f'No regressions w.r.t. {baseline}')
+        return 0
+    print(f'Regressions w.r.t. {baseline} (tolerance {tolerance:.0%}):')
+    print(regressions.to_string(float_format=lambda value: f'{value:.2f}'))
+    return 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmarks of the components of the workflows \
+            on synthetic data')
+    parser.add_argument('--countries', type=int, default=100,
+                        help='number of locations of the synthetic data')
+    parser.add_argument('--days', type=int, default=1200,
+                        help='number of days of the synthetic data')
+    parser.add_argument('--metrics', type=int, default=0,
+                        help='number of additional metric columns')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the random generator')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timed runs per benchmark')
+    parser.add_argument('-b', '--benchmarks', type=str, nargs='+',
+                        default=None, help='benchmarks to run (all if \
+                            not given)')
+    parser.add_argument('-o', '--outfile', type=str, default=None,
+                        help='json file to save the results (baseline)')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='json file of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative increase of time or peak memory \
+                            reported as a regression')
+    args = parser.parse_args()
+    sys.exit(main(args.countries, args.days, args.metrics, args.seed,
+                  args.repeat, args.benchmarks, args.outfile,
+                  args.baseline, args.tolerance))
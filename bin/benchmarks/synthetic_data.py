@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+'''
+The script generates a synthetic dataset with the same layout as the
+raw covid-19 dataset (owid-covid-data.csv). It is used to benchmark the
+processing components without downloading the real dataset.
+'''
+import pandas as pd
+import numpy as np
+import argparse
+
+
+CONTINENTS = ['Europe', 'Asia', 'Africa',
+              'North America', 'Oceania', 'South America']
+START_DATE = '2020-01-01'
+
+
+def generate_owid_frame(n_countries=50, n_days=365, seed=0, n_metrics=0):
+    '''The function generates an OWID-shaped dataframe with
+    n_countries locations observed daily for n_days days.
+    Rows are ordered by location and date, as in the raw dataset.
+    The real dataset has about 60 metrics: n_metrics additional float
+    columns (metric_000, ...) can be added to reach its width.
+
+    Args:
+        n_countries (int): number of locations
+        n_days (int): number of consecutive days per location
+        seed (int): seed of the random generator
+        n_metrics (int): number of additional metric columns
+
+    Returns:
+        pd.DataFrame'''
+    rng = np.random.default_rng(seed)
+    n_rows = n_countries * n_days
+    locations = np.array([f'Country {i:03d}' for i in range(n_countries)])
+    continents = np.array(CONTINENTS)[np.arange(n_countries) % len(CONTINENTS)]
+    dates = pd.date_range(START_DATE, periods=n_days, freq='D')
+    new_cases = rng.poisson(500, n_rows).astype(float)
+    new_deaths = rng.poisson(5, n_rows).astype(float)
+    df = pd.DataFrame({
+        'iso_code': np.repeat([f'C{i:03d}' for i in range(n_countries)],
+                              n_days),
+        'continent': np.repeat(continents, n_days),
+        'location': np.repeat(locations, n_days),
+        'date': np.tile(dates.strftime('%Y-%m-%d'), n_countries),
+        'total_cases': new_cases.reshape(n_countries, n_days)
+                                .cumsum(axis=1).ravel(),
+        'new_cases': new_cases,
+        'total_deaths': new_deaths.reshape(n_countries, n_days)
+                                  .cumsum(axis=1).ravel(),
+        'new_deaths': new_deaths,
+        'new_vaccinations': rng.poisson(2000, n_rows).astype(float),
+        'tests_units': 'tests performed',
+    })
+    # static country factors
+    for column, scale in [('population_density', 300.0),
+                          ('median_age', 45.0),
+                          ('gdp_per_capita', 60000.0),
+                          ('life_expectancy', 85.0)]:
+        values = np.round(rng.uniform(0.3, 1.0, n_countries) * scale, 3)
+        df[column] = np.repeat(values, n_days)
+    population = rng.integers(10**5, 10**8, n_countries).astype(float)
+    df['population'] = np.repeat(population, n_days)
+    for i in range(n_metrics):
+        values = np.round(rng.gamma(2.0, 50.0, n_rows), 3)
+        values[rng.random(n_rows) < 0.3] = np.nan
+        df[f'metric_{i:03d}'] = values
+    # missing values, as in the real dataset
+    for column in ['new_cases', 'new_deaths', 'new_vaccinations']:
+        df.loc[rng.random(n_rows) < 0.05, column] = np.nan
+    return df
+
+
+def main(outfile: str, n_countries: int, n_days: int, seed: int,
+         n_metrics=0):
+    if (outfile[-3:] != 'csv'):
+        raise OSError('Provide a csv file')
+    df = generate_owid_frame(n_countries, n_days, seed, n_metrics)
+    df.to_csv(outfile, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='The file generates a synthetic OWID-shaped csv file')
+    parser.add_argument('-o', '--outfile', required=True,
+                        type=str, help='output csv file name')
+    parser.add_argument('--countries', type=int, default=50,
+                        help='number of locations')
+    parser.add_argument('--days', type=int, default=365,
+                        help='number of days per location')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the random generator')
+    parser.add_argument('--metrics', type=int, default=0,
+                        help='number of additional metric columns')
+    args = parser.parse_args()
+    main(args.outfile, args.countries, args.days, args.seed, args.metrics)
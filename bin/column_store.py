@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+The file provides an on-disk column store for the processed datasets:
+a directory (extension .npy) with one NumPy array per column and a
+small schema (schema.json). The columns are opened as memory maps, so
+that only the pages actually used are read, without copies, and the
+pages are shared by the processes reading the same store.
+The layout follows the columnar schema of io_utils:
+    - numeric columns (metrics, year, semester) as <column>.npy
+    - integer codes for the months as <column>.npy
+    - categorical strings (location, continent, ...) as integer codes
+      <column>.npy, the categories are listed in the schema
+    - dates as datetime64 in date.npy.
+The schema also indexes the rows of each location when they are
+contiguous (as in the OWID dataset), see location_slices.
+"""
+from bin.io_utils import (to_columnar, from_columnar, apply_filters,
+                          clear_dataset)
+import pandas as pd
+import numpy as np
+import json
+import os
+
+
+SCHEMA_FILE = 'schema.json'
+
+
+def get_location_index(location):
+    """Helper function for write_column_store.
+    The function returns the (start, stop) rows of each location
+    if the rows of every location are contiguous, otherwise None.
+
+    Args:
+        location (pd.Series): location column
+
+    Returns:
+        dict or None
+    """
+    codes, names = pd.factorize(location)
+    if len(codes) == 0 or (codes < 0).any():
+        return None
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    if len(starts) != len(names):
+        # a location appears in more than one block of rows
+        return None
+    stops = np.append(starts[1:], len(codes))
+    return {names[code]: [int(start), int(stop)]
+            for code, start, stop in zip(codes[starts], starts, stops)}
+
+
+def write_column_store(df, path):
+    """The function writes df as a column store in the directory path
+    (a previous store in path is replaced).
+
+    Args:
+        df (pd.DataFrame): processed dataframe
+        path (str): path of the store (extension .npy)
+
+    Returns:
+        None.
+    """
+    clear_dataset(path)
+    os.makedirs(path)
+    df = to_columnar(df)
+    columns = []
+    for column in df.columns:
+        col = df[column]
+        entry = {'name': column}
+        if column == 'date':
+            values = pd.to_datetime(col).to_numpy(dtype='datetime64[ns]')
+        elif isinstance(col.dtype, pd.CategoricalDtype):
+            values = col.cat.codes.to_numpy(dtype='int32')
+            entry['categories'] = col.cat.categories.tolist()
+        elif col.dtype == object:
+            col = col.astype('category')
+            values = col.cat.codes.to_numpy(dtype='int32')
+            entry['categories'] = col.cat.categories.tolist()
+        else:
+            values = col.to_numpy()
+        np.save(os.path.join(path, f'{column}.npy'), values)
+        columns.append(entry)
+    schema = {'n_rows': len(df), 'columns': columns,
+              'locations': (get_location_index(df['location'])
+                            if 'location' in df.columns else None)}
+    with open(os.path.join(path, SCHEMA_FILE), 'w') as output:
+        json.dump(schema, output)
+
+
+def read_schema(path):
+    """The function reads the schema of the column store in path.
+
+    Args:
+        path (str): path of the store
+
+    Returns:
+        dict: with keys n_rows, columns and locations
+    """
+    with open(os.path.join(path, SCHEMA_FILE)) as schema:
+        return json.load(schema)
+
+
+def open_columns(path, columns=None):
+    """The function opens columns of the store as read-only
+    memory maps (no data is read until the arrays are used).
+    Categorical columns are returned as their integer codes.
+
+    Args:
+        path (str): path of the store
+        columns (list, optional): columns to open. Defaults to all.
+
+    Returns:
+        dict: column name -> np.memmap
+    """
+    if columns is None:
+        columns = [entry['name'] for entry in read_schema(path)['columns']]
+    return {column: np.load(os.path.join(path, f'{column}.npy'),
+                            mmap_mode='r')
+            for column in columns}
+
+
+def location_slices(path):
+    """The function returns the rows of each location of the store,
+    so that the columns of one location are a contiguous view.
+
+    Args:
+        path (str): path of the store
+
+    Raises:
+        ValueError: when the rows of the locations are not contiguous
+
+    Returns:
+        dict: location -> slice
+    """
+    locations = read_schema(path)['locations']
+    if locations is None:
+        raise ValueError('The rows of the locations are not contiguous')
+    return {location: slice(start, stop)
+            for location, (start, stop) in locations.items()}
+
+
+def read_column_store(path, columns=None, filters=None):
+    """The function reads the column store as a dataframe, backed by
+    the memory maps where possible (numeric and date columns).
+    Only the rows satisfying filters are copied.
+
+    Args:
+        path (str): path of the store
+        columns (list, optional): columns to load, in the order of the
+                                  store. Defaults to all.
+        filters (list, optional): tuples (column, operator, value)
+
+    Returns:
+        pd.DataFrame
+    """
+    schema = read_schema(path)
+    if columns is None:
+        columns = [entry['name'] for entry in schema['columns']]
+    needed = columns + [column for column, _, _ in filters or []
+                        if column not in columns]
+    arrays = open_columns(path, needed)
+    data = {}
+    for entry in schema['columns']:
+        column = entry['name']
+        if column not in arrays:
+            continue
+        if 'categories' in entry:
+            data[column] = pd.Categorical.from_codes(
+                arrays[column], categories=entry['categories'])
+        else:
+            data[column] = arrays[column]
+    df = pd.DataFrame(data, copy=False)
+    if filters:
+        df = apply_filters(df, filters)[columns]
+    return from_columnar(df)
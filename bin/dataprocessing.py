@@ -2,17 +2,35 @@
 '''
 The script performs a general processing of the input dataset (covid-19 dataset).
 In particular, new time columns are created.
+The processed dataset is saved either as csv or in the typed
+columnar format (parquet), according to the extension of the outfile.
+Inputs larger than the memory can be streamed chunk by chunk (--chunksize).
+The parquet output can be partitioned by continent and year (--partition).
+The processed dataframe can use a compact dtype schema (--compact).
+A new release of the input dataset can be processed incrementally
+against the previous processed output (--previous).
+The end-of-period snapshots (by month, semester and year) can be saved
+along with the processed dataset (--snapshot).
+Rolling-window, cumulative and per-million metrics of each location can
+be added as extra columns (--window_metrics).
 '''
-
+from bin.memory_utils import compact_dtypes, memory_report
+from bin.io_utils import (read_processed, write_processed,
+                          write_processed_chunks, is_supported,
+                          PARTITION_COLUMNS)
+from bin.snapshot import snapshot_tables, snapshot_file
+from bin.window_metrics import add_window_metrics, DEFAULT_WINDOW
 import pandas as pd
+import numpy as np
 import argparse
 import datetime
 import logging
 
-# set logging
-logging.basicConfig(filename='../logs/dataprocessing.log', filemode='w')
+
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
+KEY_COLUMNS = ['location', 'date']
+TIME_COLUMNS = ['year', 'month', 'semester']
 
 
 def convert_to_datetime(date, format='%Y-%m-%d'):
@@ -42,36 +60,248 @@ def get_semester(date):
     return unique_semester
 
 
-def process_csvfile(filename):
+def derive_time_columns(df):
+    '''Helper function for process_csvfile.
+    Vectorized counterpart of convert_to_datetime, get_years and
+    get_semester: the date column is parsed and the year, month and
+    semester columns are derived as whole-column operations.
+
+    Args:
+        df (pd.DataFrame): dataframe with a string date column
+
+    Returns:
+        pd.DataFrame: df with the additional time columns'''
+    df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d')
+    df['year'] = df['date'].dt.year.astype('int64')
+    df['month'] = df['date'].dt.to_period('M')
+    semester = np.where(df['date'].dt.month <= 6, 1, 2)
+    df['semester'] = (df['year'] - 2020) * 2 + semester
+    return df
+
+
+def merge_dtypes(dtypes):
+    '''Helper function for get_raw_dtypes.
+    The function returns the dtype of a column of the whole file from
+    its dtypes in the chunks, as inferred by pd.read_csv: integers with
+    missing values (chunks of NaN) are float64, any other mix is object.
+
+    Args:
+        dtypes (set): dtypes of the column in the chunks
+
+    Returns:
+        np.dtype or str'''
+    if len(dtypes) == 1:
+        return next(iter(dtypes))
+    if all(pd.api.types.is_integer_dtype(dtype)
+           or pd.api.types.is_float_dtype(dtype) for dtype in dtypes):
+        return 'float64'
+    return 'object'
+
+
+def get_raw_dtypes(filename, chunksize):
+    '''Helper function for process_csvfile_chunks.
+    The function returns the dtypes of the raw columns inferred from the
+    whole file, as process_csvfile does, reading chunksize rows at a
+    time: all the chunks of a streamed file are then parsed with the
+    dtypes of the in-memory processing (e.g. a column of integers is
+    float64 if any chunk has missing values).
+
+    Args:
+        filename (str): the path to the csv file
+        chunksize (int): number of rows per chunk
+
+    Returns:
+        dict: column name -> dtype'''
+    found = {}
+    reader = pd.read_csv(filename, chunksize=chunksize, low_memory=False)
+    with reader:
+        for chunk in reader:
+            for column, dtype in chunk.dtypes.items():
+                found.setdefault(column, set()).add(dtype)
+    return {column: merge_dtypes(dtypes) for column, dtypes in found.items()}
+
+
+def check_csvfile(filename):
+    '''Helper function for process_csvfile and process_csvfile_chunks.
+
+    Args:
+        filename (str): the path to the csv file
+
+    Raises:
+        OSError: error when file is  not a csv'''
+    if (filename is None or filename[-3:] != 'csv'):
+        message = 'Provide a csv file'
+        LOGGER.exception(message)
+        raise OSError(message)
+
+
+def process_csvfile(filename, compact=False):
     '''
     Args:
        filename (str): the path to the csv file
+       compact (bool): if True the compact dtype schema is used
 
     Raises:
         OSError: error when file is  not a csv
 
     Returns:
        pd.DataFrame'''
-    if (filename is None or filename[-3:] != 'csv'):
-        message = 'Provide a csv file'
-        LOGGER.exception(message)
-        raise OSError(message)
-    df = pd.read_csv(filename, engine='python')
+    check_csvfile(filename)
+    # the C parser infers the same dtypes as the python one when it
+    # reads the whole file at once (low_memory=False)
+    df = pd.read_csv(filename, low_memory=False)
     LOGGER.debug('converting date to datetime')
-    df.date = df.date.apply(convert_to_datetime)
     # create uniquely identified month, year and semester columns
-    df['year'] = df.date.apply(get_years)
-    df['month'] = df.date.dt.to_period('M')
-    df['semester'] = df.date.apply(get_semester)
+    df = derive_time_columns(df)
+    if compact:
+        df = compact_dtypes(df)
     LOGGER.debug(f'final processed dataset: {df.head()}')
     return df
 
 
-def main(csvfile: str, outfile: str):
+def process_csvfile_chunks(filename, chunksize, compact=False):
+    '''Streaming counterpart of process_csvfile: the file is read
+    and processed chunksize rows at a time, so that only one chunk
+    is held in memory. Concatenating the chunks gives the output
+    of process_csvfile: the file is read twice, first to infer the
+    dtypes of the whole file (see get_raw_dtypes).
+
+    Args:
+       filename (str): the path to the csv file
+       chunksize (int): number of rows per chunk
+       compact (bool): if True the compact dtype schema is used
+
+    Raises:
+        OSError: error when file is  not a csv
+
+    Yields:
+       pd.DataFrame: processed chunk'''
+    check_csvfile(filename)
+    reader = pd.read_csv(filename,
+                         dtype=get_raw_dtypes(filename, chunksize),
+                         chunksize=chunksize, low_memory=False)
+    with reader:
+        for i, chunk in enumerate(reader):
+            LOGGER.debug(f'processing chunk {i}')
+            chunk = derive_time_columns(chunk)
+            yield compact_dtypes(chunk) if compact else chunk
+
+
+def restore_processed(previous, raw_dtypes):
+    '''Helper function for process_csvfile_incremental.
+    The function casts a processed dataset read back from csv or parquet
+    to the columns and dtypes returned by process_csvfile.
+
+    Args:
+        previous (pd.DataFrame): processed dataset
+        raw_dtypes (dict): dtypes of the raw columns
+
+    Returns:
+        pd.DataFrame'''
+    previous = previous[list(raw_dtypes) + TIME_COLUMNS]
+    previous = previous.astype({column: dtype
+                                for column, dtype in raw_dtypes.items()
+                                if column != 'date'})
+    previous['date'] = pd.to_datetime(previous['date'], format='%Y-%m-%d')
+    previous = previous.astype({'year': 'int64', 'semester': 'int64'})
+    if not isinstance(previous['month'].dtype, pd.PeriodDtype):
+        previous['month'] = pd.PeriodIndex(previous['month'], freq='M')
+    return previous
+
+
+def process_csvfile_incremental(filename, previous_file):
+    '''Incremental counterpart of process_csvfile for a new release of
+    the raw dataset. The (location, date) rows that are new or whose
+    values changed w.r.t. the previously processed output are processed,
+    the others are taken from previous_file, rows no longer in the
+    release are dropped. The result is the same as process_csvfile.
+
+    Args:
+       filename (str): the path to the csv file (new release)
+       previous_file (str): the path to the processed output
+                            of the previous release (csv or parquet)
+
+    Raises:
+        OSError: error when file is  not a csv
+
+    Returns:
+       pd.DataFrame'''
+    check_csvfile(filename)
+    raw = pd.read_csv(filename, low_memory=False)
+    raw_dtypes = raw.dtypes.to_dict()
+    previous = read_processed(previous_file)
+    if not set(raw_dtypes).union(TIME_COLUMNS).issubset(previous.columns):
+        LOGGER.info('Columns changed: processing the whole dataset')
+        return derive_time_columns(raw)
+    previous = restore_processed(previous, raw_dtypes)
+    # match the rows of the release with the previous ones by key,
+    # then compare the hashes of their raw values
+    dates = pd.to_datetime(raw['date'], format='%Y-%m-%d')
+    new_hash = pd.util.hash_pandas_object(raw.assign(date=dates),
+                                          index=False).to_numpy()
+    old_hash = pd.util.hash_pandas_object(previous[list(raw_dtypes)],
+                                          index=False).to_numpy()
+    old_keys = previous[KEY_COLUMNS].assign(
+        position=np.arange(len(previous)))
+    position = raw[['location']].assign(date=dates).merge(
+        old_keys, on=KEY_COLUMNS, how='left')['position'].to_numpy()
+    found = ~np.isnan(position)
+    changed = np.ones(len(raw), dtype=bool)
+    changed[found] = (new_hash[found]
+                      != old_hash[position[found].astype(np.int64)])
+    LOGGER.info(f'new or changed rows: {changed.sum()}, '
+                f'removed rows: {len(previous) - found.sum()}')
+    delta = derive_time_columns(raw[changed].copy())
+    kept = previous.iloc[position[~changed].astype(np.int64)]
+    kept.index = raw.index[~changed]
+    df = pd.concat([kept, delta]).sort_index()
+    LOGGER.debug(f'final processed dataset: {df.head()}')
+    return df
+
+
+def main(csvfile: str, outfile: str, chunksize=None, partition=False,
+         compact=False, reportfile=None, previous=None, snapshot=False,
+         metrics=None, window=DEFAULT_WINDOW):
+    if not is_supported(outfile):
+        message = 'Provide a csv or parquet file as outfile'
+        LOGGER.exception(message)
+        raise OSError(message)
+    partition_cols = PARTITION_COLUMNS if partition else None
+    if chunksize and (reportfile is not None or previous is not None
+                      or snapshot or metrics):
+        message = 'The chunked processing does not support memory_report, \
+            previous, snapshot and window_metrics'
+        LOGGER.exception(message)
+        raise ValueError(message)
     LOGGER.info('Started processing')
-    df_processed = process_csvfile(csvfile)
-    LOGGER.info('Saving processed csv')
-    df_processed.to_csv(outfile, index=False)
+    if chunksize:
+        LOGGER.info(f'Streaming chunks of {chunksize} rows to {outfile}')
+        write_processed_chunks(process_csvfile_chunks(csvfile, chunksize,
+                                                      compact),
+                               outfile, partition_cols=partition_cols)
+    else:
+        if previous is not None:
+            LOGGER.info(f'Incremental processing against {previous}')
+            df_processed = process_csvfile_incremental(csvfile, previous)
+        else:
+            df_processed = process_csvfile(csvfile)
+        if metrics:
+            LOGGER.info(f'Adding the window metrics of {metrics}')
+            df_processed = add_window_metrics(df_processed, metrics,
+                                              window=window)
+        if reportfile is not None:
+            LOGGER.info(f'Saving memory report: {reportfile}')
+            memory_report(df_processed).to_csv(reportfile)
+        if compact:
+            df_processed = compact_dtypes(df_processed)
+        LOGGER.info(f'Saving processed dataset: {outfile}')
+        write_processed(df_processed, outfile,
+                        partition_cols=partition_cols)
+        if snapshot:
+            for time, table in snapshot_tables(df_processed).items():
+                LOGGER.info(f'Saving snapshot by {time}')
+                write_processed(table, snapshot_file(outfile, time),
+                                partition_cols=partition_cols)
     LOGGER.info('End')
 
 
@@ -81,6 +311,43 @@ if __name__ == '__main__':
     parser.add_argument('-i', '--csvfile',
                         required=True, type=str, help='csv file name')
     parser.add_argument('-o', '--outfile',
-                        required=True, type=str, help='output file name (csv)')
+                        required=True, type=str,
+                        help='output file name (csv or parquet)')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='if given, the csv file is streamed \
+                            chunksize rows at a time')
+    parser.add_argument('--partition', action='store_true',
+                        help='save a parquet dataset partitioned \
+                            by continent and year')
+    parser.add_argument('--compact', action='store_true',
+                        help='use the compact dtype schema')
+    parser.add_argument('--memory_report', type=str, default=None,
+                        help='csv file name for the per-column memory \
+                            report (not with --chunksize)')
+    parser.add_argument('--previous', type=str, default=None,
+                        help='processed output of the previous release: \
+                            only new or changed rows are processed \
+                            (not with --chunksize)')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='also save the last values of each location \
+                            by month, semester and year \
+                            (<outfile>_snapshot_<time>, not with \
+                            --chunksize)')
+    parser.add_argument('--window_metrics', type=str, nargs='+',
+                        default=None,
+                        help='metrics whose rolling mean, cumulative sum \
+                            and value per million are added as columns \
+                            (not with --chunksize)')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW,
+                        help='length of the rolling window in days')
     args = parser.parse_args()
-    main(args.csvfile, args.outfile)
+    if args.chunksize:
+        for option in ['memory_report', 'previous', 'snapshot',
+                       'window_metrics']:
+            if getattr(args, option):
+                parser.error(f'--{option} is not allowed with --chunksize')
+    # set logging
+    logging.basicConfig(filename='../logs/dataprocessing.log', filemode='w')
+    main(args.csvfile, args.outfile, args.chunksize, args.partition,
+         args.compact, args.memory_report, args.previous, args.snapshot,
+         args.window_metrics, args.window)
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+The file provides the readers and writers for the processed datasets.
+Besides csv, the processed data can be stored in a typed columnar
+format (parquet) with a fixed schema:
+    - categorical strings for location, continent, iso_code, tests_units
+    - integer codes for the time periods (year, semester, month)
+    - float64 for the metrics, float32 metrics (compact dtypes) are
+      kept except in the files written chunk by chunk.
+The format is chosen by the extension of the file name.
+A parquet dataset can also be partitioned (hive-style directories
+continent=.../year=.../) so that readers open only the partitions
+selected by their filters.
+The same schema is used by the memory-mapped column store
+(extension npy, see column_store).
+"""
+import pandas as pd
+import operator
+import os
+import shutil
+
+
+SUPPORTED_FORMATS = ('csv', 'parquet', 'npy')
+CATEGORICAL_COLUMNS = ['iso_code', 'continent', 'location', 'tests_units']
+PERIOD_CODE_COLUMNS = {'month': 'M'}
+INTEGER_COLUMNS = ['year', 'semester']
+PARTITION_COLUMNS = ['continent', 'year']
+FILTER_OPERATORS = {'==': operator.eq, '!=': operator.ne,
+                    '<': operator.lt, '<=': operator.le,
+                    '>': operator.gt, '>=': operator.ge,
+                    'in': lambda col, values: col.isin(values),
+                    'not in': lambda col, values: ~col.isin(values)}
+
+
+def get_format(filename):
+    """The function returns the format of filename
+    according to its extension.
+
+    Args:
+        filename (str): path of the file
+
+    Raises:
+        OSError: when the extension is not supported
+
+    Returns:
+        str: one of SUPPORTED_FORMATS
+    """
+    extension = str(filename).rstrip('/').rsplit('.', 1)[-1]
+    if extension not in SUPPORTED_FORMATS:
+        message = f'Provide a file with extension in {SUPPORTED_FORMATS}'
+        raise OSError(message)
+    return extension
+
+
+def is_supported(filename):
+    """The function returns True if filename has
+    one of the SUPPORTED_FORMATS extensions.
+
+    Args:
+        filename (str): path of the file
+
+    Returns:
+        bool.
+    """
+    try:
+        get_format(filename)
+    except OSError:
+        return False
+    return True
+
+
+def to_columnar(df, keep_float32=True):
+    """The function casts df to the fixed columnar schema.
+    Periods are stored as integer codes (ordinals).
+
+    Args:
+        df (pd.DataFrame): processed dataframe
+        keep_float32 (bool): if False float32 columns are cast to float64
+
+    Returns:
+        pd.DataFrame: df with the columnar dtypes
+    """
+    df = df.copy()
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype('category')
+        elif column in PERIOD_CODE_COLUMNS:
+            if isinstance(df[column].dtype, pd.PeriodDtype):
+                df[column] = df[column].array.asi8.astype('int32')
+        elif column in INTEGER_COLUMNS:
+            df[column] = df[column].astype('int32')
+        elif (pd.api.types.is_float_dtype(df[column])
+              and not (keep_float32 and df[column].dtype == 'float32')):
+            df[column] = df[column].astype('float64')
+    return df
+
+
+def from_columnar(df):
+    """The function decodes the integer period codes of df
+    back into periods.
+
+    Args:
+        df (pd.DataFrame): dataframe read from the columnar format
+
+    Returns:
+        pd.DataFrame
+    """
+    for column, freq in PERIOD_CODE_COLUMNS.items():
+        if (column in df.columns
+                and pd.api.types.is_integer_dtype(df[column])):
+            df[column] = pd.PeriodIndex.from_ordinals(df[column],
+                                                      freq=freq)
+    # partition columns are read back as plain strings
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and df[column].dtype == object:
+            df[column] = df[column].astype('category')
+    # files written chunk by chunk list the categories by appearance
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            categories = df[column].cat.categories.sort_values()
+            df[column] = df[column].cat.reorder_categories(categories)
+    return df
+
+
+def available_columns(filename, columns):
+    """Helper function for read_processed.
+    The function returns the requested columns that are
+    actually stored in filename, in the order of the file
+    (as pd.read_csv does with usecols).
+
+    Args:
+        filename (str): path of the file
+        columns (list): requested columns
+
+    Returns:
+        list
+    """
+    if get_format(filename) == 'csv':
+        stored = pd.read_csv(filename, nrows=0).columns
+    elif get_format(filename) == 'npy':
+        from bin.column_store import read_schema
+        stored = [entry['name'] for entry in read_schema(filename)['columns']]
+    else:
+        import pyarrow.dataset as ds
+        # partition columns are listed after the stored ones
+        stored = ds.dataset(filename, format='parquet',
+                            partitioning=get_partitioning(filename)
+                            ).schema.names
+    return [column for column in stored if column in columns]
+
+
+def get_partitioning(filename):
+    """Helper function for read_processed.
+    The function returns the hive partitioning of a partitioned
+    dataset (None for a single file). The partition columns are typed
+    explicitly: inferred dictionaries cannot be unified when a
+    partition holds missing values (e.g. continent of 'World').
+
+    Args:
+        filename (str): path of the parquet file or dataset
+
+    Returns:
+        pyarrow.dataset.Partitioning or None
+    """
+    if not os.path.isdir(filename):
+        return None
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    fields = [(column, pa.int32() if column in INTEGER_COLUMNS
+               else pa.string())
+              for column in PARTITION_COLUMNS]
+    return ds.partitioning(pa.schema(fields), flavor='hive')
+
+
+def apply_filters(df, filters):
+    """Helper function for read_processed.
+    The function keeps the rows of df satisfying all the filters.
+
+    Args:
+        df (pd.DataFrame): dataframe
+        filters (list): tuples (column, operator, value), with operator
+                        in FILTER_OPERATORS
+
+    Returns:
+        pd.DataFrame
+    """
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        mask &= FILTER_OPERATORS[op](df[column], value)
+    return df[mask]
+
+
+def read_processed(filename, columns=None, filters=None):
+    """The function reads a processed dataset, loading only
+    the requested columns and the rows satisfying filters.
+    On a partitioned parquet dataset, only the partitions selected by
+    the filters are opened. Requested columns missing from the file
+    are skipped, so that callers can report them.
+    A dataset already in memory (e.g. in the pipeline runner) can be
+    passed instead of a path: it is selected the same way.
+
+    Args:
+        filename (str or pd.DataFrame): path of the csv or parquet file
+                                        (or dataset), of the column
+                                        store, or the dataset itself
+        columns (list, optional): columns to load. Defaults to all.
+        filters (list, optional): tuples (column, operator, value),
+                                  e.g. [('year', '==', 2021)].
+
+    Returns:
+        pd.DataFrame
+    """
+    if isinstance(filename, pd.DataFrame):
+        df = filename[[column for column in filename.columns
+                       if columns is None or column in columns]]
+        if filters:
+            df = apply_filters(df, filters)
+        return df.copy()
+    if columns is not None:
+        columns = available_columns(filename, columns)
+    if get_format(filename) == 'csv':
+        df = pd.read_csv(filename, usecols=columns)
+        if filters:
+            df = apply_filters(df, filters)
+        return df
+    if get_format(filename) == 'npy':
+        from bin.column_store import read_column_store
+        return read_column_store(filename, columns, filters)
+    df = pd.read_parquet(filename, columns=columns, filters=filters,
+                         partitioning=get_partitioning(filename))
+    return from_columnar(df)
+
+
+def read_processed_chunks(filename, chunksize, columns=None, filters=None):
+    """The function reads a processed dataset chunksize rows at a time
+    (parquet: at most chunksize rows, batches do not span files), with
+    the columns and filters of read_processed, so that only one chunk
+    is held in memory.
+
+    Args:
+        filename (str or pd.DataFrame): path of the csv or parquet file
+                                        (or dataset), of the column
+                                        store, or the dataset itself
+        chunksize (int): number of rows per chunk
+        columns (list, optional): columns to load. Defaults to all.
+        filters (list, optional): tuples (column, operator, value)
+
+    Yields:
+        pd.DataFrame
+    """
+    if isinstance(filename, pd.DataFrame) or get_format(filename) == 'npy':
+        # the column store is memory-mapped: slices are not copied
+        df = read_processed(filename, columns, filters)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+    if columns is not None:
+        columns = available_columns(filename, columns)
+    if get_format(filename) == 'csv':
+        for chunk in pd.read_csv(filename, usecols=columns,
+                                 chunksize=chunksize):
+            yield apply_filters(chunk, filters) if filters else chunk
+        return
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    dataset = ds.dataset(filename, format='parquet',
+                         partitioning=get_partitioning(filename))
+    expression = pq.filters_to_expression(filters) if filters else None
+    for batch in dataset.to_batches(columns=columns, filter=expression,
+                                    batch_size=chunksize):
+        yield from_columnar(batch.to_pandas())
+
+
+def write_processed(df, outfile, index=False, partition_cols=None):
+    """The function writes a processed dataset in the format
+    given by the extension of outfile.
+
+    Args:
+        df (pd.DataFrame): dataframe to save
+        outfile (str): path of the csv or parquet file,
+                       or of the column store
+        index (bool): if True the index is saved as columns
+        partition_cols (list, optional): if given, outfile is a
+                                         parquet dataset partitioned
+                                         by these columns
+
+    Raises:
+        OSError: when a csv file or a column store is partitioned
+
+    Returns:
+        None.
+    """
+    if partition_cols and get_format(outfile) != 'parquet':
+        raise OSError('Only parquet datasets can be partitioned')
+    if get_format(outfile) == 'csv':
+        df.to_csv(outfile, index=index)
+        return
+    if index:
+        df = df.reset_index()
+    if get_format(outfile) == 'npy':
+        from bin.column_store import write_column_store
+        write_column_store(df, outfile)
+        return
+    if partition_cols:
+        clear_dataset(outfile)
+    to_columnar(df).to_parquet(outfile, index=False,
+                               partition_cols=partition_cols)
+
+
+def clear_dataset(outfile):
+    """Helper function for write_processed and write_processed_chunks.
+    The function removes a previous partitioned dataset in outfile,
+    otherwise new files would be added to the old ones.
+
+    Args:
+        outfile (str): path of the parquet dataset
+
+    Returns:
+        None.
+    """
+    if os.path.isdir(outfile):
+        shutil.rmtree(outfile)
+
+
+def write_processed_chunks(chunks, outfile, partition_cols=None):
+    """The function appends the processed chunks one after the
+    other to outfile, so that only one chunk is held in memory.
+    The schema of the parquet file is given by the first chunk.
+
+    Args:
+        chunks (iterable): processed dataframes with the same columns
+        outfile (str): path of the csv or parquet file
+        partition_cols (list, optional): if given, outfile is a
+                                         parquet dataset partitioned
+                                         by these columns
+
+    Raises:
+        OSError: when a csv file is partitioned or outfile
+                 is a column store
+
+    Returns:
+        None.
+    """
+    if get_format(outfile) == 'npy':
+        raise OSError('A column store cannot be written chunk by chunk')
+    if partition_cols:
+        if get_format(outfile) == 'csv':
+            raise OSError('Only parquet datasets can be partitioned')
+        clear_dataset(outfile)
+        # the float32 downcast of compact_dtypes depends on the values
+        # of each chunk: float64 in all the files
+        for i, chunk in enumerate(chunks):
+            to_columnar(chunk, keep_float32=False).to_parquet(
+                outfile, index=False, partition_cols=partition_cols,
+                basename_template=f'part-{i:06d}-{{i}}.parquet')
+        return
+    if get_format(outfile) == 'csv':
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(outfile, index=False, mode='w' if i == 0 else 'a',
+                         header=(i == 0))
+        return
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for chunk in chunks:
+            # float64: one schema for all the chunks (see above)
+            table = pa.Table.from_pandas(
+                to_columnar(chunk, keep_float32=False), preserve_index=False)
+            if writer is None:
+                # categories differ across chunks: use wide string
+                # dictionaries for every chunk
+                schema = pa.schema(
+                    [field.with_type(pa.dictionary(pa.int32(), pa.string()))
+                     if pa.types.is_dictionary(field.type) else field
+                     for field in table.schema],
+                    metadata=table.schema.metadata)
+                writer = pq.ParquetWriter(outfile, schema)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
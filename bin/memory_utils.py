@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+The file provides a compact dtype schema for the processed datasets
+and a per-column memory report.
+The compact schema uses:
+    - categorical dtype for the repeated strings (location, continent, ...)
+    - float32 for the float columns whose values are exactly
+      representable in float32 (e.g. counts of cases and deaths)
+    - small integer types for year, semester and the _cat flags.
+"""
+from bin.io_utils import CATEGORICAL_COLUMNS
+import pandas as pd
+import numpy as np
+
+
+SMALL_INTEGER_COLUMNS = {'year': 'int16', 'semester': 'int8'}
+
+
+def is_float32_exact(col):
+    """Helper function for compact_dtypes.
+    The function checks whether col can be stored as float32
+    without changing any of its values.
+
+    Args:
+        col (pd.Series): float column
+
+    Returns:
+        bool.
+    """
+    values = col.to_numpy(dtype='float64')
+    with np.errstate(over='ignore'):
+        downcast = values.astype('float32').astype('float64')
+    return bool(np.array_equal(values, downcast, equal_nan=True))
+
+
+def compact_dtypes(df, downcast_floats=True):
+    """The function casts the columns of df to the compact schema.
+    The values are not changed.
+
+    Args:
+        df (pd.DataFrame): processed dataframe
+        downcast_floats (bool): if False the floats are kept as float64,
+                                e.g. when they are summed afterwards
+
+    Returns:
+        pd.DataFrame: df with the compact dtypes
+    """
+    dtypes = {}
+    for column in df.columns:
+        col = df[column]
+        if column in CATEGORICAL_COLUMNS and col.dtype == object:
+            dtypes[column] = 'category'
+        elif column in SMALL_INTEGER_COLUMNS:
+            dtypes[column] = SMALL_INTEGER_COLUMNS[column]
+        elif column.endswith('_cat'):
+            dtypes[column] = 'int8'
+        elif (downcast_floats and col.dtype == 'float64'
+              and is_float32_exact(col)):
+            dtypes[column] = 'float32'
+    return df.astype(dtypes)
+
+
+def memory_report(df):
+    """The function reports the memory used by each column of df,
+    with its current dtype and with the compact one.
+
+    Args:
+        df (pd.DataFrame): processed dataframe
+
+    Returns:
+        pd.DataFrame: one row per column (plus a total row) with
+                      dtype, bytes, compact_dtype, compact_bytes and
+                      saving (fraction of bytes saved)
+    """
+    compact_df = compact_dtypes(df)
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': df.memory_usage(index=False, deep=True),
+        'compact_dtype': compact_df.dtypes.astype(str),
+        'compact_bytes': compact_df.memory_usage(index=False, deep=True),
+    })
+    report.loc['total'] = ['', report['bytes'].sum(),
+                           '', report['compact_bytes'].sum()]
+    report['saving'] = 1 - report['compact_bytes'] / report['bytes']
+    report.index.name = 'column'
+    return report
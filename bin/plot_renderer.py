@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+'''
+The script renders a batch of plots of the workflows across a pool of
+worker processes, instead of one process per plot.
+Each plot is described by a spec (dict) with:
+    - kind: one of the RENDERERS (boxplot, lineplot, barplot, regplot,
+      trendplot)
+    - data: path of the dataset (csv, parquet or npy) or the dataset
+    - output: path of the png file
+    - the parameters of the plot, as the CL options of its component
+      (e.g. group and y_variable for boxplot).
+Each worker uses the Agg backend and sets the plot parameters once;
+every figure is closed after saving, so that the memory does not grow
+with the number of plots.
+'''
+from bin.utils import load_config, set_plot_params
+from bin.io_utils import read_processed
+from bin.workflow_1.box_plot_w1 import draw_boxplot
+from bin.workflow_1.line_plot_w1 import draw_lineplot
+from bin.workflow_2.barplotdeathscases_w2 import barplot_by_continent
+from bin.workflow_3.regressionplot_w3 import reg_plot
+from bin.workflow_3.trendplot_w3 import plot_trends
+import concurrent.futures
+import functools
+import argparse
+import logging
+import os
+
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+PLOT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'configuration_plots.yaml')
+
+
+@functools.lru_cache(maxsize=8)
+def read_cached(filename):
+    '''Helper function for load_data.
+    The function reads a dataset once per worker.'''
+    return read_processed(filename)
+
+
+def load_data(data):
+    '''Helper function for the renderers.
+    The function returns the dataset of a spec.
+
+    Args:
+        data (str or pd.DataFrame): path of the dataset or the dataset
+
+    Returns:
+        pd.DataFrame'''
+    return read_cached(data) if isinstance(data, str) else data
+
+
+def render_boxplot(data, output, group, y_variable, summary=False):
+    '''Helper function for render: box plot of workflow 1
+    (data is the boxes summary if summary is True).'''
+    draw_boxplot(load_data(data), group, y_variable, output, summary)
+
+
+def render_lineplot(data, output, group, x_variable, y_variable,
+                    summary=False):
+    '''Helper function for render: line plot of workflow 1
+    (data is the lines summary if summary is True).'''
+    draw_lineplot(load_data(data), group, x_variable, y_variable, output,
+                  summary)
+
+
+def render_barplot(data, output, outcome, year, normalize=False):
+    '''Helper function for render: bar plot of workflow 2.'''
+    fig = barplot_by_continent(load_data(data), outcome, year, normalize)
+    fig.savefig(output, bbox_inches='tight')
+
+
+def render_regplot(data, output, x, y):
+    '''Helper function for render: regression plot of workflow 3.'''
+    fig = reg_plot(x=x, y=y, data=load_data(data),
+                   title=f'OLS for {x} and {y}')
+    fig.savefig(output)
+
+
+def render_trendplot(data, output, y1, y2, x):
+    '''Helper function for render: trend plot of workflow 3.'''
+    df = load_data(data)
+    fig = plot_trends(df[y1], df[y2], df[x])
+    fig.savefig(output, bbox_inches='tight')
+
+
+RENDERERS = {'boxplot': render_boxplot, 'lineplot': render_lineplot,
+             'barplot': render_barplot, 'regplot': render_regplot,
+             'trendplot': render_trendplot}
+
+
+def init_worker(config_file=PLOT_CONFIG):
+    '''The function prepares a process for rendering: Agg backend
+    and plot parameters of config_file.
+
+    Args:
+        config_file (str): path of the plot configuration file
+
+    Returns:
+        None.'''
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    set_plot_params(config_file)
+
+
+def render(spec):
+    '''The function renders the plot described by spec and closes
+    its figures.
+
+    Args:
+        spec (dict): kind, data, output and parameters of the plot
+
+    Raises:
+        ValueError: when the kind of plot is not valid
+
+    Returns:
+        str: path of the saved plot'''
+    import matplotlib.pyplot as plt
+    params = dict(spec)
+    kind = params.pop('kind')
+    if kind not in RENDERERS:
+        raise ValueError(f'Invalid kind of plot: {kind}')
+    try:
+        RENDERERS[kind](**params)
+    finally:
+        plt.close('all')
+    return spec['output']
+
+
+def render_plots(specs, workers=1, config_file=PLOT_CONFIG):
+    '''The function renders the plots of specs, across a pool of
+    workers processes (in this process if workers is 1).
+
+    Args:
+        specs (list): plot specs (see render)
+        workers (int): number of processes
+        config_file (str): path of the plot configuration file
+
+    Returns:
+        list: paths of the saved plots, in the order of specs'''
+    if workers <= 1:
+        init_worker(config_file)
+        return [render(spec) for spec in specs]
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=init_worker,
+            initargs=(config_file,)) as executor:
+        # chunks of specs per task, to reduce the communication
+        chunksize = max(1, len(specs) // (4 * workers))
+        return list(executor.map(render, specs, chunksize=chunksize))
+
+
+def main(specfile: str, workers: int):
+    LOGGER.info(f'Rendering the plots of {specfile}')
+    outputs = render_plots(load_config(specfile), workers)
+    LOGGER.info(f'Rendered {len(outputs)} plots')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='The file renders the plots listed in a yaml file \
+            (one spec with kind, data, output and parameters per plot) \
+            across a pool of processes')
+    parser.add_argument('specfile', type=str, help='yaml file of the specs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of processes')
+    args = parser.parse_args()
+    logging.basicConfig(filename='./logs/plot_renderer.log', filemode='w')
+    main(args.specfile, args.workers)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+The file provides a mergeable quantile sketch (KLL, Karnin, Lang and
+Liberty 2016) for the medians and the box plot statistics of data that
+is never held in one dataframe (chunks, partitions, processes).
+A sketch keeps a few hundred values in levels of compactors: the values
+of level h stand for 2**h values each. When the sketch is full, a level
+is sorted and every other value (starting at random at the first or the
+second) is promoted to the next level. Two sketches are merged by
+concatenating their levels and compacting, so partial sketches of the
+chunks can be combined in any order.
+The rank of the returned quantiles is within error_bound(k) of the
+requested one with probability 99%; the sketch is exact until its first
+compaction (at most k + 1 values).
+"""
+import numpy as np
+
+
+DEFAULT_K = 200
+# capacity ratio between a level and the one above
+CAPACITY_RATIO = 2 / 3
+
+
+def error_bound(k=DEFAULT_K):
+    """The function returns the normalized rank error of the quantiles
+    of a sketch of size k (99% confidence), as estimated for the
+    KLL sketch of Apache DataSketches.
+
+    Args:
+        k (int): size of the sketch
+
+    Returns:
+        float
+    """
+    return 2.296 / k ** 0.9723
+
+
+class KLLSketch:
+    """Mergeable quantile sketch of a stream of floats (NaN ignored).
+
+    Args:
+        k (int): size of the sketch, the rank error is error_bound(k)
+        seed (int, list or np.random.Generator): seed of the compactions
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        if k < 8:
+            raise ValueError('The size of the sketch must be at least 8')
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.nan
+        self.max = np.nan
+
+    def __len__(self):
+        return self.n
+
+    def capacity(self, level):
+        """The function returns the capacity of a level: k for the top
+        level, smaller by CAPACITY_RATIO for each level below."""
+        depth = len(self.levels) - level - 1
+        return int(np.ceil(self.k * CAPACITY_RATIO ** depth)) + 1
+
+    def is_exact(self):
+        """The function returns True if no value has been compacted."""
+        return len(self.levels) == 1 and len(self.levels[0]) == self.n
+
+    def update(self, values):
+        """The function adds values to the sketch.
+
+        Args:
+            values (array-like): values, NaN are ignored
+
+        Returns:
+            KLLSketch: self
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = np.fmin(self.min, values.min())
+        self.max = np.fmax(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+        return self
+
+    def merge(self, other):
+        """The function adds the values summarized by other.
+
+        Args:
+            other (KLLSketch): sketch, not modified
+
+        Returns:
+            KLLSketch: self
+        """
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        self.compress()
+        return self
+
+    def compress(self):
+        """Helper function for update and merge.
+        The function compacts the levels over their capacity, from the
+        bottom, until the sketch fits in the total capacity."""
+        while sum(map(len, self.levels)) > sum(
+                map(self.capacity, range(len(self.levels)))):
+            for level in range(len(self.levels)):
+                if len(self.levels[level]) > self.capacity(level):
+                    break
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[level])
+            # an odd value out stays in the level
+            odd = len(items) % 2
+            promoted = items[odd:][self.rng.integers(2)::2]
+            self.levels[level] = items[:odd]
+            self.levels[level + 1] = np.concatenate(
+                [self.levels[level + 1], promoted])
+
+    def items(self):
+        """The function returns the values kept by the sketch, sorted,
+        with their weights.
+
+        Returns:
+            tuple: (values, weights) as np.ndarray
+        """
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        """The function returns the q-quantile(s) of the values.
+        An exact sketch interpolates linearly, as np.quantile.
+
+        Args:
+            q (float or array-like): quantile(s) in [0, 1]
+
+        Returns:
+            float or np.ndarray (NaN if the sketch is empty)
+        """
+        q = np.asarray(q, dtype=float)
+        if self.n == 0:
+            return np.full(q.shape, np.nan)[()]
+        if self.is_exact():
+            return np.quantile(self.levels[0], q)
+        values, weights = self.items()
+        cumulative = np.cumsum(weights)
+        # first value whose cumulative weight reaches q * n
+        index = np.searchsorted(cumulative, q * cumulative[-1])
+        result = values[np.minimum(index, len(values) - 1)]
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max,
+                                                     result))
+        return result[()]
+
+    def rank(self, value):
+        """The function returns the estimated fraction of the values
+        less than or equal to value.
+
+        Args:
+            value (float): value
+
+        Returns:
+            float
+        """
+        if self.n == 0:
+            return np.nan
+        values, weights = self.items()
+        return weights[:np.searchsorted(values, value, side='right')].sum() \
+            / weights.sum()
+
+
+def merge_sketches(sketches, k=DEFAULT_K, seed=0):
+    """The function merges the partial sketches into a new one.
+
+    Args:
+        sketches (iterable): KLLSketch
+        k (int): size of the merged sketch
+        seed (int): seed of the compactions
+
+    Returns:
+        KLLSketch
+    """
+    merged = KLLSketch(k, seed)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+def sketch_groups(df, keys, column, k=DEFAULT_K, seed=0):
+    """The function returns a sketch of column for each group of keys
+    of df (the partial sketches of a chunk).
+
+    Args:
+        df (pd.DataFrame): dataframe
+        keys (list): grouping columns
+        column (str): column to sketch
+        k (int): size of the sketches
+        seed (int or list): seed of the compactions (e.g. [seed, number
+                            of the chunk])
+
+    Returns:
+        dict: group key -> KLLSketch
+    """
+    return {key: KLLSketch(k, seed).update(values.to_numpy())
+            for key, values in df.groupby(keys, observed=True)[column]}
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+The file provides a store (SQLite database) for the results of the
+hypothesis tests of the workflows: statistic, p-value, sample sizes,
+significance and duration of each test.
+A result is keyed by a hash of the test, of the tested data and of the
+parameters: a test run again on the same data with the same parameters
+returns the stored result instead of being computed.
+The store also records the latest result written to each output file
+of the tests, so that the Snakefiles can branch on the significance of
+a test (is_significant) instead of parsing its text output; the text
+output is parsed only when the store has no result for it (e.g. the store
+was deleted or moved).
+"""
+import pandas as pd
+import contextlib
+import datetime
+import hashlib
+import sqlite3
+import json
+import time
+import os
+
+
+STORE_FILE = 'hptests.sqlite'
+FIELDS = ['key', 'test', 'data_hash', 'params', 'statistic', 'pvalue',
+          'n1', 'n2', 'significant', 'seconds', 'created']
+SCHEMA = ['''CREATE TABLE IF NOT EXISTS results (
+                 key TEXT PRIMARY KEY, test TEXT, data_hash TEXT,
+                 params TEXT, statistic REAL, pvalue REAL, n1 INTEGER,
+                 n2 INTEGER, significant INTEGER, seconds REAL,
+                 created TEXT)''',
+          '''CREATE TABLE IF NOT EXISTS outputs (
+                 output TEXT PRIMARY KEY, key TEXT)''']
+# seconds to wait for the lock of another process (parallel rules)
+TIMEOUT = 60
+
+
+def data_hash(df):
+    """The function returns a hash of the columns and values of df
+    (not of its index).
+
+    Args:
+        df (pd.DataFrame): tested data
+
+    Returns:
+        str
+    """
+    digest = hashlib.sha256(json.dumps(list(map(str, df.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False)
+                  .to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def result_key(test, digest, params):
+    """The function returns the key of the result of test
+    on the data with hash digest, with params.
+
+    Args:
+        test (str): name of the test
+        digest (str): hash of the data (see data_hash)
+        params (dict): parameters of the test (json serializable)
+
+    Returns:
+        str
+    """
+    content = json.dumps([test, digest, params], sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+@contextlib.contextmanager
+def open_store(path):
+    """The function opens the store in path (created if missing) and
+    commits the changes on exit.
+
+    Args:
+        path (str): path of the SQLite database
+
+    Yields:
+        sqlite3.Connection
+    """
+    connection = sqlite3.connect(path, timeout=TIMEOUT)
+    connection.row_factory = sqlite3.Row
+    try:
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            yield connection
+    finally:
+        connection.close()
+
+
+def to_record(row):
+    """Helper function for get_result and read_result.
+    The function converts a row of the results table to a dict (SQLite
+    stores NaN as NULL: a missing statistic or p-value is NaN)."""
+    if row is None:
+        return None
+    record = dict(row)
+    record['params'] = json.loads(record['params'])
+    for field in ['statistic', 'pvalue']:
+        if record[field] is None:
+            record[field] = float('nan')
+    record['significant'] = bool(record['significant'])
+    return record
+
+
+def get_result(path, key):
+    """The function returns the result with key, None if missing.
+
+    Args:
+        path (str): path of the store
+        key (str): key of the result (see result_key)
+
+    Returns:
+        dict or None: the FIELDS of the result
+    """
+    with open_store(path) as connection:
+        row = connection.execute('SELECT * FROM results WHERE key = ?',
+                                 (key,)).fetchone()
+    return to_record(row)
+
+
+def save_result(path, record, output=None):
+    """The function saves a result (replacing the one with the same
+    key) and records it as the latest result written to output.
+
+    Args:
+        path (str): path of the store
+        record (dict): the FIELDS of the result
+        output (str, optional): output file of the test
+
+    Returns:
+        None.
+    """
+    values = {**record, 'params': json.dumps(record['params'],
+                                             sort_keys=True)}
+    with open_store(path) as connection:
+        connection.execute(
+            f'INSERT OR REPLACE INTO results ({", ".join(FIELDS)}) '
+            f'VALUES ({", ".join("?" * len(FIELDS))})',
+            [values[field] for field in FIELDS])
+        if output is not None:
+            link_output(connection, output, record['key'])
+
+
+def link_output(connection, output, key):
+    """Helper function for save_result and cached_test.
+    The function records key as the latest result written to output."""
+    connection.execute('INSERT OR REPLACE INTO outputs VALUES (?, ?)',
+                       (os.path.abspath(output), key))
+
+
+def cached_test(path, test, data, params, run, output=None):
+    """The function returns the result of test on data with params:
+    the stored one if any, otherwise the one computed by run, which
+    is then saved.
+
+    Args:
+        path (str): path of the store
+        test (str): name of the test
+        data (pd.DataFrame): tested data (only the used columns)
+        params (dict): parameters of the test (json serializable)
+        run (callable): computes the test, returns a dict with
+                        statistic, pvalue, n1, n2 and significant
+        output (str, optional): output file of the test
+
+    Returns:
+        dict: the FIELDS of the result and cached (bool)
+    """
+    digest = data_hash(data)
+    key = result_key(test, digest, params)
+    record = get_result(path, key)
+    if record is not None:
+        if output is not None:
+            with open_store(path) as connection:
+                link_output(connection, output, key)
+        return {**record, 'cached': True}
+    start = time.perf_counter()
+    result = run()
+    record = {'key': key, 'test': test, 'data_hash': digest,
+              'params': params,
+              'statistic': float(result['statistic']),
+              'pvalue': float(result['pvalue']),
+              'n1': int(result['n1']),
+              'n2': None if result.get('n2') is None else int(result['n2']),
+              'significant': bool(result['significant']),
+              'seconds': time.perf_counter() - start,
+              'created': datetime.datetime.now().isoformat()}
+    save_result(path, record, output)
+    return {**record, 'cached': False}
+
+
+def read_result(path, output):
+    """The function returns the latest result written to output.
+
+    Args:
+        path (str): path of the store
+        output (str): output file of the test
+
+    Raises:
+        KeyError: when no result was written to output (or the store
+                  does not exist)
+
+    Returns:
+        dict: the FIELDS of the result
+    """
+    if not os.path.exists(path):
+        raise KeyError(f'No result for {output}: missing store {path}')
+    with open_store(path) as connection:
+        row = connection.execute(
+            'SELECT results.* FROM outputs JOIN results USING (key) '
+            'WHERE output = ?', (os.path.abspath(output),)).fetchone()
+    if row is None:
+        raise KeyError(f'No result for {output} in {path}')
+    return to_record(row)
+
+
+def is_significant(path, output, text_output=None):
+    """The function returns the significance of the latest result
+    written to output (used by the Snakefiles to choose the plots).
+    When the store has no result for output, the significance is read
+    from text_output, the file with 'True' or 'False' written by the
+    test.
+
+    Args:
+        path (str): path of the store
+        output (str): output file of the test
+        text_output (str, optional): text output of the significance
+
+    Raises:
+        KeyError: when no result was written to output and text_output
+                  is not given
+
+    Returns:
+        bool.
+    """
+    try:
+        return read_result(path, output)['significant']
+    except KeyError:
+        if text_output is None:
+            raise
+    with open(text_output) as file:
+        return file.read().strip() == 'True'
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+'''
+The script runs one or more workflows in a single process, producing
+the same outputs as SnakefileWorkflow1/2/3. The raw dataset is read and
+processed once; the processed dataframe is kept in memory and passed
+directly to the processing, test and plotting functions of the
+workflows, instead of starting one interpreter per rule and re-reading
+the intermediate files.
+Each workflow is configured by its yaml file (configuration_wN.yaml).
+The results of the hypothesis tests are kept in the results store
+(results/hptests.sqlite) and reused while the data do not change.
+'''
+from bin.utils import load_config
+from bin.dataprocessing import process_csvfile
+from bin.snapshot import snapshot_tables, snapshot_file
+from bin.io_utils import write_processed, PARTITION_COLUMNS
+from bin.workflow_1.dataprocessing_w1 import process_csvfile_w1, OUTCOMES
+from bin.workflow_1.plot_summaries_w1 import plot_summaries, summary_file
+from bin.workflow_1.mann_whitney_u_w1 import (mann_whitney_u_test,
+                                              permutation_test_result)
+from bin.workflow_2.dataprocessing_w2 import aggregate_w2
+from bin.workflow_3.dataprocessing_w3 import (process_csvfile_w3,
+                                              process_places_w3, read_place,
+                                              place_label)
+from bin.workflow_3.correlationtest_w3 import (correlation_result,
+                                               save_results, check_results,
+                                               CORR_THRESHOLD,
+                                               PVALUE_THRESHOLD)
+from bin.plot_renderer import render_plots, PLOT_CONFIG
+from bin.results_store import STORE_FILE
+import contextlib
+import argparse
+import logging
+import time
+import io
+import os
+
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+BIN = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BIN)
+DATA = os.path.join(ROOT, 'data')
+RESULTS = os.path.join(ROOT, 'results')
+RAW_CSV = os.path.join(DATA, 'owid-covid-data.csv')
+CONFIGS = {workflow: os.path.join(BIN, f'workflow_{workflow}',
+                                  f'configuration_w{workflow}.yaml')
+           for workflow in [1, 2, 3]}
+# outputs of the Snakefiles
+GROUPS_W1 = ['life_expectancy', 'gdp_per_capita',
+             'median_age', 'population_density']
+OUTCOMES_W2 = ['total_cases', 'total_deaths']
+Y1_W3 = ['new_deaths', 'deaths_over_cases']
+Y2_W3 = ['new_cases', 'new_vaccinations']
+# workflows reading the snapshots of the processed dataset
+SNAPSHOT_WORKFLOWS = {1, 2}
+
+
+def processed_file(config, data_dir, name='owid-covid-data_processed'):
+    '''Helper function for the run_workflow functions.
+    The function returns the path of a processed dataset
+    in the format of the configuration.
+
+    Args:
+        config (dict): configuration of the workflow
+        data_dir (str): directory of the processed datasets
+        name (str): name of the dataset (without extension)
+
+    Returns:
+        str'''
+    return os.path.join(data_dir, f"{name}.{config.get('format', 'csv')}")
+
+
+def save_processed(df, config, data_dir, saved, snapshots=None):
+    '''The function saves the general processed dataset (and its
+    snapshots, if given) as required by the configuration
+    (rule dataprocessing), once per file.
+
+    Args:
+        df (pd.DataFrame): processed dataset
+        config (dict): configuration of the workflow
+        data_dir (str): directory of the processed datasets
+        saved (set): files already saved, updated in place
+        snapshots (dict, optional): snapshots of df (snapshot_tables)
+
+    Returns:
+        None.'''
+    outfile = processed_file(config, data_dir)
+    partition_cols = PARTITION_COLUMNS if config.get('partition') else None
+    tables = {outfile: df}
+    for time, table in (snapshots or {}).items():
+        tables[snapshot_file(outfile, time)] = table
+    for filename, table in tables.items():
+        if filename in saved:
+            continue
+        LOGGER.info(f'Saving processed dataset: {filename}')
+        write_processed(table, filename, partition_cols=partition_cols)
+        saved.add(filename)
+
+
+def run_workflow_1(df, config, data_dir, results_dir, snapshots=None):
+    '''The function runs workflow 1 on the processed dataset df
+    (on its monthly snapshot, if snapshots are given):
+    processing, plot summaries, Mann-Whitney U test (or permutation
+    test) and plot spec for each group.
+
+    Args:
+        df (pd.DataFrame): processed dataset
+        config (dict): configuration of the workflow
+        data_dir (str): directory of the processed datasets
+        results_dir (str): directory of the results
+        snapshots (dict, optional): snapshots of df (snapshot_tables)
+
+    Returns:
+        list: specs of the plots (see plot_renderer)'''
+    outdir = os.path.join(results_dir, 'workflow_1')
+    os.makedirs(outdir, exist_ok=True)
+    y_variable = config['y']
+    if snapshots:
+        df_w1 = process_csvfile_w1(snapshots['month'], GROUPS_W1,
+                                   config['year'], config['continent'],
+                                   snapshot=True)
+    else:
+        df_w1 = process_csvfile_w1(df, GROUPS_W1, config['year'],
+                                   config['continent'])
+    outfile = processed_file(config, data_dir, 'owid-covid-data_processed_w1')
+    write_processed(df_w1, outfile, index=True)
+    # the saved dataset has the index as columns
+    data = df_w1.reset_index()
+    summaries = plot_summaries(data, [f'{group}_cat' for group in GROUPS_W1],
+                               list(OUTCOMES.values()))
+    for kind, table in summaries.items():
+        write_processed(table, summary_file(outfile, kind))
+    specs = []
+    for group in GROUPS_W1:
+        LOGGER.info(f'Workflow 1: {group}')
+        x_variable = f'{group}_cat'
+        output = os.path.join(outdir, f'mannwhitneyu_{group}.txt')
+        store = os.path.join(results_dir, STORE_FILE)
+        if config.get('permutations'):
+            _, p_value = permutation_test_result(
+                data, x_variable, y_variable, output,
+                n_permutations=config['permutations'], store=store)
+        else:
+            _, p_value = mann_whitney_u_test(data, x_variable, y_variable,
+                                             output, LOGGER, store)
+        plot = os.path.join(outdir, f'plot_{group}.png')
+        if p_value < 0.05:
+            specs.append({'kind': 'boxplot', 'data': summaries['boxes'],
+                          'output': plot, 'group': x_variable,
+                          'y_variable': y_variable, 'summary': True})
+        else:
+            specs.append({'kind': 'lineplot', 'data': summaries['lines'],
+                          'output': plot, 'group': x_variable,
+                          'x_variable': 'month', 'y_variable': y_variable,
+                          'summary': True})
+    return specs
+
+
+def run_workflow_2(df, config, data_dir, results_dir, snapshots=None):
+    '''The function runs workflow 2 on the processed dataset df
+    (on its yearly snapshot, if snapshots are given):
+    processing (raw and normalized outcomes of every year) and bar plot
+    spec for each outcome.
+
+    Args:
+        df (pd.DataFrame): processed dataset
+        config (dict): configuration of the workflow
+        data_dir (str): directory of the processed datasets
+        results_dir (str): directory of the results
+        snapshots (dict, optional): snapshots of df (snapshot_tables)
+
+    Returns:
+        list: specs of the plots (see plot_renderer)'''
+    outdir = os.path.join(results_dir, 'workflow_2')
+    os.makedirs(outdir, exist_ok=True)
+    normalize, year = config['normalize'], config['year']
+    LOGGER.info(f'Workflow 2: normalize {normalize}, year {year}')
+    if snapshots:
+        df_w2 = aggregate_w2(snapshots['year'], snapshot=True)
+    else:
+        df_w2 = aggregate_w2(df)
+    write_processed(df_w2, processed_file(
+        config, data_dir, 'owid-covid-data_processed_w2'), index=True)
+    data = df_w2.reset_index()
+    norm = '_norm' if normalize else ''
+    return [{'kind': 'barplot', 'data': data, 'outcome': outcome,
+             'year': year, 'normalize': normalize, 'output': os.path.join(
+                 outdir, f'barplot_{outcome}{norm}_by_continent_{year}.png')}
+            for outcome in OUTCOMES_W2]
+
+
+def run_workflow_3(df, config, data_dir, results_dir, snapshots=None):
+    '''The function runs workflow 3 on the processed dataset df:
+    processing, correlation test and specs of the regression plot
+    (if the test is significant) and of the trend plots.
+
+    Args:
+        df (pd.DataFrame): processed dataset
+        config (dict): configuration of the workflow
+        data_dir (str): directory of the processed datasets
+        results_dir (str): directory of the results
+        snapshots (dict, optional): not used, workflow 3 sums the
+                                    daily values
+
+    Returns:
+        list: specs of the plots (see plot_renderer)'''
+    outdir = os.path.join(results_dir, 'workflow_3')
+    os.makedirs(outdir, exist_ok=True)
+    time_, x, y = config['time'], config['x'], config['y']
+    place = 'germany' if config['germany'] else 'europe'
+    if config.get('place'):
+        place = place_label(config['place'])
+    suffix = f'by_{time_}_{place}'
+    LOGGER.info(f'Workflow 3: {suffix}')
+    if config.get('place'):
+        df_w3 = process_places_w3(df, time_)
+        name = f'owid-covid-data_processed_w3_places_by_{time_}'
+    else:
+        df_w3 = process_csvfile_w3(df, time_, config['germany'])
+        name = f'owid-covid-data_processed_w3_{place}_by_{time_}'
+    write_processed(df_w3, processed_file(config, data_dir, name),
+                    index=True)
+    data = df_w3.reset_index()
+    if config.get('place'):
+        data = read_place(data, config['place'])
+    # correlation test
+    outfile = os.path.join(outdir, f'correlationtest_results__{suffix}.txt')
+    result = correlation_result(data, x, y, CORR_THRESHOLD,
+                                PVALUE_THRESHOLD,
+                                os.path.join(results_dir, STORE_FILE),
+                                outfile)
+    pvalue, corr_coeff = result['pvalue'], result['statistic']
+    save_results(outfile, pvalue, corr_coeff, x, y)
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        significance = check_results(pvalue, corr_coeff,
+                                     CORR_THRESHOLD, PVALUE_THRESHOLD)
+    with open(os.path.join(
+            outdir, f'correlationtest_results_significance_{suffix}.txt'),
+            'w') as file:
+        file.write(output.getvalue())
+    # regression plot, empty file if the test is not significant
+    regplot = os.path.join(
+        outdir, f'regplot_deaths_over_cases_vaccinations_{suffix}.png')
+    specs = []
+    if significance == 'True':
+        specs.append({'kind': 'regplot', 'data': data, 'output': regplot,
+                      'x': x, 'y': y})
+    else:
+        with open(regplot, 'w') as file:
+            file.write('.\n')
+    # trend plots
+    for y1 in Y1_W3:
+        for y2 in Y2_W3:
+            specs.append({'kind': 'trendplot', 'data': data,
+                          'y1': y1, 'y2': y2, 'x': time_,
+                          'output': os.path.join(
+                              outdir, f'trendplot_{y1}__{y2}_{suffix}.png')})
+    return specs
+
+
+RUN_WORKFLOW = {1: run_workflow_1, 2: run_workflow_2, 3: run_workflow_3}
+
+
+def main(configfiles: dict, csvfile=RAW_CSV, data_dir=DATA,
+         results_dir=RESULTS, workers=1):
+    '''The function runs the workflows of configfiles
+    ({workflow number: configuration file}) on csvfile; the plots of
+    all the workflows are rendered at the end across workers
+    processes.'''
+    configs = {workflow: load_config(configfile)
+               for workflow, configfile in sorted(configfiles.items())}
+    start = time.perf_counter()
+    LOGGER.info(f'Processing {csvfile}')
+    df = process_csvfile(csvfile)
+    snapshots = snapshot_tables(df) if SNAPSHOT_WORKFLOWS & configs.keys() \
+        else None
+    saved = set()
+    specs = []
+    for workflow, config in configs.items():
+        tables = snapshots if workflow in SNAPSHOT_WORKFLOWS else None
+        save_processed(df, config, data_dir, saved, tables)
+        specs += RUN_WORKFLOW[workflow](df, config, data_dir, results_dir,
+                                        tables)
+        LOGGER.info(f'Workflow {workflow} done: '
+                    f'{time.perf_counter() - start:.1f} s')
+    render_plots(specs, workers, PLOT_CONFIG)
+    LOGGER.info(f'{len(specs)} plots rendered: '
+                f'{time.perf_counter() - start:.1f} s')
+    LOGGER.info('End')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='The file runs the workflows in a single process. \
+            Without options all the workflows are run with their \
+            default configuration files.')
+    parser.add_argument('-i', '--csvfile', type=str, default=RAW_CSV,
+                        help='raw csv file name')
+    for workflow in [1, 2, 3]:
+        parser.add_argument(f'--w{workflow}', type=str, nargs='?',
+                            default=None, const=CONFIGS[workflow],
+                            help=f'run workflow {workflow} with this \
+                                configuration file (default: \
+                                configuration_w{workflow}.yaml)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes rendering the plots')
+    args = parser.parse_args()
+    # set logging
+    logging.basicConfig(filename='./logs/runner.log', filemode='w')
+    configfiles = {workflow: configfile for workflow, configfile
+                   in [(1, args.w1), (2, args.w2), (3, args.w3)]
+                   if configfile is not None}
+    main(configfiles or CONFIGS, args.csvfile, workers=args.workers)
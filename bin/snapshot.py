@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+The file provides the end-of-period snapshots of the processed dataset:
+for each location and each month, semester and year, the last non-null
+value of every column, as groupby(...).agg('last') on the daily rows.
+The snapshots are computed once, with a sort: once the rows are sorted
+by location and date, the periods of a location are contiguous blocks
+of rows and the last non-null row of each block is found with one
+reduceat per column. The semester and year snapshots are computed from
+the monthly one (the last non-null value of a year is the last non-null
+monthly value).
+The workflows read the snapshots (month for workflow 1, year for
+workflow 2) instead of aggregating the daily rows.
+"""
+import pandas as pd
+import numpy as np
+
+
+SNAPSHOT_TIMES = ['month', 'semester', 'year']
+# time columns of each snapshot, with location they are the keys
+SNAPSHOT_KEYS = {'month': ['year', 'month', 'semester'],
+                 'semester': ['year', 'semester'],
+                 'year': ['year']}
+
+
+def snapshot_file(filename, time):
+    """The function returns the path of the snapshot by time of the
+    processed dataset filename, e.g. owid-covid-data_processed.csv ->
+    owid-covid-data_processed_snapshot_month.csv.
+
+    Args:
+        filename (str): path of the processed dataset
+        time (str): one of SNAPSHOT_TIMES
+
+    Returns:
+        str
+    """
+    stem, extension = str(filename).rstrip('/').rsplit('.', 1)
+    return f'{stem}_snapshot_{time}.{extension}'
+
+
+def block_starts(df, keys):
+    """Helper function for snapshot_tables.
+    The function returns the first row of each block of consecutive
+    rows of df with the same keys.
+
+    Args:
+        df (pd.DataFrame): dataframe sorted by keys
+        keys (list): columns
+
+    Returns:
+        np.ndarray
+    """
+    new_block = np.zeros(len(df), dtype=bool)
+    new_block[:1] = True
+    for key in keys:
+        codes = pd.factorize(df[key])[0]
+        new_block[1:] |= codes[1:] != codes[:-1]
+    return np.flatnonzero(new_block)
+
+
+def last_valid(df, starts, columns):
+    """Helper function for snapshot_tables.
+    The function returns the last non-null value of each column in each
+    block of rows of df (NaN if the column is null in the whole block).
+
+    Args:
+        df (pd.DataFrame): dataframe
+        starts (np.ndarray): first row of each block
+        columns (list): columns
+
+    Returns:
+        pd.DataFrame: one row per block
+    """
+    positions = np.arange(len(df))
+    data = {}
+    for column in columns:
+        col = df[column]
+        valid = col.notna().to_numpy()
+        last = np.maximum.reduceat(np.where(valid, positions, -1), starts)
+        if pd.api.types.is_float_dtype(col.dtype):
+            values = col.to_numpy()[np.maximum(last, 0)]
+            values[last < 0] = np.nan
+            data[column] = values
+        else:
+            values = col.iloc[np.maximum(last, 0)].reset_index(drop=True)
+            data[column] = values.where(last >= 0)
+    return pd.DataFrame(data)
+
+
+def snapshot(df, time):
+    """Helper function for snapshot_tables.
+    The function returns the snapshot by time of df (sorted by location
+    and date, or a finer snapshot).
+
+    Args:
+        df (pd.DataFrame): dataframe
+        time (str): one of SNAPSHOT_TIMES
+
+    Returns:
+        pd.DataFrame
+    """
+    time_columns = [column for column in SNAPSHOT_KEYS['month']
+                    if column in df.columns]
+    keys = ['location'] + SNAPSHOT_KEYS[time]
+    columns = [column for column in df.columns
+               if column not in time_columns + ['location', 'date']]
+    if df.empty:
+        return df[[column for column in df.columns
+                   if column in keys or column in columns]]
+    starts = block_starts(df, ['location', time])
+    table = pd.concat([df[keys].iloc[starts].reset_index(drop=True),
+                       last_valid(df, starts, columns)], axis=1)
+    # columns in the order of the processed dataset
+    return table[[column for column in df.columns if column in table]]
+
+
+def is_sorted(df):
+    """Helper function for snapshot_tables.
+    The function checks whether the rows of each location of df are
+    contiguous and sorted by date (as in the OWID dataset).
+
+    Args:
+        df (pd.DataFrame): processed dataset
+
+    Returns:
+        bool
+    """
+    codes, locations = pd.factorize(df['location'])
+    same = codes[1:] == codes[:-1]
+    if np.count_nonzero(~same) + 1 != len(locations):
+        return False
+    dates = df['date'].to_numpy()
+    return bool((dates[1:][same] > dates[:-1][same]).all())
+
+
+def snapshot_tables(df):
+    """The function computes the snapshots of the processed dataset df:
+    for each location and each month, semester and year, the last
+    non-null value of every column.
+
+    Args:
+        df (pd.DataFrame): processed dataset
+
+    Returns:
+        dict: time -> snapshot (pd.DataFrame), for time in SNAPSHOT_TIMES
+    """
+    if not is_sorted(df):
+        df = df.sort_values(['location', 'date'], kind='stable')
+    month = snapshot(df, 'month')
+    return {'month': month,
+            'semester': snapshot(month, 'semester'),
+            'year': snapshot(month, 'year')}
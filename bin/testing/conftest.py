@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+The script contains the fixtures shared by the tests: a small synthetic
+raw dataset, its processed dataset and the places of workflow 3.
+The synthetic dataset is generated with the arguments of
+generate_owid_frame given by the fixture owid_params: a test module
+overrides it with a fixture of the same name, a test parametrizes it
+indirectly (the parameter updates OWID_PARAMS).
+"""
+from bin.benchmarks.synthetic_data import generate_owid_frame
+from bin.dataprocessing import process_csvfile
+from bin.workflow_3.dataprocessing_w3 import process_places_w3
+from bin.io_utils import write_processed
+import pytest
+
+
+OWID_PARAMS = {'n_countries': 12, 'n_days': 800, 'seed': 0}
+
+
+@pytest.fixture
+def owid_params(request):
+    """Fixture with the arguments of generate_owid_frame."""
+    return {**OWID_PARAMS, **getattr(request, 'param', {})}
+
+
+@pytest.fixture
+def raw_csv(tmp_path, owid_params):
+    """Fixture with a synthetic raw csv file."""
+    csvfile = str(tmp_path / 'owid-covid-data.csv')
+    generate_owid_frame(**owid_params).to_csv(csvfile, index=False)
+    return csvfile
+
+
+@pytest.fixture
+def processed(raw_csv):
+    """Fixture with a synthetic raw csv file and its processed dataset."""
+    return raw_csv, process_csvfile(raw_csv)
+
+
+@pytest.fixture
+def processed_file(processed, tmp_path):
+    """Fixture with the path of the synthetic processed csv file."""
+    processed_file = str(tmp_path / 'owid-covid-data_processed.csv')
+    write_processed(processed[1], processed_file)
+    return processed_file
+
+
+@pytest.fixture
+def places(processed):
+    """Fixture with the output of process_places_w3 on the synthetic
+    processed dataset (index as columns)."""
+    return process_places_w3(processed[1]).reset_index()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the benchmark suite
+bin/benchmarks/benchmark_suite.py, on a small synthetic dataset.
+"""
+from bin.benchmarks.benchmark_suite import (run_benchmarks,
+                                            compare_to_baseline,
+                                            save_report, load_report)
+from bin.benchmarks.synthetic_data import generate_owid_frame
+from pandas.testing import assert_frame_equal
+
+
+def test_generate_owid_frame():
+    """Unit test for the scale and the seed of generate_owid_frame."""
+    df = generate_owid_frame(n_countries=3, n_days=10, seed=1, n_metrics=4)
+    assert len(df) == 30
+    assert [column for column in df.columns
+            if column.startswith('metric_')] == [f'metric_00{i}'
+                                                 for i in range(4)]
+    assert_frame_equal(df, generate_owid_frame(3, 10, seed=1, n_metrics=4))
+
+
+def test_run_benchmarks(tmp_path):
+    """Unit test for run_benchmarks and the regression check."""
+    report = run_benchmarks(n_countries=12, n_days=400, repeat=1)
+    assert (report[['time_s', 'peak_mb']] > 0).all().all()
+    assert report.loc['process_csvfile', 'rows'] == 12 * 400
+    filename = str(tmp_path / 'baseline.json')
+    save_report(report, filename, {'countries': 12})
+    baseline, scale = load_report(filename)
+    assert scale == {'countries': 12}
+    assert compare_to_baseline(report, baseline).empty
+    slower = report.copy()
+    slower.loc['reg_plot', 'time_s'] *= 2
+    assert list(compare_to_baseline(slower, baseline).index) == ['reg_plot']
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component bin/column_store.py.
+"""
+from bin.column_store import open_columns, location_slices
+from bin.io_utils import read_processed, write_processed
+from pandas.testing import assert_frame_equal
+import pandas as pd
+import numpy as np
+import pytest
+
+
+def create_processed_df():
+    """Helper function to create a small processed dataframe."""
+    return pd.DataFrame({
+        'continent': ['Europe', 'Europe', 'Asia', None],
+        'location': ['Germany', 'Germany', 'Japan', 'World'],
+        'date': pd.to_datetime(['2021-06-30', '2021-07-01',
+                                '2021-07-01', '2021-07-01']),
+        'new_cases': [10.0, None, 3.5, 13.5],
+        'year': [2021, 2021, 2021, 2021],
+        'month': pd.period_range('2021-06', periods=2, freq='M')[[0, 1, 1, 1]],
+        'semester': [3, 4, 4, 4],
+    })
+
+
+def test_column_store_roundtrip(tmp_path):
+    """Unit test for the column store: same schema as parquet,
+    the numeric columns are backed by the memory maps."""
+    df = create_processed_df()
+    parquet_file = str(tmp_path / 'owid-covid-data_processed.parquet')
+    store = str(tmp_path / 'owid-covid-data_processed.npy')
+    write_processed(df, parquet_file)
+    write_processed(df, store)
+    actual_df = read_processed(store)
+    assert isinstance(actual_df['new_cases'].to_numpy().base, np.memmap)
+    assert_frame_equal(read_processed(parquet_file), actual_df.copy())
+
+
+def test_column_store_filters(tmp_path):
+    """Unit test for read_processed on a column store
+    with columns and filters."""
+    df = create_processed_df()
+    store = str(tmp_path / 'owid-covid-data_processed.npy')
+    write_processed(df, store)
+    actual_df = read_processed(store, columns=['new_cases', 'location'],
+                               filters=[('continent', '==', 'Europe')])
+    assert list(actual_df.columns) == ['location', 'new_cases']
+    assert actual_df['location'].tolist() == ['Germany', 'Germany']
+
+
+def test_open_columns(tmp_path):
+    """Unit test for functions open_columns and location_slices."""
+    df = create_processed_df()
+    store = str(tmp_path / 'owid-covid-data_processed.npy')
+    write_processed(df, store)
+    arrays = open_columns(store, ['new_cases'])
+    assert isinstance(arrays['new_cases'], np.memmap)
+    rows = location_slices(store)['Germany']
+    np.testing.assert_array_equal(arrays['new_cases'][rows], [10.0, np.nan])
+    write_processed(df.iloc[[0, 2, 1, 3]], store)
+    with pytest.raises(ValueError):
+        location_slices(store)
+
+
+def test_column_store_partition(tmp_path):
+    """Unit test for write_processed: a column store
+    cannot be partitioned."""
+    df = create_processed_df()
+    with pytest.raises(OSError):
+        write_processed(df, str(tmp_path / 'processed.npy'),
+                        partition_cols=['continent'])
@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
 """
-The script contains a unit test for the component
+The script contains unit tests for the component
 bin/workflow_3/correlationtest_w3.py.
 """
-from bin.workflow_3.correlationtest_w3 import correlation_hptest, check_results
+from bin.workflow_3.correlationtest_w3 import (correlation_hptest,
+                                               check_results,
+                                               spearman_matrix, pivot_matrix,
+                                               correlation_by_location,
+                                               main)
+from bin.workflow_3.dataprocessing_w3 import process_csvfile_w3
+from bin.io_utils import read_processed
+from pandas.testing import assert_frame_equal
 import pandas as pd
+import numpy as np
+import pytest
 import io
 import contextlib
 
@@ -47,3 +56,102 @@ def test_process_correlationtest_w3():
     actual_result = GET_STDOUT.getvalue().strip()
     # check
     assert (expected_result == actual_result)
+
+
+METRICS = ['new_deaths', 'new_cases', 'new_vaccinations',
+           'deaths_over_cases']
+
+
+@pytest.fixture
+def owid_params():
+    """Fixture with the parameters of the synthetic dataset."""
+    return {'n_countries': 12, 'n_days': 900, 'seed': 7}
+
+
+def test_spearman_matrix():
+    """Unit test for function spearman_matrix: the matrices are the
+    ones of scipy.stats.spearmanr, with ties."""
+    from scipy.stats import spearmanr
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(50, 4)), columns=list('abcd'))
+    df['b'] += df['a']
+    df['c'] = df['c'].round()
+    results = spearman_matrix(df, list('abcd'))
+    expected = spearmanr(df)
+    assert np.allclose(pivot_matrix(results), expected.statistic)
+    assert np.allclose(pivot_matrix(results, 'pvalue'), expected.pvalue)
+
+
+def test_spearman_matrix_places(places):
+    """Unit test for function spearman_matrix: for each place and pair,
+    the results are the ones of correlation_hptest (NaN discarded pair
+    by pair)."""
+    places.loc[::5, 'new_vaccinations'] = np.nan
+    results = spearman_matrix(places, METRICS, ['place'])
+    assert len(results) == places['place'].nunique() * 6
+    for row in results.sample(20, random_state=0).itertuples():
+        data = places[places['place'] == row.place]
+        pvalue, corr_coeff = correlation_hptest(data[row.var1],
+                                                data[row.var2])
+        assert row.statistic == pytest.approx(corr_coeff, nan_ok=True)
+        assert row.pvalue == pytest.approx(pvalue, nan_ok=True)
+        assert row.n == data[[row.var1, row.var2]].notna().all(axis=1).sum()
+
+
+def test_matrix_mode(places, tmp_path):
+    """Integration test for the matrix mode of main: every place at once
+    or one place."""
+    csvfile = str(tmp_path / 'owid-covid-data_processed_w3_places.csv')
+    places.to_csv(csvfile, index=False)
+    outfile = str(tmp_path / 'correlation_matrix.csv')
+    main(csvfile, outfile, None, None, 0.85, 0.0, matrix=METRICS,
+         all_places=True)
+    results = read_processed(outfile)
+    assert set(results['place']) == set(places['place'])
+    main(csvfile, outfile, None, None, 0.85, 0.0, matrix=METRICS,
+         place='Asia')
+    expected_df = results[results['place'] == 'Asia'].drop(
+        columns='place').reset_index(drop=True)
+    assert_frame_equal(read_processed(outfile), expected_df)
+    with pytest.raises(OSError):
+        main(csvfile, str(tmp_path / 'matrix.txt'), None, None, 0.85, 0.0,
+             matrix=METRICS)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_correlation_by_location(processed, workers):
+    """Unit test for function correlation_by_location: the results of
+    each location are the ones of correlation_hptest on the output of
+    process_csvfile_w3 of the location, also across processes."""
+    _, df = processed
+    results = correlation_by_location(df, 'new_cases', 'new_deaths',
+                                      0.85, 0.0, workers=workers)
+    assert sorted(results['location']) == sorted(df['location'].unique())
+    for row in results.itertuples():
+        data = process_csvfile_w3(df, locations=[row.location])
+        pvalue, corr_coeff = correlation_hptest(data['new_cases'],
+                                                data['new_deaths'])
+        assert row.statistic == pytest.approx(corr_coeff)
+        assert row.pvalue == pytest.approx(pvalue)
+        assert row.n == len(data)
+    assert not results['significant'].any()
+
+
+def test_by_location_mode(processed, tmp_path):
+    """Integration test for the per-location mode of main: locations with
+    less than MIN_PAIRS periods have no results."""
+    csvfile, df = processed
+    processed_file = str(tmp_path / 'owid-covid-data_processed.csv')
+    df[df['location'] != 'Country 000'].to_csv(processed_file, index=False)
+    short_df = df[(df['location'] == 'Country 000')
+                  & (df['date'] < '2020-07-01')]
+    short_df.to_csv(processed_file, mode='a', header=False, index=False)
+    outfile = str(tmp_path / 'correlationtest_by_location.csv')
+    main(processed_file, outfile, 'new_cases', 'new_vaccinations', 0.85,
+         0.0, by_location=True, workers=2)
+    results = read_processed(outfile).set_index('location')
+    assert len(results) == df['location'].nunique()
+    assert np.isnan(results.loc['Country 000', 'statistic'])
+    assert results.drop(index='Country 000')['statistic'].notna().all()
+    with pytest.raises(ValueError):
+        correlation_by_location(df, 'new_cases', 'metric', 0.85, 0.0)
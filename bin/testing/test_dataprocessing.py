@@ -6,7 +6,7 @@ processing function has many columns,
 thus it's difficult to create a fixture by hand.
 """
 from bin.dataprocessing import process_csvfile
-from pandas.testing import assert_frame_equal
+from pandas.testing import assert_frame_equal, assert_series_equal
 import pandas as pd
 
 
@@ -23,3 +23,17 @@ def test_regression():
     actual_df = process_csvfile(filename)
     # check
     assert_frame_equal(expected_df, actual_df, rtol=1e-3)
+
+
+def test_raw_dtypes(raw_csv, tmp_path):
+    "Unit test: the raw columns keep the dtypes inferred by pd.read_csv"
+    raw_df = pd.read_csv(raw_csv)
+    raw_df['population'] = raw_df['population'].round().astype('int64')
+    filename = str(tmp_path / 'owid-covid-data_int.csv')
+    raw_df.to_csv(filename, index=False)
+    expected_dtypes = pd.read_csv(filename, engine='python').dtypes.drop(
+        index='date')
+    actual_df = process_csvfile(filename)
+    assert_series_equal(actual_df.dtypes[expected_dtypes.index],
+                        expected_dtypes)
+    assert actual_df['population'].dtype == 'int64'
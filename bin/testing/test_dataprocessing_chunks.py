@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+The script contains a unit test for the streaming mode (--chunksize)
+of the component bin/dataprocessing.py: the processed output must be the
+same as the one of the in-memory processing.
+"""
+from bin.dataprocessing import main, process_csvfile, process_csvfile_chunks
+from bin.io_utils import read_processed
+from pandas.testing import assert_frame_equal
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def owid_params():
+    """Fixture with the parameters of the synthetic dataset."""
+    return {'n_countries': 7, 'n_days': 400, 'seed': 1}
+
+
+def test_process_csvfile_chunks(raw_csv):
+    """Unit test for function process_csvfile_chunks."""
+    filename = raw_csv
+    expected_df = process_csvfile(filename)
+    chunks = list(process_csvfile_chunks(filename, chunksize=333))
+    assert max(len(chunk) for chunk in chunks) == 333
+    actual_df = pd.concat(chunks, ignore_index=True)
+    assert_frame_equal(expected_df, actual_df)
+
+
+def test_main_chunksize(raw_csv, tmp_path):
+    """Unit test for the streaming mode of main, for csv
+    and parquet outputs."""
+    filename = raw_csv
+    for extension in ['csv', 'parquet']:
+        expected_file = str(tmp_path / f'expected_processed.{extension}')
+        actual_file = str(tmp_path / f'actual_processed.{extension}')
+        main(filename, expected_file)
+        main(filename, actual_file, chunksize=500)
+        assert_frame_equal(read_processed(expected_file),
+                           read_processed(actual_file))
+
+
+@pytest.mark.parametrize('option', [{'reportfile': 'report.csv'},
+                                    {'previous': 'processed.csv'},
+                                    {'snapshot': True},
+                                    {'metrics': ['new_cases']}])
+def test_main_chunksize_options(raw_csv, tmp_path, option):
+    """Unit test for main: the options of the in-memory processing are
+    rejected with chunksize."""
+    outfile = str(tmp_path / 'processed.csv')
+    with pytest.raises(ValueError):
+        main(raw_csv, outfile, chunksize=500, **option)
+
+
+def test_process_csvfile_chunks_dtypes(raw_csv, tmp_path):
+    """Unit test for function process_csvfile_chunks: the chunks have
+    the dtypes of the whole file (integers, integers with missing values
+    in one chunk only, numbers followed by strings)."""
+    raw_df = pd.read_csv(raw_csv)
+    raw_df['population'] = raw_df['population'].round().astype('int64')
+    raw_df['total_tests'] = raw_df['population']
+    raw_df.loc[len(raw_df) - 1, 'total_tests'] = None
+    raw_df['tests_units'] = raw_df['population'].astype(object)
+    raw_df.loc[len(raw_df) - 1, 'tests_units'] = 'people tested'
+    filename = str(tmp_path / 'owid-covid-data_int.csv')
+    raw_df.to_csv(filename, index=False)
+    expected_df = process_csvfile(filename)
+    assert expected_df['population'].dtype == 'int64'
+    actual_df = pd.concat(process_csvfile_chunks(filename, chunksize=333),
+                          ignore_index=True)
+    assert_frame_equal(expected_df, actual_df)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+The script contains a unit test for the incremental mode (--previous)
+of the component bin/dataprocessing.py: processing a new release against
+the previous output must give the same dataset as processing it from
+scratch.
+"""
+from bin.dataprocessing import main, process_csvfile_incremental
+from bin.benchmarks.synthetic_data import generate_owid_frame
+from bin.io_utils import read_processed
+from pandas.testing import assert_frame_equal
+
+
+def mock_releases(tmp_path):
+    """Helper function to create two releases of a small raw csv file:
+    the second one appends new dates, revises some values and drops
+    a country."""
+    old_df = generate_owid_frame(n_countries=6, n_days=300, seed=2)
+    new_df = generate_owid_frame(n_countries=6, n_days=330, seed=2)
+    new_df.loc[new_df.index[::17], 'new_cases'] += 1
+    new_df = new_df[new_df['location'] != new_df['location'].iloc[0]]
+    old_file = str(tmp_path / 'owid-covid-data-old.csv')
+    new_file = str(tmp_path / 'owid-covid-data-new.csv')
+    old_df.to_csv(old_file, index=False)
+    new_df.to_csv(new_file, index=False)
+    return old_file, new_file
+
+
+def test_process_csvfile_incremental(tmp_path):
+    """Unit test for function process_csvfile_incremental, with a csv
+    and a parquet previous output."""
+    old_file, new_file = mock_releases(tmp_path)
+    expected_file = str(tmp_path / 'expected_processed.csv')
+    main(new_file, expected_file)
+    for extension in ['csv', 'parquet']:
+        previous_file = str(tmp_path / f'previous_processed.{extension}')
+        main(old_file, previous_file)
+        actual_df = process_csvfile_incremental(new_file, previous_file)
+        actual_file = str(tmp_path / f'actual_processed_{extension}.csv')
+        actual_df.to_csv(actual_file, index=False)
+        assert_frame_equal(read_processed(expected_file),
+                           read_processed(actual_file))
+
+
+def test_main_previous(tmp_path):
+    """Unit test for the incremental mode of main."""
+    old_file, new_file = mock_releases(tmp_path)
+    previous_file = str(tmp_path / 'previous_processed.parquet')
+    expected_file = str(tmp_path / 'expected_processed.parquet')
+    actual_file = str(tmp_path / 'actual_processed.parquet')
+    main(old_file, previous_file)
+    main(new_file, expected_file)
+    main(new_file, actual_file, previous=previous_file)
+    assert_frame_equal(read_processed(expected_file),
+                       read_processed(actual_file))
@@ -6,7 +6,12 @@ and bin/workflow_1/dataprocessing_w1.py.
 """
 import pandas as pd
 from pandas.testing import assert_frame_equal
-from bin.workflow_1.dataprocessing_w1 import process_csvfile_w1
+from bin.workflow_1.dataprocessing_w1 import (process_csvfile_w1, sweep_w1,
+                                              process_csvfile_w1_chunks,
+                                              main, CAT_COLUMNS)
+from bin.snapshot import snapshot_tables
+from bin.io_utils import write_processed
+import pytest
 
 
 def create_expected_df(cat_column):
@@ -63,6 +68,78 @@ def test_process_csvfile_w1_population_density():
     run_test('population_density')
 
 
+@pytest.mark.parametrize('owid_params', [{'n_countries': 18, 'n_days': 600,
+                                          'seed': 3}], indirect=True)
+def test_process_csvfile_w1_all_columns(processed):
+    """Unit test for function process_csvfile_w1 with a list of columns:
+    one pass gives the same result as one run per column."""
+    _, df = processed
+    actual_df = process_csvfile_w1(df, CAT_COLUMNS, year=2021,
+                                   continent='Europe')
+    for cat_column in CAT_COLUMNS:
+        expected_df = process_csvfile_w1(df, cat_column, year=2021,
+                                         continent='Europe')
+        assert_frame_equal(expected_df, actual_df[expected_df.columns])
+    assert list(actual_df.columns[-4:]) == [f'{cat_column}_cat'
+                                            for cat_column in CAT_COLUMNS]
+
+
+@pytest.mark.parametrize('owid_params', [{'n_countries': 18, 'seed': 5}],
+                         indirect=True)
+def test_sweep_w1(processed):
+    """Unit test for function sweep_w1: each continent, year and factor
+    of the long table is the result of process_csvfile_w1."""
+    _, df = processed
+    sweep_df = sweep_w1(df)
+    assert set(sweep_df['year']) == {2020, 2021, 2022}
+    for (continent, year, factor), actual_df in sweep_df.groupby(
+            ['continent', 'year', 'factor']):
+        expected_df = process_csvfile_w1(df, factor, year=year,
+                                         continent=continent)
+        actual_df = actual_df.set_index(['month', 'location'])
+        assert_frame_equal(actual_df[['new_cases', 'new_deaths', 'value']],
+                           expected_df[['new_cases', 'new_deaths', factor]
+                                       ].rename(columns={factor: 'value'}))
+        assert (actual_df['cat'] == expected_df[f'{factor}_cat']).all()
+    # year and continent restrict the sweep
+    sweep_df = sweep_w1(df, ['median_age'], years=[2021],
+                        continents=['Asia'])
+    assert set(zip(sweep_df['continent'], sweep_df['year'],
+                   sweep_df['factor'])) == {('Asia', 2021, 'median_age')}
+
+
+@pytest.mark.parametrize('owid_params', [{'n_countries': 30, 'seed': 6}],
+                         indirect=True)
+def test_process_csvfile_w1_chunks(processed, tmp_path):
+    """Unit test for function process_csvfile_w1_chunks: with sketches
+    larger than the data the medians are exact and the chunks hold the
+    result of process_csvfile_w1."""
+    snapshot = str(tmp_path / 'owid-covid-data_processed_snapshot_month.csv')
+    write_processed(snapshot_tables(processed[1])['month'], snapshot)
+    expected_df = process_csvfile_w1(snapshot, CAT_COLUMNS, year=2021,
+                                     continent='Europe', snapshot=True)
+    chunks = list(process_csvfile_w1_chunks(snapshot, CAT_COLUMNS, 2021,
+                                            'Europe', chunksize=40, k=500))
+    assert len(chunks) > 1
+    actual_df = pd.concat(chunks).sort_index()
+    assert_frame_equal(expected_df, actual_df)
+
+
+@pytest.mark.parametrize('owid_params', [{'n_countries': 3, 'n_days': 60}],
+                         indirect=True)
+def test_chunksize_without_snapshot(processed_file, tmp_path):
+    """Unit test for function main: the chunks of the daily processed
+    dataset are not collapsed by month, chunksize requires snapshot (and
+    is not compact)."""
+    outfile = str(tmp_path / 'owid-covid-data_processed_w1.csv')
+    with pytest.raises(ValueError):
+        main(processed_file, outfile, CAT_COLUMNS, None, None,
+             chunksize=40)
+    with pytest.raises(ValueError):
+        main(processed_file, outfile, CAT_COLUMNS, None, None,
+             compact=True, snapshot=True, chunksize=40)
+
+
 if __name__ == "__main__":
     test_process_csvfile_w1_gdp_per_capita()
     test_process_csvfile_w1_life_expectancy()
@@ -7,7 +7,13 @@ bin/dataprocessing.py and bin/workflow_2/dataprocessing_w2.py.
 import pandas as pd
 from pandas.testing import assert_frame_equal
 from bin.dataprocessing import process_csvfile
-from bin.workflow_2.dataprocessing_w2 import process_csvfile_w2
+from bin.snapshot import snapshot_tables
+from bin.workflow_2.dataprocessing_w2 import (process_csvfile_w2,
+                                              aggregate_w2, main)
+from bin.workflow_2.barplotdeathscases_w2 import (barplot_by_continent,
+                                                  outcome_column)
+import matplotlib.pyplot as plt
+import pytest
 
 
 def test_process_csvfile_w2():
@@ -97,3 +103,50 @@ def test_integration():
     # check
     assert_frame_equal(expected_df_, actual_df_.iloc[:3], rtol=1e-3)
     assert_frame_equal(expected_df_n_, actual_df_n_.iloc[:3], rtol=1e-3)
+
+
+@pytest.mark.parametrize("owid_params", [{"n_days": 900, "seed": 2}],
+                         indirect=True)
+def test_aggregate_w2(processed):
+    """Unit test for function aggregate_w2: the raw and normalized
+    outcomes of every year are the ones of process_csvfile_w2 (per row
+    normalization), also from the yearly snapshot."""
+    _, df = processed
+    actual_df = aggregate_w2(df)
+    for normalize in [False, True]:
+        expected_df = df.copy()
+        if normalize:
+            for outcome in ["total_cases", "total_deaths"]:
+                expected_df[outcome] /= expected_df["population"]
+        expected_df = expected_df.groupby(
+            ["continent", "year", "location"]).agg(
+            {"total_cases": "last", "total_deaths": "last",
+             "population": "last"}).groupby(["year", "continent"]).sum()
+        columns = [outcome_column(outcome, normalize)
+                   for outcome in ["total_cases", "total_deaths"]]
+        assert_frame_equal(
+            actual_df[columns + ["population"]].set_axis(
+                expected_df.columns, axis=1), expected_df)
+        assert_frame_equal(process_csvfile_w2(df, normalize),
+                           expected_df)
+    snapshot = snapshot_tables(df)["year"]
+    assert_frame_equal(aggregate_w2(snapshot, snapshot=True), actual_df)
+
+
+@pytest.mark.parametrize("owid_params", [{"n_days": 900, "seed": 2}],
+                         indirect=True)
+def test_barplot_combined(processed_file, tmp_path):
+    """Integration test: the bar plots of every year and normalization
+    are drawn from the combined output of dataprocessing_w2."""
+    outfile = str(tmp_path / "owid-covid-data_processed_w2.csv")
+    main(processed_file, outfile, combined=True)
+    data_w2 = pd.read_csv(outfile)
+    for year in data_w2["year"].unique():
+        for normalize in [False, True]:
+            fig = barplot_by_continent(data_w2, "total_cases", year,
+                                       normalize)
+            heights = [bar.get_height() for bar in fig.axes[0].patches]
+            expected = data_w2.loc[data_w2["year"] == year,
+                                   outcome_column("total_cases", normalize)]
+            assert heights == list(expected)
+            plt.close(fig)
@@ -4,10 +4,15 @@ The script contains a unit test for the component bin/dataprocessing_w3.py
 and an integration test for the components bin/dataprocessing.py
 and bin/workflow_3/dataprocessing_w3.py.
 """
-from bin.workflow_3.dataprocessing_w3 import process_csvfile_w3
+from bin.workflow_3.dataprocessing_w3 import (process_csvfile_w3,
+                                              process_places_w3, read_place,
+                                              main)
+from bin.workflow_3.trendplot_w3 import main as trendplot_main
 from bin.dataprocessing import process_csvfile
 import pandas as pd
 import numpy as np
+import pytest
+import os
 from pandas.testing import assert_frame_equal
 
 
@@ -88,3 +93,60 @@ def test_integration():
     # check
     assert_frame_equal(expected_df_eu, actual_df_eu.iloc[:3], rtol=1e-3)
     assert_frame_equal(expected_df_de, actual_df_de.iloc[:3], rtol=1e-3)
+
+
+@pytest.fixture
+def owid_params():
+    """Fixture with the parameters of the synthetic dataset."""
+    return {'n_countries': 12, 'n_days': 800, 'seed': 3}
+
+
+@pytest.mark.parametrize('time', ['month', 'semester'])
+def test_process_places_w3(processed_file, time):
+    """Unit test for function process_places_w3: the rows of each place
+    are the ones of process_csvfile_w3 for that place."""
+    df = pd.read_csv(processed_file)
+    places = process_places_w3(df, time).reset_index()
+    for location in df['location'].unique()[:4]:
+        expected_df = process_csvfile_w3(df, time, locations=[location])
+        assert_frame_equal(read_place(places, location),
+                           expected_df.reset_index())
+    for continent in df['continent'].unique():
+        expected_df = process_csvfile_w3(df, time, continents=[continent])
+        assert_frame_equal(read_place(places, continent),
+                           expected_df.reset_index())
+    assert_frame_equal(process_csvfile_w3(df, time),
+                       process_csvfile_w3(df, time, continents=['Europe']))
+
+
+def test_process_csvfile_w3_places(processed_file):
+    """Unit test for function process_csvfile_w3: the outcomes of a list
+    of locations are the sums of the ones of each location."""
+    df = pd.read_csv(processed_file)
+    locations = list(df.loc[df['continent'] == 'Asia', 'location'].unique())
+    expected_df = sum(process_csvfile_w3(df, locations=[location])
+                      [['new_deaths', 'new_cases', 'new_vaccinations']]
+                      for location in locations)
+    actual_df = process_csvfile_w3(df, locations=locations)
+    assert_frame_equal(actual_df[expected_df.columns], expected_df)
+    assert_frame_equal(actual_df,
+                       process_csvfile_w3(df, continents=['Asia']))
+
+
+def test_read_place_missing(processed_file):
+    """Unit test for function read_place: place not in the dataset."""
+    places = process_places_w3(processed_file).reset_index()
+    with pytest.raises(ValueError):
+        read_place(places, 'Atlantis')
+
+
+def test_all_places_integration(processed_file, tmp_path):
+    """Integration test: the trend plot of any place is drawn from the
+    saved output of dataprocessing_w3.py --all_places."""
+    outfile = str(tmp_path / 'owid-covid-data_processed_w3_places.csv')
+    main(processed_file, outfile, 'month', False, all_places=True)
+    for place in ['Asia', 'Country 000']:
+        pngfile = str(tmp_path / f'trendplot_{place}.png')
+        trendplot_main(outfile, pngfile, 'new_deaths', 'new_cases', 'month',
+                       place)
+        assert os.path.getsize(pngfile) > 0
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+The script contains the import-time budget test of the components:
+importing them (e.g. for --help or in the tests) must not load the
+plotting and statistics libraries, which are imported when needed.
+"""
+import subprocess
+import sys
+import os
+import pytest
+
+
+MODULES = ['bin.dataprocessing', 'bin.runner', 'bin.plot_renderer',
+           'bin.workflow_1.dataprocessing_w1',
+           'bin.workflow_1.mann_whitney_u_w1',
+           'bin.workflow_1.box_plot_w1', 'bin.workflow_1.line_plot_w1',
+           'bin.workflow_2.dataprocessing_w2',
+           'bin.workflow_2.barplotdeathscases_w2',
+           'bin.workflow_3.dataprocessing_w3',
+           'bin.workflow_3.correlationtest_w3',
+           'bin.workflow_3.lagscan_w3',
+           'bin.workflow_3.regressionplot_w3', 'bin.workflow_3.trendplot_w3']
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'scipy']
+# the components are imported as bin.* from the root of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+@pytest.mark.parametrize('module', MODULES)
+def test_import_budget(module):
+    """Unit test for the import of module, in a new interpreter."""
+    code = (f'import sys, {module}\n'
+            f'print(",".join(m for m in {HEAVY_MODULES} '
+            f'if m in sys.modules))')
+    result = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True, cwd=ROOT)
+    assert result.stdout.strip() == ''
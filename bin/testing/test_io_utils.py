@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component bin/io_utils.py.
+"""
+from bin.io_utils import (read_processed, write_processed, is_supported,
+                          read_processed_chunks)
+from pandas.testing import assert_frame_equal
+import pandas as pd
+import pytest
+
+
+def create_processed_df():
+    """Helper function to create a small processed dataframe."""
+    return pd.DataFrame({
+        'continent': ['Europe', 'Europe', 'Asia'],
+        'location': ['Germany', 'Germany', 'Japan'],
+        'date': pd.to_datetime(['2021-06-30', '2021-07-01', '2021-07-01']),
+        'new_cases': [10.0, None, 3.5],
+        'year': [2021, 2021, 2021],
+        'month': pd.period_range('2021-06', periods=2, freq='M')[[0, 1, 1]],
+        'semester': [3, 4, 4],
+    })
+
+
+def test_parquet_roundtrip(tmp_path):
+    """Unit test for the typed columnar format: the schema is
+    categorical for strings, integer codes for the periods."""
+    df = create_processed_df()
+    outfile = str(tmp_path / 'owid-covid-data_processed.parquet')
+    write_processed(df, outfile)
+    actual_df = read_processed(outfile)
+    assert isinstance(actual_df['location'].dtype, pd.CategoricalDtype)
+    assert actual_df['year'].dtype == 'int32'
+    expected_df = df.astype({'continent': 'category',
+                             'location': 'category',
+                             'year': 'int32', 'semester': 'int32'})
+    assert_frame_equal(expected_df, actual_df)
+
+
+@pytest.mark.parametrize('extension', ['parquet', 'npy'])
+def test_float32_kept(tmp_path, extension):
+    """Unit test for the columnar formats: the float32 columns of the
+    compact dtypes are written as float32."""
+    df = create_processed_df().astype({'new_cases': 'float32'})
+    outfile = str(tmp_path / f'owid-covid-data_processed.{extension}')
+    write_processed(df, outfile)
+    assert read_processed(outfile)['new_cases'].dtype == 'float32'
+
+
+def test_read_columns_subset(tmp_path):
+    """Unit test for read_processed: only the requested columns are
+    loaded, in the order of the file, missing ones are skipped."""
+    df = create_processed_df()
+    for extension in ['csv', 'parquet']:
+        outfile = str(tmp_path / f'owid-covid-data_processed.{extension}')
+        write_processed(df, outfile)
+        actual_df = read_processed(outfile,
+                                   columns=['year', 'location', 'missing'])
+        assert list(actual_df.columns) == ['location', 'year']
+
+
+def test_unsupported_format():
+    """Unit test for the check on the file extension."""
+    assert is_supported('data/owid-covid-data_processed.parquet')
+    assert not is_supported('data/owid-covid-data_processed.txt')
+    with pytest.raises(OSError):
+        write_processed(create_processed_df(), 'processed.txt')
+
+
+def test_partitioned_dataset(tmp_path):
+    """Unit test for the partitioned parquet dataset: filters on the
+    partition columns select the partitions, rows without continent
+    are kept in the default partition."""
+    df = create_processed_df()
+    df.loc[2, 'continent'] = None
+    outfile = str(tmp_path / 'owid-covid-data_processed.parquet')
+    write_processed(df, outfile, partition_cols=['continent', 'year'])
+    assert (tmp_path / 'owid-covid-data_processed.parquet'
+            / 'continent=Europe' / 'year=2021').is_dir()
+    actual_df = read_processed(outfile, columns=['location', 'year'],
+                               filters=[('continent', '==', 'Europe'),
+                                        ('year', '==', 2021)])
+    assert list(actual_df['location']) == ['Germany', 'Germany']
+    assert actual_df['year'].dtype == 'int32'
+    assert len(read_processed(outfile)) == 3
+
+
+def test_read_processed_chunks(tmp_path):
+    """Unit test for read_processed_chunks: the chunks hold the rows
+    and columns of read_processed, at most chunksize rows each."""
+    df = create_processed_df()
+    filters = [('year', '==', 2021), ('location', '!=', 'Japan')]
+    columns = ['location', 'new_cases', 'year']
+    for extension in ['csv', 'parquet', 'npy']:
+        outfile = str(tmp_path / f'owid-covid-data_processed.{extension}')
+        write_processed(df, outfile)
+        chunks = list(read_processed_chunks(outfile, 1, columns, filters))
+        assert all(len(chunk) <= 1 for chunk in chunks)
+        actual_df = pd.concat(chunks, ignore_index=True)
+        expected_df = read_processed(outfile, columns, filters)
+        assert_frame_equal(expected_df.reset_index(drop=True),
+                           actual_df.astype(expected_df.dtypes))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component
+bin/workflow_3/lagscan_w3.py and an integration test with
+bin/workflow_3/dataprocessing_w3.py, on a small synthetic dataset.
+"""
+from bin.workflow_3.lagscan_w3 import lag_scan, best_lags, main
+from bin.io_utils import read_processed
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def owid_params():
+    """Fixture with the parameters of the synthetic dataset."""
+    return {'n_countries': 12, 'n_days': 1000, 'seed': 8}
+
+
+@pytest.fixture
+def sparse_places(places):
+    """Fixture with the places of workflow 3 with some missing
+    periods."""
+    return places.drop(index=places.sample(30, random_state=0).index)
+
+
+def lagged_pairs(df, var1, var2, lag):
+    """Helper function: the pairs (var1 at t, var2 at t + lag) of df
+    without missing values."""
+    periods = pd.PeriodIndex(df['month'].astype(str), freq='M').asi8
+    x = pd.Series(df[var1].to_numpy(), index=periods)
+    y = pd.Series(df[var2].to_numpy(), index=periods - lag)
+    pairs = pd.concat([x, y], axis=1, join='inner')
+    return pairs.replace([np.inf, -np.inf], np.nan).dropna()
+
+
+def test_lag_scan(sparse_places):
+    """Unit test for function lag_scan: the coefficient of each lag is
+    Pearson's coefficient of the overlapping periods (scipy)."""
+    from scipy.stats import pearsonr
+    scan = lag_scan(sparse_places, 'month', max_lag=5, by=['place'])
+    assert len(scan) == sparse_places['place'].nunique() * 6 * 11
+    for row in scan.sample(100, random_state=0).itertuples():
+        place_df = sparse_places[sparse_places['place'] == row.place]
+        pairs = lagged_pairs(place_df, row.var1, row.var2, row.lag)
+        assert row.n == len(pairs)
+        expected = pearsonr(pairs.iloc[:, 0], pairs.iloc[:, 1])
+        assert row.statistic == pytest.approx(expected.statistic)
+        assert row.pvalue == pytest.approx(expected.pvalue, abs=1e-12)
+
+
+def test_best_lags():
+    """Unit test for function best_lags: the lag of a shifted series is
+    found and significant, a constant series has no coefficient."""
+    rng = np.random.default_rng(0)
+    cases = rng.normal(size=40).cumsum()
+    df = pd.DataFrame({'semester': np.arange(40), 'new_cases': cases,
+                       'new_deaths': np.roll(cases, 3)
+                       + rng.normal(scale=0.1, size=40),
+                       'new_vaccinations': 1.0})
+    scan = lag_scan(df, 'semester',
+                    ['new_cases', 'new_deaths', 'new_vaccinations'])
+    assert scan.loc[scan['var2'] == 'new_vaccinations',
+                    'statistic'].isna().all()
+    best = best_lags(scan).set_index(['var1', 'var2'])
+    assert len(best) == 1
+    assert best.loc[('new_cases', 'new_deaths'), 'lag'] == 3
+    assert best.loc[('new_cases', 'new_deaths'), 'significant']
+    assert best.loc[('new_cases', 'new_deaths'), 'pvalue_adjusted'] == \
+        pytest.approx(best.loc[('new_cases', 'new_deaths'), 'pvalue'] * 13)
+
+
+def test_lagscan_main(sparse_places, tmp_path):
+    """Integration test: lag scan of every place of the output of
+    dataprocessing_w3.py --all_places."""
+    csvfile = str(tmp_path / 'owid-covid-data_processed_w3_places.csv')
+    sparse_places.to_csv(csvfile, index=False)
+    outfile = str(tmp_path / 'lagscan.csv')
+    scanfile = str(tmp_path / 'lagscan_all.csv')
+    main(csvfile, outfile, 'month', max_lag=4, all_places=True,
+         scanfile=scanfile)
+    best = read_processed(outfile)
+    assert len(best) == sparse_places['place'].nunique() * 6
+    assert best['lag'].between(-4, 4).all()
+    assert len(read_processed(scanfile)) == len(best) * 9
+    with pytest.raises(ValueError):
+        lag_scan(sparse_places, 'month', ['new_cases', 'metric'])
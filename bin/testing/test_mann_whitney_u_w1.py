@@ -3,7 +3,16 @@
 The script contains a unit test for the component
 bin/workflow_1/mann_whitney_u_w1.py.
 """
-from bin.workflow_1.mann_whitney_u_w1 import mann_whitney_u_test
+from bin.workflow_1.mann_whitney_u_w1 import (mann_whitney_u_test,
+                                              mann_whitney_u_batch,
+                                              permutation_test,
+                                              permutation_test_batch,
+                                              get_executor)
+from scipy.stats import mannwhitneyu
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import numpy as np
+import pytest
 import os
 import csv
 import logging
@@ -41,3 +50,138 @@ def test_mann_whitney_u_test():
     assert expected_u == actual_u
     assert expected_p == actual_p
     os.remove(filename)
+
+
+def test_mann_whitney_u_batch():
+    """Unit test for function mann_whitney_u_batch: the results of
+    all the groups match scipy.stats.mannwhitneyu, for small samples
+    (exact p-values), ties and large samples (asymptotic p-values)."""
+    rng = np.random.default_rng(0)
+    sizes = [3, 5, 8, 12, 40, 200]
+    frames = []
+    for i, size in enumerate(sizes):
+        for outcome in ['new_cases', 'new_deaths']:
+            values = rng.normal(size=size)
+            if outcome == 'new_deaths':
+                values = values.round()
+            frames.append(pd.DataFrame({
+                'continent': 'Europe', 'year': 2020 + i, 'outcome': outcome,
+                'cat': np.arange(size) % 2, 'value': values}))
+    df = pd.concat(frames)
+    results = mann_whitney_u_batch(df, ['continent', 'year', 'outcome'],
+                                   'cat', 'value')
+    assert len(results) == 2 * len(sizes)
+    for (continent, year, outcome), result in results.iterrows():
+        group = df[(df['year'] == year) & (df['outcome'] == outcome)]
+        expected_u, expected_p = mannwhitneyu(
+            group.loc[group['cat'] == 1, 'value'],
+            group.loc[group['cat'] == 0, 'value'])
+        assert result['u_statistic'] == expected_u
+        assert np.isclose(result['p_value'], expected_p, rtol=1e-12)
+
+
+def test_mann_whitney_u_batch_outcomes():
+    """Unit test for function mann_whitney_u_batch with a list of
+    y variables and groups without one of the samples or with NaN."""
+    df = pd.DataFrame({'year': [2020] * 5 + [2021] * 3 + [2022] * 3,
+                       'cat': [1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 0],
+                       'new_cases': [13, 27, 9, 31, 47, 1, 2, 3,
+                                     1, np.nan, 2],
+                       'new_deaths': [1, 2, 3, 4, 5, 1, 2, 3, 1, 2, 3]})
+    results = mann_whitney_u_batch(df, ['year'], 'cat',
+                                   ['new_cases', 'new_deaths'])
+    assert results.index.names == ['year', 'outcome']
+    assert results.loc[(2020, 'new_cases'), 'u_statistic'] == 1
+    assert results.loc[(2020, 'new_cases'), 'p_value'] == 0.4
+    assert results.loc[(2020, 'new_deaths'), 'n1'] == 3
+    assert results.loc[(2020, 'new_deaths'), 'n0'] == 2
+    assert results.loc[(2021, 'new_cases'), ['u_statistic', 'p_value']
+                       ].isna().all()
+    assert results.loc[(2022, 'new_cases'), ['u_statistic', 'p_value']
+                       ].isna().all()
+    assert results.loc[(2022, 'new_deaths'), 'u_statistic'] == 0
+
+
+def mock_country_data(n_countries, n_months, shift, seed=0):
+    """Helper function to create monthly data of countries, half of
+    them labelled 1, with the outcome of those shifted by shift."""
+    rng = np.random.default_rng(seed)
+    location = np.repeat([f'Country {i}' for i in range(n_countries)],
+                         n_months)
+    cat = np.repeat(np.arange(n_countries) % 2, n_months)
+    level = np.repeat(rng.normal(size=n_countries), n_months)
+    return pd.DataFrame({
+        'location': location, 'cat': cat,
+        'new_cases': level + shift * cat
+        + rng.normal(scale=0.1, size=len(cat))})
+
+
+def test_permutation_test_exact():
+    """Unit test for function permutation_test with few countries:
+    all the assignments are enumerated. The outcome separates the
+    countries, so only the observed assignment and its mirror are
+    as extreme: p = 2 / 20."""
+    df = mock_country_data(6, 12, shift=10)
+    statistic, p_value, n_permutations = permutation_test(
+        df, 'cat', 'new_cases')
+    assert statistic == 0.5
+    assert n_permutations == 20
+    assert p_value == pytest.approx(0.1)
+
+
+def test_permutation_test_seeded():
+    """Unit test for function permutation_test: the result depends only
+    on the seed (not on the pool of workers), the test stops early
+    when the decision is settled."""
+    df = mock_country_data(40, 12, shift=0)
+    result = permutation_test(df, 'cat', 'new_cases', n_permutations=5000,
+                              batch_size=200, seed=1)
+    assert result[2] < 5000
+    assert result[1] > 0.05
+    with get_executor(2) as executor:
+        assert permutation_test(df, 'cat', 'new_cases', n_permutations=5000,
+                                batch_size=200, seed=1,
+                                executor=executor) == result
+    df = mock_country_data(40, 12, shift=3)
+    _, p_value, n_permutations = permutation_test(
+        df, 'cat', 'new_cases', n_permutations=5000, batch_size=200)
+    assert p_value < 0.05
+    assert n_permutations < 5000
+
+
+def test_permutation_test_lazy():
+    """Unit test for function permutation_test: with an executor the
+    batches are submitted lazily, the ones after an early stop are not
+    submitted."""
+    class CountingExecutor(ThreadPoolExecutor):
+        """Thread pool counting the submitted calls."""
+        submitted = 0
+
+        def submit(self, *args, **kwargs):
+            self.submitted += 1
+            return super().submit(*args, **kwargs)
+
+    df = mock_country_data(40, 12, shift=0)
+    expected = permutation_test(df, 'cat', 'new_cases', n_permutations=5000,
+                                batch_size=200, seed=1)
+    with CountingExecutor(2) as executor:
+        result = permutation_test(df, 'cat', 'new_cases',
+                                  n_permutations=5000, batch_size=200,
+                                  seed=1, executor=executor, max_pending=2)
+    assert result == expected
+    assert executor.submitted <= result[2] // 200 + 2 < 25
+
+
+def test_permutation_test_batch():
+    """Unit test for function permutation_test_batch: one test per
+    group, the label must be constant within each country."""
+    df = pd.concat([mock_country_data(10, 6, shift=0).assign(year=2020),
+                    mock_country_data(10, 6, shift=3).assign(year=2021)])
+    results = permutation_test_batch(df, ['year'], 'cat', 'new_cases',
+                                     n_permutations=999)
+    assert list(results.index) == [2020, 2021]
+    assert results.loc[2020, 'p_value'] > 0.05
+    assert results.loc[2021, 'p_value'] < 0.05
+    df['cat'] = np.arange(len(df)) % 2
+    with pytest.raises(ValueError):
+        permutation_test_batch(df, ['year'], 'cat', 'new_cases')
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component bin/memory_utils.py.
+"""
+from bin.memory_utils import compact_dtypes, memory_report
+from pandas.testing import assert_frame_equal
+import pandas as pd
+
+
+def create_processed_df():
+    """Helper function to create a small processed dataframe."""
+    return pd.DataFrame({
+        'continent': ['Europe', 'Europe', 'Europe', 'Asia'],
+        'location': ['Germany', 'Germany', 'Italy', 'Japan'],
+        'new_cases': [10.0, None, 7.0, 3.5],
+        'median_age': [46.6, 46.6, 47.9, 48.2],
+        'year': [2021, 2021, 2021, 2021],
+        'semester': [3, 4, 4, 4],
+        'median_age_cat': [0, 0, 1, 1],
+    })
+
+
+def test_compact_dtypes():
+    """Unit test for function compact_dtypes: the dtypes are compact,
+    the values are unchanged."""
+    df = create_processed_df()
+    actual_df = compact_dtypes(df)
+    expected_dtypes = pd.Series({
+        'continent': 'category', 'location': 'category',
+        'new_cases': 'float32', 'median_age': 'float64',
+        'year': 'int16', 'semester': 'int8', 'median_age_cat': 'int8'})
+    assert (actual_df.dtypes.astype(str) == expected_dtypes).all()
+    assert_frame_equal(df, actual_df, check_dtype=False,
+                       check_categorical=False)
+    assert compact_dtypes(df, downcast_floats=False)['new_cases'].dtype \
+        == 'float64'
+
+
+def test_memory_report():
+    """Unit test for function memory_report."""
+    df = create_processed_df()
+    report = memory_report(df)
+    assert list(report.index) == list(df.columns) + ['total']
+    assert report.loc['total', 'bytes'] == \
+        df.memory_usage(index=False, deep=True).sum()
+    assert report.loc['year', 'compact_bytes'] == 2 * len(df)
+    assert report.loc['total', 'saving'] > 0
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component bin/plot_renderer.py,
+on a small synthetic dataset.
+"""
+from bin.plot_renderer import render, render_plots
+from bin.workflow_1.dataprocessing_w1 import process_csvfile_w1
+from bin.workflow_2.dataprocessing_w2 import aggregate_w2
+from bin.workflow_3.dataprocessing_w3 import process_csvfile_w3
+import matplotlib.pyplot as plt
+import pytest
+import os
+
+
+@pytest.fixture
+def owid_params():
+    """Fixture with the parameters of the synthetic dataset."""
+    return {'n_countries': 12, 'n_days': 800, 'seed': 3}
+
+
+@pytest.fixture
+def specs(processed, tmp_path):
+    """Fixture with the specs of plots of every kind (half of them
+    reading the dataset from a file)."""
+    _, df = processed
+    year = int(df['year'].min()) + 1
+    w1 = process_csvfile_w1(df, 'median_age', year, 'Europe').reset_index()
+    w1_file = str(tmp_path / 'w1.csv')
+    w1.to_csv(w1_file, index=False)
+    w2 = aggregate_w2(df).reset_index()
+    w3 = process_csvfile_w3(df, 'month').reset_index()
+    params = [('boxplot', w1, {'group': 'median_age_cat',
+                               'y_variable': 'new_cases'}),
+              ('lineplot', w1_file, {'group': 'median_age_cat',
+                                     'x_variable': 'month',
+                                     'y_variable': 'new_cases'}),
+              ('barplot', w2, {'outcome': 'total_cases', 'year': year}),
+              ('barplot', w2, {'outcome': 'total_deaths', 'year': year,
+                               'normalize': True}),
+              ('regplot', w3, {'x': 'new_vaccinations',
+                               'y': 'deaths_over_cases'}),
+              ('trendplot', w3, {'y1': 'new_deaths', 'y2': 'new_cases',
+                                 'x': 'month'})]
+    return [{'kind': kind, 'data': data, **kwargs,
+             'output': str(tmp_path / f'{kind}_{j}_{i}.png')}
+            for j, (kind, data, kwargs) in enumerate(params)
+            for i in range(4)]
+
+
+def test_render_plots(specs):
+    """Unit test for function render_plots: every plot is saved and no
+    figure is left open."""
+    outputs = render_plots(specs)
+    assert outputs == [spec['output'] for spec in specs]
+    for output in outputs:
+        assert os.path.getsize(output) > 0
+    assert plt.get_fignums() == []
+
+
+def test_render_plots_workers(specs):
+    """Unit test for function render_plots: the plots rendered by a
+    pool of processes are the same as the ones rendered in-process."""
+    outputs = render_plots(specs)
+    expected = {}
+    for output in outputs:
+        with open(output, 'rb') as file:
+            expected[output] = file.read()
+        os.remove(output)
+    assert render_plots(specs, workers=2) == outputs
+    for output in outputs:
+        with open(output, 'rb') as file:
+            assert file.read() == expected[output]
+
+
+def test_render_invalid_kind(specs):
+    """Unit test for function render: invalid kind of plot."""
+    with pytest.raises(ValueError):
+        render({**specs[0], 'kind': 'pieplot'})
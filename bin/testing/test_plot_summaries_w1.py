@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component
+bin/workflow_1/plot_summaries_w1.py and integration tests with the
+preprocessing and the plots of workflow 1, on a small synthetic dataset.
+"""
+from bin.workflow_1.plot_summaries_w1 import (line_summary, box_summary,
+                                              read_line_sums, read_box_stats,
+                                              summary_file, BOX_STATS,
+                                              plot_summaries_chunks,
+                                              box_summary_chunks)
+from bin.quantile_sketch import error_bound, sketch_groups
+from bin.workflow_1.dataprocessing_w1 import main, CAT_COLUMNS
+from bin.workflow_1.box_plot_w1 import draw_boxplot
+from bin.workflow_1.line_plot_w1 import draw_lineplot
+from pandas.testing import assert_frame_equal
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+import os
+
+
+GROUPS = [f'{column}_cat' for column in CAT_COLUMNS]
+OUTCOMES = ['new_cases', 'new_deaths']
+
+
+@pytest.fixture
+def owid_params():
+    """Fixture with the parameters of the synthetic dataset."""
+    return {'n_countries': 20, 'n_days': 900, 'seed': 4}
+
+
+@pytest.fixture
+def processed_w1(processed_file, tmp_path):
+    """Fixture with the output of dataprocessing_w1.py (year 2021,
+    Europe) on the synthetic processed dataset."""
+    outfile = str(tmp_path / 'owid-covid-data_processed_w1.csv')
+    df = main(processed_file, outfile, CAT_COLUMNS, 2021, 'Europe',
+              summaries=True).reset_index()
+    return outfile, df
+
+
+def test_line_summary(processed_w1):
+    """Unit test for function line_summary: the sums of the line plots."""
+    _, df = processed_w1
+    summary = line_summary(df, GROUPS, OUTCOMES)
+    for group in GROUPS:
+        for outcome in OUTCOMES:
+            expected_df = df.groupby(['month', group])[outcome].sum() \
+                .unstack()
+            expected_df.index = expected_df.index.astype(str)
+            assert_frame_equal(
+                read_line_sums(summary, group, 'month', outcome),
+                expected_df, check_names=False)
+
+
+def test_box_summary(processed_w1):
+    """Unit test for function box_summary: the statistics are the ones
+    of matplotlib, also with outliers and missing values."""
+    from matplotlib.cbook import boxplot_stats
+    _, df = processed_w1
+    df.loc[::7, 'new_cases'] *= 10
+    df.loc[::11, 'new_deaths'] = np.nan
+    summary = box_summary(df, GROUPS, OUTCOMES)
+    assert (summary['stat'] == 'flier').any()
+    for group in GROUPS:
+        for outcome in OUTCOMES:
+            stats = read_box_stats(summary, group, outcome)
+            assert [box['label'] for box in stats] == ['0', '1']
+            for cat, box in enumerate(stats):
+                values = df.loc[df[group] == cat, outcome].dropna()
+                expected = boxplot_stats(values.to_numpy())[0]
+                for stat in BOX_STATS:
+                    assert box[stat] == pytest.approx(expected[stat])
+                assert np.array_equal(np.sort(box['fliers']),
+                                      np.sort(expected['fliers']))
+
+
+def test_plot_summaries_chunks(processed_w1):
+    """Unit test for function plot_summaries_chunks: the summaries of
+    the chunks are the exact ones when the sketches are larger than the
+    groups, otherwise the quartiles are within the error bound."""
+    _, df = processed_w1
+    df = df.loc[df.index.repeat(20)].reset_index(drop=True)
+    df['new_cases'] += np.arange(len(df))
+
+    def read_chunks():
+        return (df.iloc[start:start + 500]
+                for start in range(0, len(df), 500))
+
+    exact = box_summary(df, GROUPS, OUTCOMES)
+    summaries = plot_summaries_chunks(read_chunks, GROUPS, OUTCOMES, k=2000)
+    assert_frame_equal(summaries['lines'], line_summary(df, GROUPS, OUTCOMES)
+                       .sort_values(['group', 'month', 'cat'],
+                                    ignore_index=True))
+    assert_frame_equal(summaries['boxes'], exact)
+    approximate = plot_summaries_chunks(read_chunks, GROUPS, OUTCOMES,
+                                        k=50)['boxes']
+    for group in GROUPS:
+        for box in read_box_stats(approximate, group, 'new_cases'):
+            values = np.sort(df.loc[df[group] == int(box['label']),
+                                    'new_cases'])
+            for stat, q in [('q1', 0.25), ('med', 0.5), ('q3', 0.75)]:
+                rank = np.searchsorted(values, box[stat], side='right')
+                assert abs(rank / len(values) - q) <= error_bound(50)
+
+
+def test_box_summary_chunks_seeds(processed_w1, monkeypatch):
+    """Unit test for function box_summary_chunks: the sketches of each
+    chunk have their own seed."""
+    import bin.workflow_1.plot_summaries_w1 as plot_summaries_w1
+    _, df = processed_w1
+    seeds = []
+
+    def recording_sketch_groups(*args, seed=0, **kwargs):
+        seeds.append(seed)
+        return sketch_groups(*args, seed=seed, **kwargs)
+
+    monkeypatch.setattr(plot_summaries_w1, 'sketch_groups',
+                        recording_sketch_groups)
+    box_summary_chunks(lambda: (df.iloc[start:start + 10]
+                                for start in range(0, len(df), 10)),
+                       GROUPS, OUTCOMES, k=50, seed=3)
+    assert len(seeds) > 1
+    assert seeds == [[3, number] for number in range(len(seeds))]
+
+
+def test_read_box_stats_missing(processed_w1):
+    """Unit test for function read_box_stats: missing outcome."""
+    outfile, _ = processed_w1
+    with pytest.raises(KeyError):
+        read_box_stats(summary_file(outfile, 'boxes'), GROUPS[0], 'y')
+
+
+def test_draw_from_summaries(processed_w1, tmp_path):
+    """Integration test: the plots are drawn from the saved summaries."""
+    outfile, _ = processed_w1
+    for group in GROUPS:
+        boxplot = str(tmp_path / f'box_{group}.png')
+        draw_boxplot(summary_file(outfile, 'boxes'), group, 'new_cases',
+                     boxplot, summary=True)
+        lineplot = str(tmp_path / f'line_{group}.png')
+        draw_lineplot(summary_file(outfile, 'lines'), group, 'month',
+                      'new_cases', lineplot, summary=True)
+        assert os.path.getsize(boxplot) > 0
+        assert os.path.getsize(lineplot) > 0
+    assert plt.get_fignums() == []
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component bin/quantile_sketch.py.
+"""
+from bin.quantile_sketch import (KLLSketch, merge_sketches, sketch_groups,
+                                 error_bound)
+import pandas as pd
+import numpy as np
+import pytest
+
+
+QUANTILES = np.linspace(0.01, 0.99, 99)
+
+
+def rank_error(values, estimates, quantiles=QUANTILES):
+    """Helper function: largest distance between the requested
+    quantiles and the ranks of the estimates among values (a range of
+    ranks for tied values)."""
+    values = np.sort(values)
+    low = np.searchsorted(values, estimates, side='left') / len(values)
+    high = np.searchsorted(values, estimates, side='right') / len(values)
+    return np.maximum.reduce([low - quantiles, quantiles - high,
+                              np.zeros(len(quantiles))]).max()
+
+
+def test_exact_sketch():
+    """Unit test for a sketch without compactions: the quantiles are
+    the ones of np.quantile, NaN are ignored."""
+    values = np.array([5.0, np.nan, 1.0, 3.0, 2.0, 8.0])
+    sketch = KLLSketch(k=8).update(values)
+    assert sketch.is_exact()
+    assert len(sketch) == 5
+    assert np.array_equal(sketch.quantile([0.25, 0.5, 0.75]),
+                          np.nanquantile(values, [0.25, 0.5, 0.75]))
+    assert np.isnan(KLLSketch().quantile(0.5))
+    with pytest.raises(ValueError):
+        KLLSketch(k=4)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_merged_sketches(seed):
+    """Unit test for merge_sketches: the partial sketches of the chunks
+    of a stream (sorted, skewed or random) combine into quantiles within
+    the error bound, and the sketch stays small."""
+    rng = np.random.default_rng(seed)
+    for values in [np.arange(100000.0), rng.lognormal(size=100000),
+                   rng.integers(0, 50, size=100000).astype(float)]:
+        partials = [KLLSketch(seed=seed + i).update(chunk)
+                    for i, chunk in enumerate(np.array_split(values, 37))]
+        merged = merge_sketches(partials, seed=seed)
+        assert len(merged) == len(values)
+        assert sum(map(len, merged.levels)) < 1000
+        assert rank_error(values, merged.quantile(QUANTILES)) \
+            <= error_bound()
+        assert merged.quantile(0) == values.min()
+        assert merged.quantile(1) == values.max()
+
+
+def test_rank():
+    """Unit test for method rank."""
+    values = np.random.default_rng(0).normal(size=50000)
+    sketch = KLLSketch().update(values)
+    for value in [-1.0, 0.0, 2.0]:
+        assert sketch.rank(value) == pytest.approx(
+            np.mean(values <= value), abs=error_bound())
+
+
+def test_sketch_groups():
+    """Unit test for function sketch_groups: one sketch per group."""
+    df = pd.DataFrame({'key': ['a', 'b', 'a', 'b', 'a'],
+                       'value': [1.0, 10.0, 3.0, 20.0, 2.0]})
+    sketches = sketch_groups(df, 'key', 'value')
+    assert sorted(sketches) == ['a', 'b']
+    assert sketches['a'].quantile(0.5) == 2.0
+    assert sketches['b'].quantile(0.5) == 15.0
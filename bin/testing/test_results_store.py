@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component bin/results_store.py
+and integration tests with the hypothesis tests of workflows 1 and 3.
+"""
+from bin.results_store import (data_hash, cached_test, read_result,
+                               is_significant, get_result)
+from bin.workflow_1.mann_whitney_u_w1 import mann_whitney_u_test
+from bin.workflow_3.correlationtest_w3 import correlation_result
+import pandas as pd
+import numpy as np
+import logging
+import pytest
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def create_df(seed=0):
+    """Helper function to create a small dataframe to test."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'x_cat': np.repeat([0, 1], 30),
+                         'y': rng.normal(size=60) + np.repeat([0, 1], 30)})
+
+
+def test_data_hash():
+    """Unit test for function data_hash: it depends on the values and
+    the columns, not on the index."""
+    df = create_df()
+    assert data_hash(df) == data_hash(df.set_index(df.index + 10))
+    assert data_hash(df) != data_hash(create_df(seed=1))
+    assert data_hash(df) != data_hash(df.rename(columns={'y': 'z'}))
+
+
+def test_cached_test(tmp_path):
+    """Unit test for function cached_test: the result is computed once
+    for the same data and parameters, and linked to the output."""
+    store = str(tmp_path / 'hptests.sqlite')
+    calls = []
+
+    def run():
+        calls.append(1)
+        return {'statistic': 1.5, 'pvalue': 0.01, 'n1': 30, 'n2': 30,
+                'significant': True}
+
+    first = cached_test(store, 'test', create_df(), {'alpha': 0.05}, run,
+                        'out.txt')
+    second = cached_test(store, 'test', create_df(), {'alpha': 0.05}, run,
+                         'out.txt')
+    assert not first['cached'] and second['cached']
+    assert len(calls) == 1
+    assert get_result(store, first['key'])['params'] == {'alpha': 0.05}
+    assert read_result(store, 'out.txt')['pvalue'] == 0.01
+    assert is_significant(store, 'out.txt')
+    # other parameters or data: computed again
+    cached_test(store, 'test', create_df(), {'alpha': 0.01}, run)
+    cached_test(store, 'test', create_df(seed=1), {'alpha': 0.05}, run)
+    assert len(calls) == 3
+    with pytest.raises(KeyError):
+        read_result(store, 'missing.txt')
+
+
+def test_mann_whitney_u_test_store(tmp_path):
+    """Integration test for mann_whitney_u_test with the store: the
+    stored result is the one of the test and it is reused."""
+    store = str(tmp_path / 'hptests.sqlite')
+    output = str(tmp_path / 'mannwhitneyu.txt')
+    expected = mann_whitney_u_test(create_df(), 'x_cat', 'y', output, LOGGER)
+    actual = mann_whitney_u_test(create_df(), 'x_cat', 'y', output, LOGGER,
+                                 store)
+    assert actual == pytest.approx(expected)
+    record = read_result(store, output)
+    assert (record['n1'], record['n2']) == (30, 30)
+    assert record['significant'] == (expected[1] < 0.05)
+    with open(output) as file:
+        assert file.read() == str(record['significant'])
+    assert mann_whitney_u_test(create_df(), 'x_cat', 'y', output, LOGGER,
+                               store) == pytest.approx(expected)
+
+
+def test_correlation_result_store(tmp_path):
+    """Integration test for correlation_result with the store."""
+    store = str(tmp_path / 'hptests.sqlite')
+    df = create_df()
+    df.loc[3, 'y'] = np.nan
+    expected = correlation_result(df, 'x_cat', 'y', 0.5, 0.05)
+    actual = correlation_result(df, 'x_cat', 'y', 0.5, 0.05, store,
+                                'corr.txt')
+    assert actual['pvalue'] == pytest.approx(expected['pvalue'])
+    assert actual['n1'] == 59
+    assert is_significant(store, 'corr.txt') == expected['significant']
+    assert correlation_result(df, 'x_cat', 'y', 0.5, 0.05, store)['cached']
+
+
+def test_cached_test_nan(tmp_path):
+    """Unit test for function cached_test: a NaN statistic and p-value
+    (stored as NULL) are NaN when the result is reused."""
+    store = str(tmp_path / 'hptests.sqlite')
+
+    def run():
+        return {'statistic': np.nan, 'pvalue': np.nan, 'n1': 60,
+                'significant': False}
+
+    cached_test(store, 'test', create_df(), {}, run, 'out.txt')
+    cached = cached_test(store, 'test', create_df(), {}, run)
+    assert cached['cached']
+    assert np.isnan(cached['statistic']) and np.isnan(cached['pvalue'])
+    assert np.isnan(read_result(store, 'out.txt')['pvalue'])
+    # constant variable: no correlation coefficient
+    df = create_df().assign(y=1.0)
+    correlation_result(df, 'x_cat', 'y', 0.5, 0.05, store)
+    result = correlation_result(df, 'x_cat', 'y', 0.5, 0.05, store)
+    assert result['cached'] and np.isnan(result['pvalue'])
+
+
+def test_is_significant_text_output(tmp_path):
+    """Unit test for function is_significant: without a result in the
+    store (or without the store) the text output is parsed."""
+    store = str(tmp_path / 'hptests.sqlite')
+    output = str(tmp_path / 'mannwhitneyu.txt')
+    with open(output, 'w') as file:
+        file.write('True')
+    assert is_significant(store, output, output)
+    with pytest.raises(KeyError):
+        is_significant(store, output)
+    cached_test(store, 'test', create_df(), {}, lambda: {
+        'statistic': 0.1, 'pvalue': 0.5, 'n1': 30, 'n2': 30,
+        'significant': False}, output)
+    assert not is_significant(store, output, output)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+The script contains an integration test for the component bin/runner.py:
+the datasets processed in a single process must be the same as the ones
+of the components of the workflows run one after the other on files.
+"""
+from bin.runner import main, CONFIGS, GROUPS_W1
+from bin.workflow_1.dataprocessing_w1 import process_csvfile_w1
+from bin.workflow_2.dataprocessing_w2 import aggregate_w2
+from bin.workflow_3.dataprocessing_w3 import process_csvfile_w3
+from bin.io_utils import read_processed
+from bin.utils import load_config
+from pandas.testing import assert_frame_equal
+import pytest
+import os
+
+
+@pytest.mark.parametrize('owid_params', [{'n_days': 1400, 'seed': 5}],
+                         indirect=True)
+def test_runner(raw_csv, tmp_path):
+    """Integration test for function main."""
+    csvfile = raw_csv
+    data_dir, results_dir = str(tmp_path / 'data'), str(tmp_path / 'results')
+    os.makedirs(data_dir)
+    main(CONFIGS, csvfile, data_dir, results_dir)
+    # components run on the saved files
+    processed_file = os.path.join(data_dir, 'owid-covid-data_processed.csv')
+    config_w1 = load_config(CONFIGS[1])
+    expected_df = process_csvfile_w1(processed_file, GROUPS_W1,
+                                     config_w1['year'],
+                                     config_w1['continent'])
+    assert_frame_equal(expected_df.reset_index(), read_processed(
+        os.path.join(data_dir, 'owid-covid-data_processed_w1.csv')))
+    for group in GROUPS_W1:
+        assert os.path.exists(os.path.join(results_dir, 'workflow_1',
+                                           f'plot_{group}.png'))
+    expected_df = aggregate_w2(processed_file)
+    assert_frame_equal(expected_df.reset_index(), read_processed(
+        os.path.join(data_dir, 'owid-covid-data_processed_w2.csv')))
+    expected_df = process_csvfile_w3(processed_file, 'month')
+    assert_frame_equal(expected_df.reset_index(), read_processed(
+        os.path.join(data_dir,
+                     'owid-covid-data_processed_w3_europe_by_month.csv')))
+    assert len(os.listdir(os.path.join(results_dir, 'workflow_3'))) == 7
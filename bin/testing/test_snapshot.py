@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component bin/snapshot.py
+and integration tests with the processing of workflows 1 and 2,
+on a small synthetic dataset.
+"""
+from bin.snapshot import snapshot_tables, snapshot_file
+from bin.dataprocessing import main
+from bin.workflow_1.dataprocessing_w1 import (process_csvfile_w1, sweep_w1,
+                                              CAT_COLUMNS)
+from bin.workflow_2.dataprocessing_w2 import process_csvfile_w2
+from bin.io_utils import read_processed
+from pandas.testing import assert_frame_equal
+import pytest
+
+
+@pytest.fixture
+def owid_params():
+    """Fixture with the parameters of the synthetic dataset."""
+    return {'n_countries': 12, 'n_days': 800, 'seed': 2, 'n_metrics': 2}
+
+
+def test_snapshot_tables(processed):
+    """Unit test for function snapshot_tables: the snapshots are the
+    last non-null values of the daily rows, also when the rows are not
+    sorted."""
+    _, df = processed
+    for time, keys in [('month', ['year', 'month', 'semester']),
+                       ('semester', ['year', 'semester']),
+                       ('year', ['year'])]:
+        dropped = [column for column in ['date', 'month', 'semester']
+                   if column not in keys]
+        expected_df = df.drop(columns=dropped).groupby(
+            ['location'] + keys).agg('last')
+        for data in [df, df.sample(frac=1, random_state=0)]:
+            actual_df = snapshot_tables(data)[time].set_index(
+                ['location'] + keys).sort_index()
+            assert_frame_equal(actual_df[expected_df.columns], expected_df)
+
+
+def test_snapshot_workflows(processed, tmp_path):
+    """Integration test for the processing of workflows 1 and 2 on the
+    snapshots saved by dataprocessing.py."""
+    csvfile, df = processed
+    outfile = str(tmp_path / 'owid-covid-data_processed.csv')
+    main(csvfile, outfile, snapshot=True)
+    month = snapshot_file(outfile, 'month')
+    assert month.endswith('owid-covid-data_processed_snapshot_month.csv')
+    assert_frame_equal(
+        process_csvfile_w1(month, CAT_COLUMNS, 2021, 'Europe',
+                           snapshot=True),
+        process_csvfile_w1(outfile, CAT_COLUMNS, 2021, 'Europe'))
+    assert_frame_equal(sweep_w1(month, snapshot=True), sweep_w1(outfile))
+    year = read_processed(snapshot_file(outfile, 'year'))
+    for normalize in [False, True]:
+        assert_frame_equal(
+            process_csvfile_w2(year, normalize, snapshot=True),
+            process_csvfile_w2(df, normalize))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+The script contains unit tests for the component bin/window_metrics.py
+and an integration test with bin/dataprocessing.py, on a small synthetic
+dataset.
+"""
+from bin.window_metrics import (window_metrics, add_window_metrics,
+                                metric_column)
+from bin.dataprocessing import main
+from bin.io_utils import read_processed
+from pandas.testing import assert_frame_equal, assert_series_equal
+import pandas as pd
+import numpy as np
+import pytest
+
+
+METRICS = ['new_cases', 'new_deaths', 'new_vaccinations']
+
+
+@pytest.fixture
+def owid_params():
+    """Fixture with the parameters of the synthetic dataset."""
+    return {'n_countries': 12, 'n_days': 300, 'seed': 6, 'n_metrics': 2}
+
+
+@pytest.mark.parametrize('window, min_periods', [(7, None), (14, 3), (1, 1)])
+def test_window_metrics(processed, window, min_periods):
+    """Unit test for function window_metrics: the metrics are the ones
+    of pandas by location, also when the rows are not sorted."""
+    _, df = processed
+    grouped = df.sort_values(['location', 'date']).groupby('location')
+    rolling = grouped[METRICS].rolling(
+        window, min_periods=min_periods).mean().reset_index(level=0,
+                                                            drop=True)
+    cumulative = grouped[METRICS].cumsum()
+    for data in [df, df.sample(frac=1, random_state=0)]:
+        actual_df = window_metrics(data, METRICS, window=window,
+                                   min_periods=min_periods)
+        assert actual_df.index.equals(data.index)
+        for metric in METRICS:
+            assert_series_equal(
+                actual_df[metric_column(metric, 'rolling', window)],
+                rolling.loc[data.index, metric], check_names=False)
+            assert_series_equal(
+                actual_df[metric_column(metric, 'cumulative')],
+                cumulative.loc[data.index, metric], check_names=False)
+            assert_series_equal(
+                actual_df[metric_column(metric, 'per_million')],
+                data[metric] / data['population'] * 1e6,
+                check_names=False)
+
+
+def test_window_metrics_per_location():
+    """Unit test for function window_metrics: the sums restart at each
+    location, small values after large ones keep their precision."""
+    rng = np.random.default_rng(0)
+    n_days = 50
+    df = pd.DataFrame({
+        'location': np.repeat(['A', 'B', 'C'], n_days),
+        'date': np.tile(pd.date_range('2021-01-01', periods=n_days), 3),
+        'new_cases': np.concatenate([rng.uniform(1e14, 1e15, n_days),
+                                     rng.uniform(0, 1e-3, 2 * n_days)])})
+    df.loc[[60, 61, 120], 'new_cases'] = np.nan
+    actual_df = window_metrics(df, ['new_cases'],
+                               kinds=['rolling', 'cumulative'])
+    grouped = df.groupby('location')['new_cases']
+    expected_df = pd.DataFrame({
+        'new_cases_rolling_7': grouped.rolling(7).mean().reset_index(
+            level=0, drop=True),
+        'new_cases_cumulative': grouped.cumsum()})
+    assert_frame_equal(actual_df, expected_df)
+
+
+def test_window_metrics_invalid(processed):
+    """Unit test for function window_metrics: invalid inputs."""
+    _, df = processed
+    with pytest.raises(ValueError):
+        window_metrics(df, ['new_cases'], kinds=['median'])
+    with pytest.raises(ValueError):
+        window_metrics(df, ['metric'])
+    with pytest.raises(ValueError):
+        window_metrics(df, ['new_cases'], window=0)
+
+
+def test_dataprocessing_window_metrics(processed, tmp_path):
+    """Integration test: the processed dataset saved by dataprocessing.py
+    with window metrics is the one of add_window_metrics."""
+    csvfile, df = processed
+    outfile = str(tmp_path / 'owid-covid-data_processed.csv')
+    main(csvfile, outfile, metrics=['new_cases'], window=7)
+    expected_df = add_window_metrics(df, ['new_cases'])
+    assert list(read_processed(outfile).columns) == list(expected_df.columns)
+    columns = list(window_metrics(df, ['new_cases']).columns)
+    assert_frame_equal(read_processed(outfile, columns=columns),
+                       expected_df[columns])
+    assert np.isnan(expected_df['new_cases_rolling_7'].iloc[0])
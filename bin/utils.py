@@ -1,5 +1,4 @@
 import yaml
-import matplotlib.pyplot as plt
 
 
 def load_config(config_file):
@@ -33,6 +32,7 @@ def set_plot_params(config_file):
     Returns:
         None
     """
+    import matplotlib.pyplot as plt
     plot_params = load_config(config_file)
     for param, value in plot_params.items():
         if (param == 'style'):
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+The file provides the rolling-window, cumulative and per-million metrics
+of each location of the processed dataset, as extra columns:
+    - {metric}_rolling_{window}: mean of the last window daily values
+      of the location, as groupby('location').rolling(window).mean()
+    - {metric}_cumulative: sum of the daily values of the location up
+      to the date, as groupby('location').cumsum()
+    - {metric}_per_million: value per million inhabitants.
+The rows are sorted once by location and date, so that the rows of a
+location are a contiguous block. The windows of all the metrics are
+then computed at once from the cumulative sums of the values (and of
+the counts of non-null values) of each location: the sum over a window
+is the difference of two cumulative sums of its location (the sums
+restart at the first row of every location, so that they do not grow
+across the dataset). The windows are in rows, i.e. days of the daily
+dataset.
+"""
+from bin.snapshot import is_sorted, block_starts
+import pandas as pd
+import numpy as np
+
+
+METRIC_KINDS = ['rolling', 'cumulative', 'per_million']
+DEFAULT_WINDOW = 7
+
+
+def metric_column(metric, kind, window=DEFAULT_WINDOW):
+    """The function returns the name of the column of metric of kind,
+    e.g. new_cases_rolling_7.
+
+    Args:
+        metric (str): column of the processed dataset
+        kind (str): one of METRIC_KINDS
+        window (int): length of the rolling window
+
+    Raises:
+        ValueError: when kind is not in METRIC_KINDS
+
+    Returns:
+        str
+    """
+    if kind not in METRIC_KINDS:
+        raise ValueError(f'Invalid kind of metric: {kind}, '
+                         f'choose among {METRIC_KINDS}')
+    return f'{metric}_rolling_{window}' if kind == 'rolling' \
+        else f'{metric}_{kind}'
+
+
+def cumulative_sums(values, starts):
+    """Helper function for window_metrics.
+    The function returns the cumulative sums of the non-null values of
+    each column and of their counts, restarted at each block of rows
+    (the sum of the rows i to j of a block is sums[j] - sums[i - 1], or
+    sums[j] if i is the first row of the block).
+
+    Args:
+        values (np.ndarray): rows x metrics
+        starts (np.ndarray): first row of each block (see block_starts)
+
+    Returns:
+        tuple: (sums, counts) as np.ndarray with the shape of values
+    """
+    valid = ~np.isnan(values)
+    blocks = np.repeat(np.arange(len(starts)),
+                       np.diff(np.append(starts, len(values))))
+    sums = pd.DataFrame(np.where(valid, values, 0)).groupby(
+        blocks, sort=False).cumsum().to_numpy()
+    counts = pd.DataFrame(valid.astype(np.int64)).groupby(
+        blocks, sort=False).cumsum().to_numpy()
+    return sums, counts
+
+
+def window_metrics(df, metrics, kinds=METRIC_KINDS, window=DEFAULT_WINDOW,
+                   min_periods=None, population='population'):
+    """The function computes the metrics of kinds of each location of
+    the processed dataset df, for all the metrics at once.
+
+    Args:
+        df (pd.DataFrame): processed dataset (location, date, metrics
+                           and population)
+        metrics (list): metric columns
+        kinds (list): kinds of metrics, among METRIC_KINDS
+        window (int): length of the rolling window, in rows (days)
+        min_periods (int, optional): minimum number of non-null values
+                                     in a window (NaN otherwise).
+                                     Defaults to window, as pandas.
+        population (str): population column (per_million only)
+
+    Raises:
+        ValueError: when a column is missing, a kind is invalid or the
+                    window is not positive
+
+    Returns:
+        pd.DataFrame: one column per metric and kind (see metric_column),
+                      with the index of df
+    """
+    required = ['location', 'date'] + list(metrics)
+    if 'per_million' in kinds:
+        required.append(population)
+    missing_cols = [col for col in required if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f'Missing columns: {missing_cols}')
+    if window < 1:
+        raise ValueError('The window must be positive')
+    names = {kind: [metric_column(metric, kind, window)
+                    for metric in metrics] for kind in kinds}
+    min_periods = window if min_periods is None else min_periods
+    # sort once by location and date (order is None if already sorted)
+    order = None if is_sorted(df) else np.lexsort(
+        (df['date'].to_numpy(), pd.factorize(df['location'])[0]))
+    sorted_df = df if order is None else df.iloc[order]
+    values = sorted_df[list(metrics)].to_numpy(dtype=float)
+    starts = block_starts(sorted_df, ['location'])
+    # first row of the location of each row
+    first = np.repeat(starts, np.diff(np.append(starts, len(df))))
+    rows = np.arange(len(df))
+    sums, counts = cumulative_sums(values, starts)
+    results = {}
+    if 'rolling' in kinds:
+        # the window starts after the row before (in the same location)
+        before = rows - window
+        inside = (before >= first)[:, None]
+        before = np.maximum(before, 0)
+        window_sum = sums - np.where(inside, sums[before], 0)
+        window_count = counts - np.where(inside, counts[before], 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = window_sum / window_count
+        mean[(window_count < max(min_periods, 1))] = np.nan
+        results['rolling'] = mean
+    if 'cumulative' in kinds:
+        cumulative = sums.copy()
+        cumulative[np.isnan(values)] = np.nan
+        results['cumulative'] = cumulative
+    if 'per_million' in kinds:
+        results['per_million'] = values * 1e6 / sorted_df[
+            population].to_numpy(dtype=float)[:, None]
+    columns = {}
+    for kind in kinds:
+        result = results[kind]
+        if order is not None:
+            # back to the order of df
+            result = np.empty_like(result)
+            result[order] = results[kind]
+        for i, name in enumerate(names[kind]):
+            columns[name] = result[:, i]
+    return pd.DataFrame(columns, index=df.index)
+
+
+def add_window_metrics(df, metrics, kinds=METRIC_KINDS,
+                       window=DEFAULT_WINDOW, min_periods=None):
+    """The function returns df with the columns of window_metrics.
+
+    Args:
+        df (pd.DataFrame): processed dataset
+        metrics (list): metric columns
+        kinds (list): kinds of metrics, among METRIC_KINDS
+        window (int): length of the rolling window, in rows (days)
+        min_periods (int, optional): see window_metrics
+
+    Returns:
+        pd.DataFrame
+    """
+    new_columns = window_metrics(df, metrics, kinds, window, min_periods)
+    return pd.concat([df.drop(columns=new_columns.columns, errors='ignore'),
+                      new_columns], axis=1)
@@ -1,15 +1,17 @@
 """
-The script produces a boxplot of y by g (binary categorical var).
+The script produces a boxplot of y by g (binary categorical var),
+from the processed dataset or from its boxes summary (--summary, see
+plot_summaries_w1.py).
 """
 from bin.utils import set_plot_params
+from bin.io_utils import read_processed
+from bin.workflow_1.plot_summaries_w1 import read_box_stats
 import pandas as pd
-import matplotlib.pyplot as plt
 import logging
 import argparse
 
 
-# set plot params
-set_plot_params("../configuration_plots.yaml")
+LOGGER = logging.getLogger(__name__)
 
 
 def setup_logger(group):
@@ -19,23 +21,30 @@ def setup_logger(group):
     return logging.getLogger(__name__)
 
 
-def draw_boxplot(csv_file_path, group, y_variable, output):
+def draw_boxplot(csv_file_path, group, y_variable, output, summary=False):
     """
     Draws a box plot from the data in a CSV file.
 
     Args:
-        csv_file_path (str): The path to the CSV file.
+        csv_file_path (str or pd.DataFrame): The path to the CSV
+                                             (or parquet) file, or the data.
         group (str): The name of the column to be used
                     as the binary grouped variable.
         y_variable (str): The name of the column to be used
                           as the y-axis variable.
         output (str): The name of the output file.
+        summary (bool): If True, csv_file_path is the boxes summary
+                        of the data.
     """
+    import matplotlib.pyplot as plt
     LOGGER.debug(f"Drawing box plot from file: {csv_file_path}")
+    if summary:
+        draw_boxplot_summary(csv_file_path, group, y_variable, output)
+        return
     try:
         # Load the data from the CSV file into a pandas DataFrame
         LOGGER.debug("Loading data from CSV file")
-        df = pd.read_csv(csv_file_path)
+        df = read_processed(csv_file_path, columns=[y_variable, group])
     except pd.errors.EmptyDataError:
         LOGGER.error(f"CSV file is empty: {csv_file_path}")
         raise ValueError(f"CSV file is empty: {csv_file_path}")
@@ -54,7 +63,7 @@ def draw_boxplot(csv_file_path, group, y_variable, output):
 
     # Create the box plot
     LOGGER.debug("Creating box plot")
-    df.boxplot(column=y_variable, by=group)
+    ax = df.boxplot(column=y_variable, by=group)
 
     # Add labels and title
     LOGGER.debug("Adding labels and title")
@@ -66,16 +75,50 @@ def draw_boxplot(csv_file_path, group, y_variable, output):
     LOGGER.debug("Saving the plot")
     plt.savefig(output)
 
-    # Display the plot
-    LOGGER.debug("Showing box plot")
-    plt.show()
+    # Close the figure, so that many plots can be drawn in one process
+    plt.close(ax.figure)
+
+
+def draw_boxplot_summary(summary_file, group, y_variable, output):
+    """
+    Draws the box plot of draw_boxplot from the precomputed statistics
+    of a boxes summary.
+
+    Args:
+        summary_file (str or pd.DataFrame): The path to the boxes
+                                            summary, or the summary.
+        group (str): The name of the binary grouped variable.
+        y_variable (str): The name of the y-axis variable.
+        output (str): The name of the output file.
+    """
+    import matplotlib.pyplot as plt
+    LOGGER.debug("Loading box plot statistics")
+    stats = read_box_stats(summary_file, group, y_variable)
+
+    # Create the box plot, with the layout of df.boxplot
+    LOGGER.debug("Creating box plot")
+    fig, ax = plt.subplots()
+    ax.bxp(stats)
+    ax.grid(True)
+    fig.suptitle(f'Boxplot grouped by {group}')
+
+    # Add labels and title
+    LOGGER.debug("Adding labels and title")
+    ax.set_xlabel(group)
+    ax.set_ylabel(y_variable)
+    ax.set_title('Box Plot')
+
+    # Saving the plot
+    LOGGER.debug("Saving the plot")
+    fig.savefig(output)
+    plt.close(fig)
 
 
 def main(csvfile: str, group: str,
-         y_variable: str, output: str):
+         y_variable: str, output: str, summary=False):
     LOGGER.info('Drawing box plot')
     draw_boxplot(csvfile, group=group,
-                 y_variable=y_variable, output=output)
+                 y_variable=y_variable, output=output, summary=summary)
     LOGGER.info('Box plot finished')
 
 
@@ -89,7 +132,11 @@ if __name__ == "__main__":
                         help='The y variable for the box plot')
     parser.add_argument('-o', '--output', type=str,
                         help='The output name for the box plot')
+    parser.add_argument('--summary', action='store_true',
+                        help='The dataset is the boxes summary')
     args = parser.parse_args()
     LOGGER = setup_logger(args.group)
+    # set plot params
+    set_plot_params("../configuration_plots.yaml")
     main(args.csvfile, args.group,
-         args.y_variable, args.output)
+         args.y_variable, args.output, args.summary)
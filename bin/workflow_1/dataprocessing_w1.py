@@ -1,13 +1,27 @@
 #!/usr/bin/env python3
 """
 The script processes the input dataset
-(processed CSV format) for data analysis.
+(processed csv or parquet format) for data analysis.
 The preprocessing includes filtering by continent,
-creating a categorical variable,
+creating a categorical variable for one or more factors,
 and collapsing data by month for a chosen year.
+All the factors are computed in a single pass, in one output.
+In sweep mode (--sweep) all the continents and years are processed
+at once, in a long table.
+The input can be the monthly snapshot of the processed dataset
+(--snapshot), which holds the month-end values already.
+With --summaries the plot-ready summaries of the output (see
+plot_summaries_w1.py) are saved next to it.
+The monthly snapshot can also be processed chunk by chunk (--chunksize):
+the medians are then estimated by merging the quantile sketches of the
+chunks (see bin/quantile_sketch.py).
 """
-
-import pandas as pd
+from bin.io_utils import (read_processed, write_processed, is_supported,
+                          read_processed_chunks, write_processed_chunks)
+from bin.memory_utils import compact_dtypes
+from bin.quantile_sketch import KLLSketch, merge_sketches, DEFAULT_K
+from bin.workflow_1.plot_summaries_w1 import (plot_summaries, summary_file,
+                                              plot_summaries_chunks)
 import argparse
 import logging
 
@@ -17,9 +31,13 @@ LOGGER.setLevel(logging.DEBUG)
 COLUMNS = ['month', 'year', 'continent',
            'location', 'total_cases', 'total_deaths', 'median_age',
            'gdp_per_capita', 'life_expectancy', 'population_density']
+CAT_COLUMNS = ['median_age', 'gdp_per_capita',
+               'life_expectancy', 'population_density']
+OUTCOMES = {'total_cases': 'new_cases', 'total_deaths': 'new_deaths'}
+SWEEP_KEYS = ['continent', 'year']
 
 
-def create_categorical_variable(df, column):
+def create_categorical_variable(df, column, threshold=None):
     """The function creates a binary categorical variable
     starting from column. It will assign 0 to values below the
     median, 1 else.
@@ -27,68 +45,289 @@ def create_categorical_variable(df, column):
     Args:
         df (pd.DataFrame): dataframe
         column (str): name of the column
+        threshold (float, optional): median of column, e.g. estimated
+                                     on the whole data when df is a
+                                     chunk. Defaults to the median of df.
 
     Returns:
         pd.DataFrame: df with the additional col
     """
-    threshold = df[column].median()
+    if threshold is None:
+        threshold = df[column].median()
     df[f'{column}_cat'] = (df[column] > threshold).astype(int)
     return df
 
 
-def process_csvfile_w1(filename, cat_column, year, continent):
+def process_csvfile_w1(filename, cat_column, year, continent,
+                       compact=False, snapshot=False):
     """The function performs specific preprocessing steps  for workflow 1.
+    The dataset is filtered and collapsed once for all the columns
+    to turn into categorical ({column}_cat).
+    With snapshot, filename is the monthly snapshot of the processed
+    dataset (see bin/snapshot.py) and it is not collapsed again: the
+    month-end values are the last non-null value of each column, instead
+    of the last values of the complete rows (they differ only if a
+    column is null at the end of the month).
 
     Args:
-        filename (str): path to the csv file
-        cat_column (str): name of the column to turn into categorical
+        filename (str or pd.DataFrame): path to the csv or parquet file,
+                                        or the processed dataset
+        cat_column (str or list): name of the column(s) to turn
+                                  into categorical
         year (int): year that is going to be filtered
         continent (str): continent that is going to be filtered
+        compact (bool): if True the compact dtype schema is used
+        snapshot (bool): if True filename is the monthly snapshot
     Raises:
         ValueError: error when csv hasn't general preprocessing
 
     Returns:
         pd.DataFrame: processed dataframe
     """
-    if 'processed' not in filename:
+    if isinstance(filename, str) and 'processed' not in filename:
         raise ValueError("The CSV must contain the first \
             preprocessing of the data")
 
-    df = pd.read_csv(filename, usecols=COLUMNS)
-    df.dropna(inplace=True)
-
-    # Filter by continent and year
-    df = df[(df.continent == continent) & (df.year == year)]
+    # Filter by continent and year (only the needed partitions
+    # of a partitioned dataset are read)
+    df = read_processed(filename, columns=COLUMNS,
+                        filters=[('continent', '==', continent),
+                                 ('year', '==', year)])
+    df = df.dropna()
+    if compact:
+        df = compact_dtypes(df)
     df = df.drop(columns=['continent', 'year'])
     LOGGER.debug(f'df filtered by continent and year: {df.head()}')
     # Collapse by month
-    df_collapsed = df.groupby(['month', 'location']).agg('last')
+    if snapshot:
+        df_collapsed = df.set_index(['month', 'location']).sort_index()
+    else:
+        df_collapsed = df.groupby(['month', 'location'],
+                                  observed=True).agg('last')
     LOGGER.debug(f'df collapsed by month: {df.head()}')
-    # Create categorical variable
-    df_collapsed = create_categorical_variable(df_collapsed, cat_column)
+    # Create categorical variables
+    cat_columns = [cat_column] if isinstance(cat_column, str) else cat_column
+    for column in cat_columns:
+        df_collapsed = create_categorical_variable(df_collapsed, column)
     # Rename outcome columns:
-    df_collapsed = df_collapsed.rename(columns={"total_deaths": "new_deaths",
-                                                "total_cases": "new_cases"})
+    df_collapsed = df_collapsed.rename(columns=OUTCOMES)
+    if compact:
+        df_collapsed = compact_dtypes(df_collapsed)
     LOGGER.debug(f'final df: {df.head()}')
     return df_collapsed
 
 
-def main(csvfile: str, outfile: str, cat_column: str,
-         year: int, continent: str):
-    if not csvfile.endswith('.csv'):
-        raise OSError("Provide a CSV file")
+def read_chunks_w1(filename, year, continent, chunksize):
+    """Helper function for process_csvfile_w1_chunks.
+    The function reads the monthly snapshot filename chunk by chunk,
+    filtered by continent and year as in process_csvfile_w1.
+
+    Args:
+        filename (str): path to the monthly snapshot
+        year (int): year that is going to be filtered
+        continent (str): continent that is going to be filtered
+        chunksize (int): number of rows per chunk
+
+    Yields:
+        pd.DataFrame
+    """
+    for chunk in read_processed_chunks(
+            filename, chunksize, columns=COLUMNS,
+            filters=[('continent', '==', continent), ('year', '==', year)]):
+        yield chunk.dropna().drop(columns=['continent', 'year'])
+
+
+def sketch_thresholds(chunks, columns, k=DEFAULT_K, seed=0):
+    """The function estimates the medians of columns over all the
+    chunks: each chunk gives a partial quantile sketch per column and
+    the sketches are merged (rank error error_bound(k), exact for at
+    most k + 1 values). The sketches of each chunk have their own seed
+    (seed and the number of the chunk), so that the errors of the
+    chunks are independent.
+
+    Args:
+        chunks (iterable): dataframes
+        columns (list): columns
+        k (int): size of the quantile sketches
+        seed (int): seed of the compactions
+
+    Returns:
+        dict: column -> median
+    """
+    partials = {column: [] for column in columns}
+    for number, chunk in enumerate(chunks):
+        for column in columns:
+            partials[column].append(
+                KLLSketch(k, [seed, number]).update(chunk[column]))
+    return {column: float(merge_sketches(sketches, k, seed).quantile(0.5))
+            for column, sketches in partials.items()}
+
+
+def process_csvfile_w1_chunks(filename, cat_column, year, continent,
+                              chunksize, k=DEFAULT_K):
+    """The function performs the preprocessing of process_csvfile_w1 on
+    the monthly snapshot of the processed dataset, chunk by chunk, in
+    two passes: the medians of the factors are estimated with quantile
+    sketches (see sketch_thresholds), then every chunk is given its
+    categorical variables. The rows keep the order of filename.
+
+    Args:
+        filename (str): path to the monthly snapshot (csv, parquet or
+                        column store)
+        cat_column (str or list): name of the column(s) to turn
+                                  into categorical
+        year (int): year that is going to be filtered
+        continent (str): continent that is going to be filtered
+        chunksize (int): number of rows per chunk
+        k (int): size of the quantile sketches
+
+    Raises:
+        ValueError: error when csv hasn't general preprocessing
+
+    Yields:
+        pd.DataFrame: processed chunk (index month and location)
+    """
+    if 'processed' not in filename:
+        raise ValueError("The CSV must contain the first \
+            preprocessing of the data")
+    cat_columns = [cat_column] if isinstance(cat_column, str) else cat_column
+    thresholds = sketch_thresholds(
+        read_chunks_w1(filename, year, continent, chunksize), cat_columns, k)
+    LOGGER.debug(f'thresholds: {thresholds}')
+    for chunk in read_chunks_w1(filename, year, continent, chunksize):
+        chunk = chunk.set_index(['month', 'location'])
+        for column in cat_columns:
+            chunk = create_categorical_variable(chunk, column,
+                                                thresholds[column])
+        yield chunk.rename(columns=OUTCOMES)
+
+
+def sweep_w1(filename, cat_columns=CAT_COLUMNS, years=None,
+             continents=None, compact=False, snapshot=False):
+    """Sweep mode of process_csvfile_w1: the dataset is collapsed by
+    month once for all the continents and years, and the medians of the
+    factors are computed for each (continent, year) at once.
+    The result is a long table, one row per continent, year, factor,
+    month and location. For a given continent, year and factor its rows
+    are the ones of process_csvfile_w1, with the factor in value, its
+    median in threshold and the categorical variable in cat.
+
+    Args:
+        filename (str or pd.DataFrame): path to the csv or parquet file,
+                                        or the processed dataset
+        cat_columns (list): names of the columns to turn into categorical
+        years (list, optional): years to keep. Defaults to all.
+        continents (list, optional): continents to keep. Defaults to all.
+        compact (bool): if True the compact dtype schema is used
+        snapshot (bool): if True filename is the monthly snapshot
+    Raises:
+        ValueError: error when csv hasn't general preprocessing
+
+    Returns:
+        pd.DataFrame: columns continent, year, factor, month, location,
+                      new_cases, new_deaths, value, threshold, cat
+    """
+    if isinstance(filename, str) and 'processed' not in filename:
+        raise ValueError("The CSV must contain the first \
+            preprocessing of the data")
+    filters = []
+    if continents:
+        filters.append(('continent', 'in', list(continents)))
+    if years:
+        filters.append(('year', 'in', list(years)))
+    df = read_processed(filename, columns=COLUMNS, filters=filters or None)
+    df = df.dropna()
+    if compact:
+        df = compact_dtypes(df)
+    # Collapse by month for all the continents and years
+    if snapshot:
+        df_collapsed = df.set_index(
+            SWEEP_KEYS + ['month', 'location']).sort_index()
+    else:
+        df_collapsed = df.groupby(SWEEP_KEYS + ['month', 'location'],
+                                  observed=True).agg('last')
+    df_collapsed = df_collapsed.rename(columns=OUTCOMES)
+    LOGGER.debug(f'df collapsed by month: {df_collapsed.head()}')
+    # Median of each factor for each continent and year
+    thresholds = df_collapsed.groupby(level=SWEEP_KEYS, observed=True)[
+        cat_columns].transform('median')
+    id_columns = SWEEP_KEYS + ['month', 'location'] + list(OUTCOMES.values())
+    df_long = df_collapsed.reset_index().melt(
+        id_vars=id_columns, value_vars=cat_columns,
+        var_name='factor', value_name='value')
+    # melt stacks the factors in the same order for the thresholds
+    df_long['threshold'] = thresholds.to_numpy().ravel(order='F')
+    df_long['cat'] = (df_long['value'] > df_long['threshold']).astype(int)
+    df_long = df_long.sort_values(SWEEP_KEYS + ['factor'], kind='stable')
+    df_long = df_long[SWEEP_KEYS + ['factor'] + id_columns[2:]
+                      + ['value', 'threshold', 'cat']]
+    if compact:
+        df_long = compact_dtypes(df_long)
+    LOGGER.debug(f'final df: {df_long.head()}')
+    return df_long.reset_index(drop=True)
+
+
+def main(csvfile: str, outfile: str, cat_column,
+         year: int, continent: str, compact=False, sweep=False,
+         snapshot=False, summaries=False, chunksize=None,
+         sketch_size=DEFAULT_K):
+    if not (is_supported(csvfile) and is_supported(outfile)):
+        raise OSError("Provide a CSV or parquet file")
     logging.basicConfig(filename=f'./logs/dataprocessing_w1.log', filemode='w')
     LOGGER.info('Started processing')
-    df_processed = process_csvfile_w1(csvfile, cat_column, year, continent)
-    LOGGER.info('Saving processed CSV')
-    df_processed.to_csv(outfile, index=True)
+    if sweep:
+        # year and continent, if given, restrict the sweep
+        df_processed = sweep_w1(csvfile, cat_column or CAT_COLUMNS,
+                                [year] if year else None,
+                                [continent] if continent else None, compact,
+                                snapshot)
+        LOGGER.info('Saving processed dataset')
+        write_processed(df_processed, outfile)
+        LOGGER.info('End')
+        return df_processed
+    cat_columns = [cat_column] if isinstance(cat_column, str) else cat_column
+    groups = [f'{column}_cat' for column in cat_columns]
+    if chunksize:
+        # the chunks are not collapsed by month: monthly snapshot only
+        if not snapshot:
+            message = 'Chunked processing requires the monthly snapshot \
+                (--snapshot)'
+            LOGGER.exception(message)
+            raise ValueError(message)
+        # the float32 downcast depends on the values of each chunk
+        if compact:
+            message = 'The chunked processing does not support compact'
+            LOGGER.exception(message)
+            raise ValueError(message)
+        LOGGER.info(f'Streaming chunks of {chunksize} rows to {outfile}')
+        write_processed_chunks(
+            (chunk.reset_index() for chunk in process_csvfile_w1_chunks(
+                csvfile, cat_columns, year, continent, chunksize,
+                sketch_size)), outfile)
+        if summaries:
+            LOGGER.info('Saving plot summaries')
+            tables = plot_summaries_chunks(
+                lambda: read_processed_chunks(outfile, chunksize), groups,
+                list(OUTCOMES.values()), k=sketch_size)
+            for kind, table in tables.items():
+                write_processed(table, summary_file(outfile, kind))
+        LOGGER.info('End')
+        return None
+    df_processed = process_csvfile_w1(csvfile, cat_column, year, continent,
+                                      compact, snapshot)
+    LOGGER.info('Saving processed dataset')
+    write_processed(df_processed, outfile, index=True)
+    if summaries:
+        LOGGER.info('Saving plot summaries')
+        tables = plot_summaries(df_processed.reset_index(), groups,
+                                list(OUTCOMES.values()))
+        for kind, table in tables.items():
+            write_processed(table, summary_file(outfile, kind))
     LOGGER.info('End')
     return df_processed
 
 
 if __name__ == "__main__":
-    cat_columns = ['median_age', 'gdp_per_capita',
-                   'life_expectancy', 'population_density']
     years = [2020, 2021, 2022, 2023, 2024]
     continents = ['Europe', 'Asia', 'Africa',
                   'North America', 'Oceania', 'South America']
@@ -96,13 +335,14 @@ if __name__ == "__main__":
         description='The file applies specific preprocessing steps \
             to the csv file for the first workflow')
     parser.add_argument('-i', '--processedcsvfile', required=True, type=str,
-                        help='first general processed csv file name')
+                        help='first general processed file name \
+                            (csv or parquet)')
     parser.add_argument('-o', '--outfile', required=True, type=str,
-                        help='csv outfilename')
-    parser.add_argument('-c', '--cat_column', type=str,
-                        choices=cat_columns,
-                        help='variable that will be turned into \
-                            a categorical variable')
+                        help='outfilename (csv or parquet)')
+    parser.add_argument('-c', '--cat_column', type=str, nargs='+',
+                        choices=CAT_COLUMNS,
+                        help='variables that will be turned into \
+                            categorical variables')
     parser.add_argument('-y', '--year', type=int,
                         choices=years,
                         help='the year for which the test will be done.\
@@ -111,6 +351,27 @@ if __name__ == "__main__":
                         choices=continents,
                         help='the continent to which the test \
                             will be restricted.')
+    parser.add_argument('--compact', action='store_true',
+                        help='use the compact dtype schema')
+    parser.add_argument('--sweep', action='store_true',
+                        help='process all the continents and years \
+                            (or the ones given) in one long table')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='the input is the monthly snapshot of the \
+                            processed dataset')
+    parser.add_argument('--summaries', action='store_true',
+                        help='also save the plot-ready summaries \
+                            (not in sweep mode)')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='process the monthly snapshot chunksize rows \
+                            at a time, the medians are estimated with \
+                            quantile sketches (with --snapshot, not in \
+                            sweep mode, not with --compact)')
+    parser.add_argument('--sketch_size', type=int, default=DEFAULT_K,
+                        help='size k of the quantile sketches (the rank \
+                            error of the medians is 1.3%% for k=200)')
     args = parser.parse_args()
     main(args.processedcsvfile, args.outfile,
-         args.cat_column, args.year, args.continent)
+         args.cat_column, args.year, args.continent, args.compact,
+         args.sweep, args.snapshot, args.summaries, args.chunksize,
+         args.sketch_size)
@@ -1,14 +1,15 @@
-"""The script produces a line plot of y by g against x"""
+"""The script produces a line plot of y by g against x,
+from the processed dataset or from its lines summary (--summary, see
+plot_summaries_w1.py)"""
 from bin.utils import set_plot_params
+from bin.io_utils import read_processed
+from bin.workflow_1.plot_summaries_w1 import read_line_sums
 import pandas as pd
-import matplotlib.pyplot as plt
 import logging
 import argparse
-from matplotlib.ticker import MaxNLocator
 
 
-# set plot params
-set_plot_params("../configuration_plots.yaml")
+LOGGER = logging.getLogger(__name__)
 
 
 def setup_logger(group):
@@ -18,12 +19,14 @@ def setup_logger(group):
     return logging.getLogger(__name__)
 
 
-def draw_lineplot(csv_file_path, group, x_variable, y_variable, output):
+def draw_lineplot(csv_file_path, group, x_variable, y_variable, output,
+                  summary=False):
     """
     Draws a line plot from the data in a CSV file.
 
     Args:
-        csv_file_path (str): The path to the CSV file.
+        csv_file_path (str or pd.DataFrame): The path to the CSV
+                                             (or parquet) file, or the data.
         group (str): The name of the column to be used
                     as the binary grouped variable.
         x_variable (str): The name of the column to be used
@@ -31,12 +34,21 @@ def draw_lineplot(csv_file_path, group, x_variable, y_variable, output):
         y_variable (str): The name of the column to be used
                           as the y-axis variable.
         output (str): The name of the output file.
+        summary (bool): If True, csv_file_path is the lines summary
+                        of the data.
     """
     LOGGER.debug(f"Drawing line plot from file: {csv_file_path}")
+    if summary:
+        LOGGER.debug("Loading sums from the summary")
+        grouped_data = read_line_sums(csv_file_path, group, x_variable,
+                                      y_variable)
+        plot_lines(grouped_data, group, x_variable, y_variable, output)
+        return
     try:
         # Load the data from the CSV file into a pandas DataFrame
         LOGGER.debug("Loading data from CSV file")
-        df = pd.read_csv(csv_file_path)
+        df = read_processed(csv_file_path,
+                            columns=[x_variable, y_variable, group])
     except pd.errors.EmptyDataError:
         LOGGER.error(f"CSV file is empty: {csv_file_path}")
         raise ValueError(f"CSV file is empty: {csv_file_path}")
@@ -52,12 +64,31 @@ def draw_lineplot(csv_file_path, group, x_variable, y_variable, output):
         raise KeyError(f"Missing columns in CSV file: {missing_cols}")
     # Extract the x and y values from the DataFrame
     LOGGER.debug("Extracting x and y values from DataFrame")
+    if isinstance(df[x_variable].dtype, pd.PeriodDtype):
+        df[x_variable] = df[x_variable].astype(str)
 
     grouped_data = df.groupby([x_variable, group])[y_variable].sum().unstack()
+    plot_lines(grouped_data, group, x_variable, y_variable, output)
+
+
+def plot_lines(grouped_data, group, x_variable, y_variable, output):
+    """
+    Helper function for draw_lineplot: draws the sums of y by x
+    (rows) and by category of group (columns).
+
+    Args:
+        grouped_data (pd.DataFrame): The sums, with columns 0 and 1.
+        group (str): The name of the binary grouped variable.
+        x_variable (str): The name of the x-axis variable.
+        y_variable (str): The name of the y-axis variable.
+        output (str): The name of the output file.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import MaxNLocator
 
     # Create the line plot
     LOGGER.debug("Creating line plot")
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(grouped_data.index, grouped_data[1],
              label=group + ' above median')
     plt.plot(grouped_data.index, grouped_data[0],
@@ -73,17 +104,17 @@ def draw_lineplot(csv_file_path, group, x_variable, y_variable, output):
 
     # Saving the plot
     LOGGER.debug("Saving the plot")
-    plt.savefig("../results/" + output)
+    plt.savefig(output)
 
-    # Display the plot
-    LOGGER.debug("Showing Line Plot")
-    plt.show()
+    # Close the figure, so that many plots can be drawn in one process
+    plt.close(fig)
 
 
-def main(csvfile: str, group, x_variable, y_variable, output):
+def main(csvfile: str, group, x_variable, y_variable, output,
+         summary=False):
     LOGGER.info('Drawing line plot')
     draw_lineplot(csvfile, group=group, x_variable=x_variable,
-                  y_variable=y_variable, output=output)
+                  y_variable=y_variable, output=output, summary=summary)
     LOGGER.info('Line plot finished')
 
 
@@ -99,7 +130,11 @@ if __name__ == "__main__":
                         help='The y variable for the line plot')
     parser.add_argument('-o', '--output', type=str,
                         help='The output name for the line plot')
+    parser.add_argument('--summary', action='store_true',
+                        help='The dataset is the lines summary')
     args = parser.parse_args()
     LOGGER = setup_logger(args.group)
+    # set plot params
+    set_plot_params("../configuration_plots.yaml")
     main(args.csvfile, args.group, args.x_variable,
-         args.y_variable, args.output)
+         args.y_variable, args.output, args.summary)
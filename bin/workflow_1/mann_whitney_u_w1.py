@@ -1,7 +1,26 @@
+from bin.io_utils import read_processed, write_processed
+from bin.results_store import cached_test
 import pandas as pd
-from scipy.stats import mannwhitneyu
+import numpy as np
+import concurrent.futures
+import collections
+import contextlib
+import functools
+import itertools
 import argparse
 import logging
+import math
+import os
+
+
+LOGGER = logging.getLogger(__name__)
+# as scipy.stats.mannwhitneyu with method='auto': exact p-values when
+# one of the samples is at most this size and there are no ties
+EXACT_MAX_SIZE = 8
+# permutation mode: the labels are permuted across the units (countries)
+UNIT = 'location'
+# tolerance on the comparison of the permuted and observed statistics
+TOLERANCE = 1e-12
 
 
 # set logging
@@ -13,23 +32,29 @@ def setup_logger(x_variable):
 
 
 def mann_whitney_u_test(file_path, x_variable,
-                        y_variable, output, LOGGER):
+                        y_variable, output, LOGGER, store=None):
     """
     Runs the Mann-Whitney U test on the data in the specified file.
 
     Args:
-        file_path (str): The path to the CSV file containing the data.
+        file_path (str or pd.DataFrame): The path to the CSV (or parquet)
+                                         file containing the data,
+                                         or the data.
         logger (bool): if True a logger is created
+        store (str, optional): path of the results store: the result is
+                               read from it if the data and parameters
+                               have not changed, saved in it otherwise
 
     Returns:
         float: The U-statistic of the Mann-Whitney U test.
         float: The p-value of the Mann-Whitney U test.
     """
+    from scipy.stats import mannwhitneyu
 
     try:
         # Load the data
         LOGGER.debug("Loading data from CSV file")
-        df = pd.read_csv(file_path)
+        df = read_processed(file_path, columns=[x_variable, y_variable])
     except pd.errors.EmptyDataError:
         LOGGER.error(f"CSV file is empty: {file_path}")
         raise ValueError(f"CSV file is empty: {file_path}")
@@ -44,7 +69,7 @@ def mann_whitney_u_test(file_path, x_variable,
         LOGGER.error(f"Missing columns in CSV file: {missing_cols}")
         raise KeyError(f"Missing columns in CSV file: {missing_cols}")
 
-    try:
+    def run():
         # Perform the Mann-Whitney U test
         LOGGER.debug("Extracting values from DataFrame")
         group1 = df[df[x_variable] == 1][y_variable]
@@ -53,6 +78,20 @@ def mann_whitney_u_test(file_path, x_variable,
         LOGGER.debug(f"Running Mann-Whitney U test on \
             {x_variable} and {y_variable}")
         u_statistic, p_value = mannwhitneyu(group1, group0)
+        return {'statistic': u_statistic, 'pvalue': p_value,
+                'n1': len(group1), 'n2': len(group0),
+                'significant': p_value < 0.05}
+
+    try:
+        if store:
+            result = cached_test(
+                store, 'mannwhitneyu', df[[x_variable, y_variable]],
+                {'x_variable': x_variable, 'y_variable': y_variable,
+                 'alpha': 0.05}, run, output)
+            LOGGER.debug(f"Cached result: {result['cached']}")
+        else:
+            result = run()
+        u_statistic, p_value = result['statistic'], result['pvalue']
         LOGGER.debug(f"U-statistic: {u_statistic:.2f}")
         LOGGER.debug(f"p-value: {p_value:.4f}")
     except Exception as e:
@@ -72,11 +111,469 @@ def mann_whitney_u_test(file_path, x_variable,
     return u_statistic, p_value
 
 
-def main(csvfile: str, x_col: str, y_col: str, output: str):
+@functools.lru_cache(maxsize=None)
+def exact_sf(n1, n2):
+    """Helper function for mann_whitney_u_batch.
+    The function returns the survival function P(U >= u), u = 0..n1*n2,
+    of the U statistic of two samples of sizes n1 and n2 without ties
+    under the null hypothesis. The frequencies of U are the
+    coefficients of the Gaussian binomial coefficient (n1 + n2, n1),
+    computed with exact integers.
+
+    Args:
+        n1 (int): size of the first sample
+        n2 (int): size of the second sample
+
+    Returns:
+        np.ndarray
+    """
+    m, n = sorted((n1, n2))
+    counts = [1]
+    for i in range(1, m + 1):
+        # multiply by (1 - q^(n+i)) and divide by (1 - q^i)
+        counts = counts + [0] * (n + i)
+        for k in range(len(counts) - 1, n + i - 1, -1):
+            counts[k] -= counts[k - n - i]
+        for k in range(i, len(counts)):
+            counts[k] += counts[k - i]
+        counts = counts[:len(counts) - i]
+    total = sum(counts)
+    tails = list(itertools.accumulate(reversed(counts)))[::-1]
+    return np.array([tail / total for tail in tails])
+
+
+def mann_whitney_u_batch(data, keys, x_variable, y_variable, method='auto'):
+    """
+    Runs the Mann-Whitney U test (two-sided) of y_variable between the
+    rows with x_variable equal to 1 and to 0 for every group of keys
+    at once, e.g. on the long table of the sweep of dataprocessing_w1.
+    The values of all the groups are ranked with one sort, the statistics
+    are summed per group, so the results match scipy.stats.mannwhitneyu
+    (U statistic of the first group, asymptotic p-value with tie and
+    continuity correction, exact p-value for small samples without ties)
+    without one call per test.
+
+    Args:
+        data (str or pd.DataFrame): The path to the CSV (or parquet)
+                                    file containing the data, or the data.
+        keys (list): columns defining the groups
+        x_variable (str): The binary grouped variable.
+        y_variable (str or list): The y variable for the test. With a
+                                  list, the test is run for each of them
+                                  and 'outcome' is added to the keys.
+        method (str): 'auto', 'asymptotic' or 'exact', as in scipy
+
+    Raises:
+        KeyError: when columns are missing
+        ValueError: when the method is not valid
+
+    Returns:
+        pd.DataFrame: indexed by keys, with the sizes of the groups
+                      (n1, n0), the U-statistic and the p-value.
+    """
+    from scipy.special import ndtr
+
+    if method not in ('auto', 'asymptotic', 'exact'):
+        raise ValueError(f"Invalid method: {method}")
+    keys = list(keys)
+    y_variables = [y_variable] if isinstance(y_variable, str) \
+        else list(y_variable)
+    columns = keys + [x_variable] + y_variables
+    df = read_processed(data, columns=columns)
+    missing_cols = [col for col in columns if col not in df.columns]
+    if missing_cols:
+        LOGGER.error(f"Missing columns in CSV file: {missing_cols}")
+        raise KeyError(f"Missing columns in CSV file: {missing_cols}")
+    if not isinstance(y_variable, str):
+        df = df.melt(id_vars=keys + [x_variable], value_vars=y_variables,
+                     var_name='outcome', value_name='value')
+        keys, y_variable = keys + ['outcome'], 'value'
+    df = df[df[x_variable].isin([0, 1])].dropna(subset=keys)
+
+    LOGGER.debug("Ranking the values of all the groups")
+    grouped = df.groupby(keys, observed=True)
+    index = grouped.size().index
+    n_groups = len(index)
+    codes = grouped.ngroup().to_numpy()
+    y = df[y_variable].to_numpy(dtype='float64')
+    first = (df[x_variable] == 1).to_numpy()
+    # as scipy (nan_policy='propagate'), groups with NaN give NaN
+    has_nan = np.bincount(codes[np.isnan(y)], minlength=n_groups) > 0
+    order = np.lexsort((y, codes))
+    codes, y, first = codes[order], y[order], first[order]
+    n = np.bincount(codes, minlength=n_groups)
+    n1 = np.bincount(codes, weights=first, minlength=n_groups)
+    n2 = n - n1
+    group_start = np.cumsum(n) - n
+    # runs of tied values, with their average rank within the group
+    new_run = np.ones(len(y), dtype=bool)
+    new_run[1:] = (codes[1:] != codes[:-1]) | (y[1:] != y[:-1])
+    run_start = np.flatnonzero(new_run)
+    run_size = np.diff(np.append(run_start, len(y))).astype('float64')
+    run_codes = codes[run_start]
+    run_rank = run_start - group_start[run_codes] + (run_size + 1) / 2
+    ranks = run_rank[np.cumsum(new_run) - 1]
+
+    LOGGER.debug("Computing the statistics")
+    r1 = np.bincount(codes, weights=ranks * first, minlength=n_groups)
+    u1 = r1 - n1 * (n1 + 1) / 2
+    u = np.maximum(u1, n1 * n2 - u1)
+    tie_term = np.bincount(run_codes, weights=run_size**3 - run_size,
+                           minlength=n_groups)
+    ties = tie_term > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+        z = (u - n1 * n2 / 2 - 0.5) / s
+    p_value = 2 * ndtr(-z)
+    if method == 'auto':
+        exact = (np.minimum(n1, n2) <= EXACT_MAX_SIZE) & ~ties
+    else:
+        exact = np.full(n_groups, method == 'exact')
+    exact &= (n1 > 0) & (n2 > 0)
+    # one exact distribution per pair of sample sizes
+    for size1, size2 in set(zip(n1[exact], n2[exact])):
+        selected = exact & (n1 == size1) & (n2 == size2)
+        # as scipy, a statistic with ties (x.5) is truncated
+        p_value[selected] = 2 * exact_sf(int(size1), int(size2))[
+            u[selected].astype(int)]
+    p_value = np.clip(p_value, 0, 1)
+    invalid = has_nan | (n1 == 0) | (n2 == 0)
+    u1[invalid] = np.nan
+    p_value[invalid] = np.nan
+    LOGGER.debug(f"Ran {n_groups} Mann-Whitney U tests")
+    return pd.DataFrame({'n1': n1.astype(int), 'n0': n2.astype(int),
+                         'u_statistic': u1, 'p_value': p_value},
+                        index=index)
+
+
+def unit_rank_sums(df, x_variable, y_variable, unit=UNIT):
+    """Helper function for the permutation tests.
+    The function ranks y_variable over all the rows and sums the ranks
+    and the rows of each unit, with the label (x_variable) of the unit.
+
+    Args:
+        df (pd.DataFrame): rows of one test
+        x_variable (str): The binary grouped variable.
+        y_variable (str): The y variable for the test.
+        unit (str): column of the units whose labels are permuted
+
+    Raises:
+        ValueError: when the label is not constant within a unit
+
+    Returns:
+        tuple: rank sums, numbers of rows and labels of the units
+    """
+    df = df.dropna(subset=[y_variable])
+    ranks = df[y_variable].rank(method='average')
+    grouped = pd.DataFrame({'unit': df[unit], 'rank': ranks,
+                            'label': df[x_variable]}).groupby(
+                                'unit', observed=True)
+    labels = grouped['label'].agg(['min', 'max'])
+    if (labels['min'] != labels['max']).any():
+        raise ValueError(f"{x_variable} is not constant within each {unit}")
+    return (grouped['rank'].sum().to_numpy(),
+            grouped.size().to_numpy(dtype='float64'),
+            (labels['min'] == 1).to_numpy(dtype='float64'))
+
+
+def auc_distance(labels, rank_sums, sizes):
+    """Helper function for the permutation tests.
+    The function returns the statistic of the test for each row of
+    labels: the distance from 1/2 of U / (n1 * n0), with U the
+    Mann-Whitney U statistic of the rows of the units labelled 1.
+    The statistic does not depend on the number of rows of the group,
+    which changes with the permutation of the units.
+
+    Args:
+        labels (np.ndarray): labels of the units, one row per permutation
+        rank_sums (np.ndarray): rank sums of the units
+        sizes (np.ndarray): numbers of rows of the units
+
+    Returns:
+        np.ndarray
+    """
+    n1 = labels @ sizes
+    n0 = sizes.sum() - n1
+    u1 = labels @ rank_sums - n1 * (n1 + 1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.abs(u1 / (n1 * n0) - 0.5)
+
+
+def permutation_batch(rank_sums, sizes, labels, observed, seed, batch_size):
+    """Helper function for permutation_test (run in the workers).
+    The function draws batch_size permutations of the labels of the
+    units with the generator seeded by seed and counts the statistics
+    at least as extreme as observed.
+
+    Returns:
+        int
+    """
+    rng = np.random.default_rng(seed)
+    permuted = rng.permuted(np.tile(labels, (batch_size, 1)), axis=1)
+    statistics = auc_distance(permuted, rank_sums, sizes)
+    return int((statistics >= observed - TOLERANCE).sum())
+
+
+def is_settled(count, n_done, alpha, confidence):
+    """Helper function for permutation_test.
+    The function checks whether the decision at level alpha is settled:
+    the Clopper-Pearson interval of the p-value, estimated by count
+    extreme statistics over n_done permutations, excludes alpha.
+
+    Returns:
+        bool
+    """
+    from scipy.stats import beta
+    tail = (1 - confidence) / 2
+    lower = beta.ppf(tail, count, n_done - count + 1) if count > 0 else 0
+    upper = beta.ppf(1 - tail, count + 1, n_done - count) \
+        if count < n_done else 1
+    return lower > alpha or upper < alpha
+
+
+def get_executor(workers):
+    """Helper function for the permutation tests.
+    The function returns a pool of workers processes as a context
+    manager, or a context giving None (no pool) for one worker."""
+    if workers > 1:
+        return concurrent.futures.ProcessPoolExecutor(workers)
+    return contextlib.nullcontext()
+
+
+def submit_lazily(executor, function, args, max_pending):
+    """Helper function for permutation_test.
+    The function yields the results of function on each tuple of args,
+    in order. The calls are submitted to executor lazily, at most
+    max_pending of them not yet yielded; the pending ones are cancelled
+    when the generator is closed (e.g. after an early stop)."""
+    pending = collections.deque()
+    args = iter(args)
+    try:
+        while True:
+            for arg in itertools.islice(args, max_pending - len(pending)):
+                pending.append(executor.submit(function, *arg))
+            if not pending:
+                return
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def permutation_test(data, x_variable, y_variable, unit=UNIT,
+                     n_permutations=9999, batch_size=500, seed=0,
+                     alpha=0.05, confidence=0.99, executor=None,
+                     max_pending=None):
+    """
+    Runs a permutation test of y_variable between the rows with
+    x_variable equal to 1 and to 0, permuting the labels of the units
+    (countries) instead of the rows, as the rows of a unit are repeated
+    observations. The statistic is the distance from 1/2 of the
+    Mann-Whitney U statistic over n1 * n0 (two-sided).
+    When the assignments of the labels are at most n_permutations, all
+    of them are enumerated (exact p-value). Otherwise the permutations
+    are drawn in vectorized batches (with executor, e.g. a process pool,
+    if given), each batch with its own seed spawned from seed, so that
+    the result depends only on seed. The test stops early, after the
+    first batch at which the decision at level alpha is settled: the
+    batches are submitted to executor a few at a time (max_pending), so
+    that the ones after the stop are not run.
+
+    Args:
+        data (str or pd.DataFrame): The path to the CSV (or parquet)
+                                    file containing the data, or the data.
+        x_variable (str): The binary grouped variable.
+        y_variable (str): The y variable for the test.
+        unit (str): column of the units whose labels are permuted
+        n_permutations (int): maximum number of permutations
+        batch_size (int): permutations per batch
+        seed (int or list): seed of the permutations
+        alpha (float): significance level of the decision
+        confidence (float): confidence of the early stopping
+        executor (concurrent.futures.Executor, optional): to run the
+                                                          batches
+        max_pending (int, optional): batches submitted to executor and
+                                     not yet used, defaults to the
+                                     number of CPUs
+
+    Raises:
+        KeyError: when columns are missing
+        ValueError: when the label is not constant within a unit
+
+    Returns:
+        float: The statistic of the test.
+        float: The p-value of the test.
+        int: The number of permutations (assignments if exact).
+    """
+    columns = [unit, x_variable, y_variable]
+    df = read_processed(data, columns=columns)
+    missing_cols = [col for col in columns if col not in df.columns]
+    if missing_cols:
+        LOGGER.error(f"Missing columns in CSV file: {missing_cols}")
+        raise KeyError(f"Missing columns in CSV file: {missing_cols}")
+    rank_sums, sizes, labels = unit_rank_sums(df, x_variable, y_variable,
+                                              unit)
+    observed = auc_distance(labels, rank_sums, sizes)
+    n_units, n_labelled = len(labels), int(labels.sum())
+    if n_labelled in (0, n_units):
+        return np.nan, np.nan, 0
+    n_assignments = math.comb(n_units, n_labelled)
+    if n_assignments <= n_permutations:
+        LOGGER.debug(f"Exact test over {n_assignments} assignments")
+        assignments = np.zeros((n_assignments, n_units))
+        for row, selected in enumerate(
+                itertools.combinations(range(n_units), n_labelled)):
+            assignments[row, list(selected)] = 1
+        statistics = auc_distance(assignments, rank_sums, sizes)
+        count = int((statistics >= observed - TOLERANCE).sum())
+        return observed, count / n_assignments, n_assignments
+
+    n_batches = math.ceil(n_permutations / batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_batches)
+    sizes_batches = [min(batch_size, n_permutations - i * batch_size)
+                     for i in range(n_batches)]
+    args = [(rank_sums, sizes, labels, observed, batch_seed, size)
+            for batch_seed, size in zip(seeds, sizes_batches)]
+    if executor is None:
+        counts = (permutation_batch(*arg) for arg in args)
+    else:
+        counts = submit_lazily(executor, permutation_batch, args,
+                               max_pending or os.cpu_count() or 1)
+    # the batches are used in order, so the result does not depend
+    # on the number of workers
+    count, n_done = 0, 0
+    with contextlib.closing(counts):
+        for size, batch_count in zip(sizes_batches, counts):
+            count, n_done = count + batch_count, n_done + size
+            if is_settled(count, n_done, alpha, confidence):
+                LOGGER.debug(f"Stopped after {n_done} permutations")
+                break
+    return observed, (count + 1) / (n_done + 1), n_done
+
+
+def permutation_test_result(data, x_variable, y_variable, output,
+                            n_permutations=9999, seed=0, workers=1,
+                            store=None):
+    """
+    Runs permutation_test (through the results store, if given) and
+    writes its significance at level 0.05 ("True" or "False") to output,
+    as mann_whitney_u_test.
+
+    Args:
+        data (str or pd.DataFrame): The path to the CSV (or parquet)
+                                    file containing the data, or the data.
+        x_variable (str): The binary grouped variable.
+        y_variable (str): The y variable for the test.
+        output (str): The name of the output file.
+        n_permutations (int): maximum number of permutations
+        seed (int): seed of the permutations
+        workers (int): number of processes for the permutations
+        store (str, optional): path of the results store
+
+    Returns:
+        float: The statistic of the test.
+        float: The p-value of the test.
+    """
+    df = read_processed(data, columns=[UNIT, x_variable, y_variable])
+
+    def run():
+        with get_executor(workers) as executor:
+            statistic, p_value, _ = permutation_test(
+                df, x_variable, y_variable, n_permutations=n_permutations,
+                seed=seed, executor=executor, max_pending=workers)
+        # sizes in units (countries), whose labels are permuted
+        labels = df.groupby(UNIT, observed=True)[x_variable].first()
+        return {'statistic': statistic, 'pvalue': p_value,
+                'n1': (labels == 1).sum(), 'n2': (labels == 0).sum(),
+                'significant': p_value < 0.05}
+
+    if store:
+        result = cached_test(
+            store, 'permutation', df,
+            {'x_variable': x_variable, 'y_variable': y_variable,
+             'unit': UNIT, 'n_permutations': n_permutations, 'seed': seed,
+             'alpha': 0.05}, run, output)
+    else:
+        result = run()
+    with open(output, "w") as file:
+        file.write("True" if result['pvalue'] < 0.05 else "False")
+    return result['statistic'], result['pvalue']
+
+
+def permutation_test_batch(data, keys, x_variable, y_variable, unit=UNIT,
+                           n_permutations=9999, seed=0, workers=1,
+                           **kwargs):
+    """
+    Runs permutation_test for every group of keys, e.g. on the long
+    table of the sweep of dataprocessing_w1, with one pool of workers
+    for all the tests. The permutations of each test are seeded by
+    seed and the number of the group.
+
+    Args:
+        data (str or pd.DataFrame): The path to the CSV (or parquet)
+                                    file containing the data, or the data.
+        keys (list): columns defining the groups
+        x_variable (str): The binary grouped variable.
+        y_variable (str or list): The y variable for the test. With a
+                                  list, the test is run for each of them
+                                  and 'outcome' is added to the keys.
+        unit (str): column of the units whose labels are permuted
+        n_permutations (int): maximum number of permutations per test
+        seed (int): seed of the permutations
+        workers (int): number of processes (1: no pool)
+        **kwargs: other arguments of permutation_test
+
+    Returns:
+        pd.DataFrame: indexed by keys, with the statistic, the p-value
+                      and the number of permutations of each test.
+    """
+    keys = list(keys)
+    y_variables = [y_variable] if isinstance(y_variable, str) \
+        else list(y_variable)
+    df = read_processed(data, columns=keys + [unit, x_variable]
+                        + y_variables)
+    if not isinstance(y_variable, str):
+        df = df.melt(id_vars=keys + [unit, x_variable],
+                     value_vars=y_variables, var_name='outcome',
+                     value_name='value')
+        keys, y_variable = keys + ['outcome'], 'value'
+    grouped = df.groupby(keys, observed=True)
+    with get_executor(workers) as executor:
+        results = [permutation_test(group, x_variable, y_variable, unit,
+                                    n_permutations, seed=[seed, number],
+                                    executor=executor, max_pending=workers,
+                                    **kwargs)
+                   for number, (_, group) in enumerate(grouped)]
+    LOGGER.debug(f"Ran {len(results)} permutation tests")
+    return pd.DataFrame(results, index=grouped.size().index,
+                        columns=['statistic', 'p_value', 'n_permutations'])
+
+
+def main(csvfile: str, x_col: str, y_col, output: str, keys=None,
+         permutations=0, seed=0, workers=1, store=None):
 
     LOGGER.info('Performing Mann-Whitney U test')
     try:
-        result = mann_whitney_u_test(csvfile, x_col, y_col, output, LOGGER)
+        if keys:
+            # one test per group of keys, the table of results is saved
+            if permutations:
+                results = permutation_test_batch(
+                    csvfile, keys, x_col, y_col,
+                    n_permutations=permutations, seed=seed,
+                    workers=workers)
+            else:
+                results = mann_whitney_u_batch(csvfile, keys, x_col, y_col)
+            write_processed(results, output, index=True)
+            LOGGER.info(f'Mann-Whitney U tests: {len(results)}')
+            return
+        if permutations:
+            result = permutation_test_result(
+                csvfile, x_col, y_col, output, n_permutations=permutations,
+                seed=seed, workers=workers, store=store)
+            LOGGER.info(f'Permutation test result: {result}')
+            return
+        result = mann_whitney_u_test(csvfile, x_col, y_col, output, LOGGER,
+                                     store)
         LOGGER.info(f'Mann-Whitney U test result: {result}')
     except Exception as e:
         LOGGER.error(f'Failed to perform Mann-Whitney U test: {e}')
@@ -89,10 +586,29 @@ if __name__ == "__main__":
     parser.add_argument('csvfile', type=str, help='Path of the dataset')
     parser.add_argument('-x', '--x_variable', type=str,
                         help='The binary grouped variable')
-    parser.add_argument('-y', '--y_variable', type=str,
-                        help='The y variable for the test')
+    parser.add_argument('-y', '--y_variable', type=str, nargs='+',
+                        help='The y variable for the test (one or more \
+                            with --keys)')
+    parser.add_argument('-k', '--keys', type=str, nargs='+', default=None,
+                        help='run one test per group of these columns')
     parser.add_argument('-o', '--output', type=str,
-                        help='The output name for the result .txt file')
+                        help='The output name for the result .txt file \
+                            (a csv or parquet table with --keys)')
+    parser.add_argument('--permutations', type=int, default=0,
+                        help='run the permutation test across the \
+                            countries with at most this number of \
+                            permutations (0: Mann-Whitney U test)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the permutations')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes for the permutations')
+    parser.add_argument('--store', type=str, default=None,
+                        help='results store (SQLite): the result is reused \
+                            if the data and parameters have not changed \
+                            (not with --keys)')
     args = parser.parse_args()
     LOGGER = setup_logger(args.x_variable)
-    main(args.csvfile, args.x_variable, args.y_variable, args.output)
+    y_variable = args.y_variable[0] if len(args.y_variable) == 1 \
+        else args.y_variable
+    main(args.csvfile, args.x_variable, y_variable, args.output, args.keys,
+         args.permutations, args.seed, args.workers, args.store)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+The file provides the plot-ready summaries of the processed dataset of
+workflow 1, saved next to it by the preprocessing (--summaries option
+of dataprocessing_w1.py):
+    - lines: for each group ({factor}_cat), period and category, the
+      sum of each outcome (what the line plot draws)
+    - boxes: for each group, category and outcome, the statistics of
+      the box plot (whiskers, quartiles, median, mean) and its outliers
+      (one row per outlier), as matplotlib.cbook.boxplot_stats.
+The plots are drawn from the summaries (--summary option of
+box_plot_w1.py and line_plot_w1.py), so that their cost does not grow
+with the number of locations and periods.
+The summaries can also be computed chunk by chunk (see
+plot_summaries_chunks): the quartiles are then estimated with mergeable
+quantile sketches (see bin/quantile_sketch.py).
+"""
+from bin.io_utils import read_processed
+from bin.quantile_sketch import KLLSketch, sketch_groups, DEFAULT_K
+import pandas as pd
+import numpy as np
+
+
+SUMMARY_KINDS = ['lines', 'boxes']
+BOX_STATS = ['whislo', 'q1', 'med', 'q3', 'whishi', 'mean']
+# length of the whiskers, in interquartile ranges (as df.boxplot)
+WHIS = 1.5
+
+
+def summary_file(filename, kind):
+    """The function returns the path of the summary of the processed
+    dataset filename, e.g. owid-covid-data_processed_w1.csv ->
+    owid-covid-data_processed_w1_lines.csv.
+
+    Args:
+        filename (str): path of the processed dataset of workflow 1
+        kind (str): one of SUMMARY_KINDS
+
+    Returns:
+        str
+    """
+    stem, extension = str(filename).rstrip('/').rsplit('.', 1)
+    return f'{stem}_{kind}.{extension}'
+
+
+def line_summary(df, groups, outcomes, x_variable='month'):
+    """The function computes the sums of outcomes by x_variable and
+    category of each group.
+
+    Args:
+        df (pd.DataFrame): processed dataset of workflow 1 (with the
+                           index as columns)
+        groups (list): binary categorical columns
+        outcomes (list): outcome columns
+        x_variable (str): period column
+
+    Returns:
+        pd.DataFrame: columns group, x_variable, cat and outcomes
+    """
+    sums = [df.groupby([x_variable, group])[outcomes].sum()
+            .rename_axis([x_variable, 'cat'])
+            for group in groups]
+    summary = pd.concat(sums, keys=groups, names=['group'])
+    return summary.reset_index()
+
+
+def melt_outcomes(df, groups, outcomes):
+    """Helper function for box_summary and box_summary_chunks.
+    The function returns the non-null values of outcomes with their
+    group and category, in a long table.
+
+    Args:
+        df (pd.DataFrame): processed dataset of workflow 1
+        groups (list): binary categorical columns
+        outcomes (list): outcome columns
+
+    Returns:
+        pd.DataFrame: columns group, cat, outcome and value
+    """
+    long = df.melt(id_vars=outcomes, value_vars=groups, var_name='group',
+                   value_name='cat')
+    return long.melt(id_vars=['group', 'cat'], value_vars=outcomes,
+                     var_name='outcome').dropna(subset=['value'])
+
+
+def whiskers(long, quartiles):
+    """Helper function for box_summary and box_summary_chunks.
+    The function splits the values of long between the whiskers
+    (q1 - WHIS * iqr, q3 + WHIS * iqr) of their group, category and
+    outcome: it returns the extreme values inside the whiskers and the
+    outliers.
+
+    Args:
+        long (pd.DataFrame): values (see melt_outcomes)
+        quartiles (pd.DataFrame): columns q1 and q3, indexed by
+                                  group, cat and outcome
+
+    Returns:
+        tuple: (pd.DataFrame with columns low and high, outliers as
+                pd.DataFrame with columns group, cat, outcome and value)
+    """
+    keys = ['group', 'cat', 'outcome']
+    iqr = quartiles['q3'] - quartiles['q1']
+    bounds = pd.DataFrame({'lo': quartiles['q1'] - WHIS * iqr,
+                           'hi': quartiles['q3'] + WHIS * iqr}).reindex(
+        pd.MultiIndex.from_frame(long[keys]))
+    value = long['value'].to_numpy()
+    inside = ((value >= bounds['lo'].to_numpy())
+              & (value <= bounds['hi'].to_numpy()))
+    inner = long['value'].where(inside).groupby(
+        [long[key] for key in keys], observed=True)
+    extremes = pd.DataFrame({'low': inner.min(), 'high': inner.max()})
+    return extremes, long.loc[~inside, keys + ['value']]
+
+
+def finish_box_summary(stats, extremes, fliers):
+    """Helper function for box_summary and box_summary_chunks.
+    The function completes the statistics with the whiskers and
+    returns the boxes summary.
+
+    Args:
+        stats (pd.DataFrame): columns q1, med, q3 and mean, indexed by
+                              group, cat and outcome
+        extremes (pd.DataFrame): columns low and high (see whiskers)
+        fliers (pd.DataFrame): outliers (see whiskers)
+
+    Returns:
+        pd.DataFrame: see box_summary
+    """
+    keys = ['group', 'cat', 'outcome']
+    # the whiskers do not go inside the box
+    stats['whislo'] = np.fmin(extremes['low'], stats['q1'])
+    stats['whishi'] = np.fmax(extremes['high'], stats['q3'])
+    summary = stats[BOX_STATS].stack().rename('value').reset_index()
+    summary = summary.rename(columns={summary.columns[3]: 'stat'})
+    summary = pd.concat([summary, fliers.assign(stat='flier')[
+        summary.columns]], ignore_index=True)
+    return summary.sort_values(keys, kind='stable', ignore_index=True)
+
+
+def box_summary(df, groups, outcomes):
+    """The function computes the box plot statistics of outcomes
+    by category of each group, for all of them at once.
+
+    Args:
+        df (pd.DataFrame): processed dataset of workflow 1
+        groups (list): binary categorical columns
+        outcomes (list): outcome columns
+
+    Returns:
+        pd.DataFrame: columns group, cat, outcome, stat and value, with
+                      one row per statistic in BOX_STATS and one row
+                      per outlier (stat 'flier')
+    """
+    long = melt_outcomes(df, groups, outcomes)
+    grouped = long.groupby(['group', 'cat', 'outcome'])['value']
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'med', 'q3']
+    stats['mean'] = grouped.mean()
+    extremes, fliers = whiskers(long, stats)
+    return finish_box_summary(stats, extremes, fliers)
+
+
+def box_summary_chunks(read_chunks, groups, outcomes, k=DEFAULT_K, seed=0):
+    """The function computes the box plot statistics of box_summary on
+    data read chunk by chunk, in two passes: the quartiles are estimated
+    by merging the quantile sketches of the chunks (rank error
+    error_bound(k), exact for groups of at most k + 1 values),
+    then the whiskers and the outliers are found chunk by chunk.
+    The sketches of each chunk have their own seed (seed and the number
+    of the chunk), so that the errors of the chunks are independent.
+
+    Args:
+        read_chunks (callable): returns a new iterator over the chunks
+                                of the processed dataset of workflow 1
+        groups (list): binary categorical columns
+        outcomes (list): outcome columns
+        k (int): size of the quantile sketches
+        seed (int): seed of the compactions
+
+    Returns:
+        pd.DataFrame: see box_summary
+    """
+    keys = ['group', 'cat', 'outcome']
+    sketches, sums = {}, []
+    for number, chunk in enumerate(read_chunks()):
+        long = melt_outcomes(chunk, groups, outcomes)
+        for key, sketch in sketch_groups(long, keys, 'value', k,
+                                         seed=[seed, number]).items():
+            sketches.setdefault(key, KLLSketch(k)).merge(sketch)
+        sums.append(long.groupby(keys)['value'].agg(['sum', 'count']))
+    sums = pd.concat(sums).groupby(level=keys).sum()
+    stats = pd.DataFrame.from_dict(
+        {key: sketch.quantile([0.25, 0.5, 0.75])
+         for key, sketch in sketches.items()},
+        orient='index', columns=['q1', 'med', 'q3'])
+    stats.index = pd.MultiIndex.from_tuples(stats.index, names=keys)
+    stats = stats.sort_index()
+    stats['mean'] = sums['sum'] / sums['count']
+    extremes, fliers = [], []
+    for chunk in read_chunks():
+        chunk_extremes, chunk_fliers = whiskers(
+            melt_outcomes(chunk, groups, outcomes), stats)
+        extremes.append(chunk_extremes)
+        fliers.append(chunk_fliers)
+    extremes = pd.concat(extremes).groupby(level=keys).agg(
+        {'low': 'min', 'high': 'max'}).reindex(stats.index)
+    return finish_box_summary(stats, extremes, pd.concat(fliers))
+
+
+def plot_summaries(df, groups, outcomes, x_variable='month'):
+    """The function computes the plot-ready summaries of the processed
+    dataset of workflow 1.
+
+    Args:
+        df (pd.DataFrame): processed dataset of workflow 1
+        groups (list): binary categorical columns
+        outcomes (list): outcome columns
+        x_variable (str): period column of the line plots
+
+    Returns:
+        dict: kind -> summary (pd.DataFrame), for kind in SUMMARY_KINDS
+    """
+    return {'lines': line_summary(df, groups, outcomes, x_variable),
+            'boxes': box_summary(df, groups, outcomes)}
+
+
+def plot_summaries_chunks(read_chunks, groups, outcomes, x_variable='month',
+                          k=DEFAULT_K):
+    """The function computes the plot-ready summaries of the processed
+    dataset of workflow 1 read chunk by chunk (the sums of the chunks
+    are added, the box plot statistics use quantile sketches, see
+    box_summary_chunks).
+
+    Args:
+        read_chunks (callable): returns a new iterator over the chunks
+                                of the processed dataset of workflow 1
+        groups (list): binary categorical columns
+        outcomes (list): outcome columns
+        x_variable (str): period column of the line plots
+        k (int): size of the quantile sketches
+
+    Returns:
+        dict: kind -> summary (pd.DataFrame), for kind in SUMMARY_KINDS
+    """
+    lines = pd.concat([line_summary(chunk, groups, outcomes, x_variable)
+                       for chunk in read_chunks()])
+    lines = lines.groupby(['group', x_variable, 'cat'], observed=True,
+                          sort=False)[outcomes].sum()
+    return {'lines': lines.sort_index().reset_index(),
+            'boxes': box_summary_chunks(read_chunks, groups, outcomes, k)}
+
+
+def read_line_sums(filename, group, x_variable, y_variable):
+    """The function reads the sums of y_variable by x_variable (rows)
+    and category (columns) of group from a lines summary.
+
+    Args:
+        filename (str or pd.DataFrame): lines summary
+        group (str): binary categorical column
+        x_variable (str): period column
+        y_variable (str): outcome column
+
+    Raises:
+        KeyError: when the columns are not in the summary
+
+    Returns:
+        pd.DataFrame
+    """
+    df = read_processed(filename, filters=[('group', '==', group)])
+    missing_cols = [col for col in [x_variable, y_variable]
+                    if col not in df.columns]
+    if missing_cols:
+        raise KeyError(f"Missing columns in summary: {missing_cols}")
+    if isinstance(df[x_variable].dtype, pd.PeriodDtype):
+        df[x_variable] = df[x_variable].astype(str)
+    return df.pivot(index=x_variable, columns='cat', values=y_variable)
+
+
+def read_box_stats(filename, group, y_variable):
+    """The function reads the box plot statistics of y_variable by
+    category of group from a boxes summary, in the format of
+    matplotlib.axes.Axes.bxp.
+
+    Args:
+        filename (str or pd.DataFrame): boxes summary
+        group (str): binary categorical column
+        y_variable (str): outcome column
+
+    Raises:
+        KeyError: when group or y_variable are not in the summary
+
+    Returns:
+        list: one dict per category, sorted by category
+    """
+    df = read_processed(filename, filters=[('group', '==', group),
+                                           ('outcome', '==', y_variable)])
+    if df.empty:
+        raise KeyError(f"Missing columns in summary: {group}, {y_variable}")
+    stats = []
+    for cat, rows in df.groupby('cat', observed=True):
+        values = rows.groupby('stat', observed=True)['value']
+        fliers = values.get_group('flier').to_numpy() \
+            if 'flier' in values.groups else np.array([])
+        stats.append({'label': str(cat), 'fliers': fliers,
+                      **{stat: values.get_group(stat).iloc[0]
+                         for stat in BOX_STATS}})
+    return stats
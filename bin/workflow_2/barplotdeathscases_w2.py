@@ -2,20 +2,20 @@
 """
 The script produces a bar plot for the input outcome
 (either tot deaths or cases) by continent.
+With --normalize the outcome normalized by population is plotted: the
+input is then the output of dataprocessing_w2.py --combined, from which
+the plots of every year and normalization are drawn.
 """
+from bin.workflow_2.dataprocessing_w2 import NORM_SUFFIX
 from bin.utils import set_plot_params
-import pandas as pd
+from bin.io_utils import read_processed, is_supported
 import argparse
 import logging
-import matplotlib.pyplot as plt
 
 
 # Configure logging and constants
-logging.basicConfig(filename=f"./logs/barplotdeathscases_w2.log", filemode="w")
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
-# set plotting params:
-set_plot_params("../configuration_plots.yaml")
 
 
 def label_barplot(ax, ylabel, title):
@@ -50,6 +50,7 @@ def bar_plot(df, x, y, title):
     Returns:
       fig (matplotlib.figure.Figure)
     """
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots()
     df = df.set_index(x)
     df[y].plot(kind="bar", ax=ax, rot=30)
@@ -57,9 +58,48 @@ def bar_plot(df, x, y, title):
     return fig
 
 
-def main(csvfile: str, outfile: str, outcome: str, year: int):
-    if csvfile[-3:] != "csv":
-        message = "Provide a csv file"
+def outcome_column(outcome, normalize=False):
+    """The function returns the column of the processed dataset of W2
+    holding outcome, normalized by population if normalize.
+
+    Args:
+        outcome (str): outcome
+        normalize (bool): if True the normalized outcome
+
+    Returns:
+        str
+    """
+    return f"{outcome}{NORM_SUFFIX}" if normalize else outcome
+
+
+def barplot_by_continent(data_w2, outcome, year, normalize=False):
+    """The function generates the bar plot of outcome
+    by continent for the chosen year.
+
+    Args:
+        data_w2 (pd.DataFrame): processed dataframe of W2 with
+                                columns year, continent and outcome
+                                (or {outcome}_norm if normalize)
+        outcome (str): outcome to plot
+        year (int): year to plot
+        normalize (bool): if True the outcome normalized by population
+                          is plotted
+
+    Returns:
+      fig (matplotlib.figure.Figure)
+    """
+    return bar_plot(
+        data_w2[data_w2.year == year],
+        "continent",
+        outcome_column(outcome, normalize),
+        f"{outcome} by continent ({year})",
+    )
+
+
+def main(csvfile: str, outfile: str, outcome: str, year: int,
+         normalize=False):
+    if not is_supported(csvfile):
+        message = "Provide a csv or parquet file"
         LOGGER.exception(message)
         raise OSError(message)
     if outfile[-3:] != "png":
@@ -70,13 +110,9 @@ def main(csvfile: str, outfile: str, outcome: str, year: int):
         f"Started producing bar plot for outcome: {outcome} \
         and year: {year}"
     )
-    data_w2 = pd.read_csv(csvfile)
-    barplot = bar_plot(
-        data_w2[data_w2.year == year],
-        "continent",
-        f"{outcome}",
-        f"{outcome} by continent ({year})",
-    )
+    column = outcome_column(outcome, normalize)
+    data_w2 = read_processed(csvfile, columns=["year", "continent", column])
+    barplot = barplot_by_continent(data_w2, outcome, year, normalize)
     LOGGER.info("Saving plot")
     barplot.savefig(outfile, bbox_inches="tight")
     LOGGER.info("End")
@@ -94,7 +130,7 @@ if __name__ == "__main__":
         "--processedcsvfile_w2",
         required=True,
         type=str,
-        help="first processed csvfile name",
+        help="processed file name of W2 (csv or parquet)",
     )
     parser.add_argument(
         "-o", "--outfile", required=True, type=str, help="output png file"
@@ -113,5 +149,15 @@ if __name__ == "__main__":
         choices=choices_year,
         help="year to consider for the anlysis.",
     )
+    parser.add_argument(
+        "--normalize",
+        action="store_true",
+        help="plot the outcome normalized by population",
+    )
     args = parser.parse_args()
-    main(args.processedcsvfile_w2, args.outfile, args.outcome, args.year)
+    logging.basicConfig(filename="./logs/barplotdeathscases_w2.log",
+                        filemode="w")
+    # set plotting params:
+    set_plot_params("../configuration_plots.yaml")
+    main(args.processedcsvfile_w2, args.outfile, args.outcome, args.year,
+         args.normalize)
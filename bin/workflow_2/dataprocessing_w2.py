@@ -6,15 +6,21 @@ The second preprocessing focuses in particular on feature engineering.
 In the configuraiton options it is possible to choose the year
 to which the analysis will be restricted
 as well as wehther to normalize_by_pop outcomes values by population.
+The input can be the yearly snapshot of the processed dataset
+(--snapshot), which holds the year-end values already.
+With --combined the output holds, for every year, both the raw and the
+normalized outcomes of each continent (columns {outcome}_norm), so that
+the bar plots of any year and normalization are drawn from it without
+processing the dataset again.
 """
 from bin.outcomes_utils import normalize_column
-import pandas as pd
+from bin.io_utils import read_processed, write_processed, is_supported
+from bin.memory_utils import compact_dtypes
 import argparse
 import logging
 
 
-# set logging and constants
-logging.basicConfig(filename="./logs/dataprocessing_w2.log", filemode="w")
+# set constants
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
 COLUMNS_W2 = [
@@ -25,50 +31,104 @@ COLUMNS_W2 = [
     "total_deaths",
     "population",
 ]
+OUTCOMES_W2 = ["total_cases", "total_deaths"]
+NORM_SUFFIX = "_norm"
 
 
-def process_csvfile_w2(csv_file_path, normalize_by_pop):
+def aggregate_w2(csv_file_path, years=None, compact=False, snapshot=False):
+    """The function aggregates the provided csv by continent and year in
+    a single pass, with both the raw and the normalized outcomes.
+    The outcomes are normalized by population once per location and
+    year (after taking the year-end values), not on every daily row;
+    the normalized outcome of a continent is the sum of the ones of its
+    locations, as in process_csvfile_w2.
+
+        Args:
+        csv_file_path (str or pd.DataFrame): path to the csv or parquet
+                                             file, or the processed
+                                             dataset.
+        years (list, optional): if given, only these years are read.
+                                Defaults to all.
+        compact (bool): if True the compact dtype schema is used
+        snapshot (bool): if True csv_file_path is the yearly snapshot
+                         (see bin/snapshot.py)
+
+        Returns:
+        pd.DataFrame: indexed by year and continent, with columns
+                      OUTCOMES_W2, population and the normalized
+                      outcomes ({outcome}_norm).
+    """
+    filters = [("year", "in", list(years))] if years else None
+    df = read_processed(csv_file_path, columns=COLUMNS_W2, filters=filters)
+    if compact:
+        df = compact_dtypes(df, downcast_floats=False)
+    LOGGER.debug("Taking the year-end values of each location")
+    if snapshot:
+        df = df.drop(columns="location")
+    else:
+        df = df.groupby(["continent", "year", "location"],
+                        observed=True).agg("last")
+    for outcome in OUTCOMES_W2:
+        df[f"{outcome}{NORM_SUFFIX}"] = normalize_column(df[outcome],
+                                                         df["population"])
+    LOGGER.debug("Grouping and aggregating by year")
+    df = df.groupby(["year", "continent"], observed=True).agg("sum")
+    LOGGER.debug(f"Final processed dataset: {df.head()}")
+    return df
+
+
+def process_csvfile_w2(csv_file_path, normalize_by_pop, years=None,
+                       compact=False, snapshot=False):
     """The  function processes the provided csv by generating the
     outcomes of interest for  each continent and by aggregating the data by
     input year.
 
         Args:
-        csv_file_path (str): path to the csv.
+        csv_file_path (str or pd.DataFrame): path to the csv or parquet
+                                             file, or the processed
+                                             dataset.
         normalize_by_pop (bool): if True outcomes are
                                  normalize_by_popd by population
+        years (list, optional): if given, only these years are read
+                                (and the corresponding partitions of
+                                a partitioned dataset). Defaults to all.
+        compact (bool): if True the compact dtype schema is used
+                        (floats are kept as float64, they are summed)
+        snapshot (bool): if True csv_file_path is the yearly snapshot
+                         (see bin/snapshot.py), which is not aggregated
+                         again.
+        The outcomes are normalized with the year-end values of each
+        location (see aggregate_w2).
 
         Returns:
         pd.core.groupby.DataFrameGroupBy: processed df.
     """
-    df = pd.read_csv(csv_file_path, usecols=COLUMNS_W2)
+    df = aggregate_w2(csv_file_path, years, compact, snapshot)
+    norm_columns = [f"{outcome}{NORM_SUFFIX}" for outcome in OUTCOMES_W2]
     if normalize_by_pop:
-        # normalize_by_pop outcomes by population
-        df["total_cases"] = normalize_column(df["total_cases"],
-                                             df["population"])
-        df["total_deaths"] = normalize_column(df["total_deaths"],
-                                              df["population"])
-    LOGGER.debug(f"Datased with normalize_by_popd columns: {df.head()}")
-    # Create outcomes for each continent and year
-    LOGGER.debug("Grouping and aggregating by year")
-    df = df.groupby(["continent", "year", "location"]).agg("last")
-    df = df.groupby(["year", "continent"]).agg("sum")
-    LOGGER.debug(f"Final processed dataset: {df.head()}")
-    return df
+        df[OUTCOMES_W2] = df[norm_columns].to_numpy()
+    return df.drop(columns=norm_columns)
 
 
-def main(csvfile: str, outfile: str, normalize_by_pop=False):
+def main(csvfile: str, outfile: str, normalize_by_pop=False, years=None,
+         compact=False, snapshot=False, combined=False):
     # check correct format of in and out files
-    if (csvfile[-3:] != "csv") or (outfile[-3:] != "csv"):
-        message = "Provide a csv file"
+    if not (is_supported(csvfile) and is_supported(outfile)):
+        message = "Provide a csv or parquet file"
         LOGGER.exception(message)
         raise OSError(message)
-    LOGGER.info(
-        f"Started processing data with \
-        normalize_by_pop by population: {normalize_by_pop}"
-    )
-    df_processed_w2 = process_csvfile_w2(csvfile, normalize_by_pop)
-    LOGGER.info("Saving processed csv")
-    df_processed_w2.to_csv(outfile, index=True)
+    if combined:
+        LOGGER.info("Started processing raw and normalized outcomes")
+        df_processed_w2 = aggregate_w2(csvfile, years, compact, snapshot)
+    else:
+        LOGGER.info(
+            f"Started processing data with \
+            normalize_by_pop by population: {normalize_by_pop}"
+        )
+        df_processed_w2 = process_csvfile_w2(csvfile, normalize_by_pop,
+                                             years, compact, snapshot)
+    LOGGER.info("Saving processed dataset")
+    write_processed(df_processed_w2, outfile, index=True)
     LOGGER.info("End")
 
 
@@ -82,7 +142,7 @@ if __name__ == "__main__":
         "--processedcsvfile",
         required=True,
         type=str,
-        help="first processed csvfile name",
+        help="first processed file name (csv or parquet)",
     )
     parser.add_argument(
         "-o", "--outfile", required=True, type=str, help="output file name"
@@ -95,5 +155,31 @@ if __name__ == "__main__":
         help="if true the outcomes are\
                             normalize_by_popd by population",
     )
+    parser.add_argument(
+        "--years",
+        type=int,
+        nargs="+",
+        default=None,
+        choices=choices_year,
+        help="years to keep, all of them if not given",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="use the compact dtype schema",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="the input is the yearly snapshot of the processed dataset",
+    )
+    parser.add_argument(
+        "--combined",
+        action="store_true",
+        help="save both the raw and the normalized outcomes\
+                            (-n is ignored)",
+    )
     args = parser.parse_args()
-    main(args.processedcsvfile, args.outfile, args.normalize_by_pop)
+    logging.basicConfig(filename="./logs/dataprocessing_w2.log", filemode="w")
+    main(args.processedcsvfile, args.outfile, args.normalize_by_pop,
+         args.years, args.compact, args.snapshot, args.combined)
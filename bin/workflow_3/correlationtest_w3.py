@@ -4,16 +4,37 @@ The script performs a correlation hypothesis test between
 two columns of the input dataset.
 The results of the test are labeled as significant or not basing on
 configurable thresholds for pvalue and correlation absolute value.
+In matrix mode (--matrix) the test is performed on every pair of a set
+of columns at once, for one place or for every place of the output of
+dataprocessing_w3.py --all_places (--all_places), and the results are
+saved as a table (csv or parquet).
+In per-location mode (--by_location) the test of var1 and var2 is
+performed for every location of the first processed dataset, across a
+pool of processes (--workers), and the results are saved as a table.
 '''
+from bin.io_utils import read_processed, write_processed, is_supported
+from bin.workflow_3.dataprocessing_w3 import (read_place, sum_by_location,
+                                              add_deaths_over_cases,
+                                              PLACE_COLUMN)
+from bin.results_store import cached_test
+from bin.snapshot import block_starts
+import multiprocessing
+import concurrent.futures
 import pandas as pd
+import numpy as np
+import itertools
 import logging
 import argparse
-from scipy.stats import spearmanr
 
 
-logging.basicConfig(filename='./logs/correlationtest_w3.log', filemode='w')
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
+CORR_THRESHOLD = 0.85
+PVALUE_THRESHOLD = 0.0
+# minimum number of pairs without NaN of a location (per-location mode)
+MIN_PAIRS = 10
+# columns tested by the worker processes (see init_worker)
+WORKER_DATA = {}
 
 
 def correlation_hptest(var1, var2):
@@ -29,10 +50,241 @@ def correlation_hptest(var1, var2):
     Returns:
         tuple : (p-value, corr coefficient)
     '''
+    from scipy.stats import spearmanr
     res = spearmanr(var1, var2, nan_policy='omit')
     return res.pvalue, res.statistic
 
 
+def group_ranks(df, columns, keys):
+    '''Helper function for spearman_matrix.
+    The function ranks columns within each group of keys (average rank
+    of ties, NaN are kept).'''
+    if keys:
+        return df.groupby(keys, observed=True, sort=False)[columns].rank()
+    return df[columns].rank()
+
+
+def correlation_pvalue(statistic, n):
+    '''Helper function for spearman_matrix and lagscan_w3.py.
+    The function returns the two-sided p-value of the correlation
+    coefficients statistic (Spearman's or Pearson's) of n pairs, from
+    the t distribution with n - 2 degrees of freedom (as
+    scipy.stats.spearmanr and scipy.stats.pearsonr).'''
+    from scipy.special import stdtr
+    dof = np.asarray(n, dtype=float) - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = statistic * np.sqrt(dof / ((1 + statistic) * (1 - statistic)))
+        pvalue = 2 * stdtr(dof, -np.abs(t))
+    return np.where(dof > 0, pvalue, np.nan)
+
+
+def spearman_matrix(df, metrics, by=None):
+    '''The function performs the test of correlation_hptest on every
+    pair of metrics, in every group of by. Each column is ranked once
+    (within each group); a pair is ranked again only on the rows where
+    one of its columns is null and the other is not, so that NaN are
+    discarded pair by pair, as in correlation_hptest. The coefficients
+    of all the pairs and groups are computed from one grouped sum.
+
+    Args:
+        df (pd.DataFrame): data
+        metrics (list): columns to test
+        by (list, optional): grouping columns (e.g. place)
+
+    Raises:
+        ValueError: when the columns are not in df
+
+    Returns:
+        pd.DataFrame: columns by, var1, var2, n (pairs without NaN),
+                      statistic and pvalue, one row per group and pair
+    '''
+    keys = list(by) if by else []
+    missing_cols = [col for col in keys + list(metrics)
+                    if col not in df.columns]
+    if missing_cols:
+        message = f'Variables must be columns of the provided df: \
+            {missing_cols}'
+        LOGGER.exception(message)
+        raise ValueError(message)
+    data = df[keys + list(metrics)].reset_index(drop=True)
+    values = data[list(metrics)].astype(float)
+    valid = values.notna()
+    ranks = group_ranks(data, list(metrics), keys)
+    pairs = list(itertools.combinations(metrics, 2))
+    columns = {}
+    for i, (x, y) in enumerate(pairs):
+        both = valid[x] & valid[y]
+        pair_ranks = []
+        for var in [x, y]:
+            if both.equals(valid[var]):
+                pair_ranks.append(ranks[var])
+            else:
+                pair_ranks.append(group_ranks(
+                    data[keys].assign(**{var: values[var].where(both)}),
+                    [var], keys)[var])
+        rx, ry = (rank.where(both) for rank in pair_ranks)
+        columns.update({(i, 'n'): both.astype(float),
+                        (i, 'sx'): rx, (i, 'sy'): ry,
+                        (i, 'sxx'): rx * rx, (i, 'syy'): ry * ry,
+                        (i, 'sxy'): rx * ry})
+    sums = pd.DataFrame(columns)
+    if keys:
+        sums = sums.groupby([data[key] for key in keys],
+                            observed=True).sum()
+    else:
+        sums = sums.sum().to_frame().T
+    results = []
+    for i, (x, y) in enumerate(pairs):
+        pair = sums[i]
+        n = pair['n']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = pair['sxy'] - pair['sx'] * pair['sy'] / n
+            var_x = pair['sxx'] - pair['sx'] ** 2 / n
+            var_y = pair['syy'] - pair['sy'] ** 2 / n
+            statistic = (cov / np.sqrt(var_x * var_y)).clip(-1, 1)
+        results.append(pd.DataFrame({
+            'var1': x, 'var2': y, 'n': n.astype('int64'),
+            'statistic': statistic,
+            'pvalue': correlation_pvalue(statistic.to_numpy(),
+                                         n.to_numpy())},
+            index=sums.index))
+    results = pd.concat(results)
+    if keys:
+        return results.reset_index()
+    return results.reset_index(drop=True)
+
+
+def pivot_matrix(results, value='statistic'):
+    '''The function returns the square matrix of value (statistic or
+    pvalue) of the results of spearman_matrix for one group, as
+    scipy.stats.spearmanr (1 and 0 on the diagonal).
+
+    Args:
+        results (pd.DataFrame): output of spearman_matrix (one group)
+        value (str): statistic or pvalue
+
+    Returns:
+        pd.DataFrame
+    '''
+    metrics = list(dict.fromkeys(list(results['var1'])
+                                 + list(results['var2'])))
+    matrix = results.pivot(index='var1', columns='var2', values=value) \
+        .reindex(index=metrics, columns=metrics)
+    matrix = matrix.combine_first(matrix.T)
+    diagonal = 1.0 if value == 'statistic' else 0.0
+    for metric in metrics:
+        matrix.loc[metric, metric] = diagonal
+    return matrix.loc[metrics, metrics].rename_axis(index=None, columns=None)
+
+
+def init_worker(var1, var2, min_pairs=MIN_PAIRS):
+    '''The function stores the columns to test in the process (once
+    per worker of the pool, the tasks are then rows offsets).
+
+    Args:
+        var1 (np.ndarray): first variable, rows of each location
+                           contiguous
+        var2 (np.ndarray): second variable
+        min_pairs (int): minimum number of pairs without NaN
+
+    Returns:
+        None.'''
+    WORKER_DATA.update({'var1': var1, 'var2': var2,
+                        'min_pairs': min_pairs})
+
+
+def correlate_rows(bounds):
+    '''Helper function for correlation_by_location (run in the workers).
+    The function performs correlation_hptest on the rows [start, stop)
+    of the columns of init_worker (views, not copies).
+
+    Args:
+        bounds (tuple): (start, stop)
+
+    Returns:
+        tuple: (corr coefficient, p-value, pairs without NaN), NaN
+               coefficient and p-value when the pairs are less than
+               min_pairs
+    '''
+    start, stop = bounds
+    var1 = WORKER_DATA['var1'][start:stop]
+    var2 = WORKER_DATA['var2'][start:stop]
+    n = int((~(np.isnan(var1) | np.isnan(var2))).sum())
+    if n < WORKER_DATA['min_pairs']:
+        return np.nan, np.nan, n
+    pvalue, corr_coeff = correlation_hptest(var1, var2)
+    return float(corr_coeff), float(pvalue), n
+
+
+def get_pool(workers, initargs):
+    '''Helper function for correlation_by_location.
+    The function returns a pool of workers processes initialized with
+    initargs (see init_worker). The processes are forked where
+    possible, so that the columns are shared instead of pickled.'''
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        'fork' if 'fork' in methods else None)
+    return concurrent.futures.ProcessPoolExecutor(
+        workers, mp_context=context, initializer=init_worker,
+        initargs=initargs)
+
+
+def correlation_by_location(filename, var1, var2, corrthr, pvalthr,
+                            time='month', workers=1, min_pairs=MIN_PAIRS):
+    '''The function performs correlation_hptest of var1 and var2 for
+    every location: the processed dataset is read and summed by
+    location and time once, then the rows of each location (contiguous)
+    are tested across a pool of workers processes (in this process if
+    workers is 1). The tasks are the offsets of the rows.
+
+    Args:
+        filename (str or pd.DataFrame): first processed dataset
+        var1 (str): first variable
+        var2 (str): second variable
+        corrthr (float): threshold for correlation
+        pvalthr (float): threshold for pvalue
+        time (str): time period by which data is aggregated
+        workers (int): number of processes
+        min_pairs (int): minimum number of pairs without NaN of a
+                         location (NaN results otherwise)
+
+    Raises:
+        ValueError: when var1 or var2 are not outcomes of workflow 3
+
+    Returns:
+        pd.DataFrame: columns continent, location, statistic, pvalue,
+                      n and significant, one row per location
+    '''
+    df = add_deaths_over_cases(sum_by_location(filename, time)) \
+        .reset_index()
+    if (var1 not in df.columns or var2 not in df.columns):
+        message = 'Variables must be columns of the provided df'
+        LOGGER.exception(message)
+        raise ValueError(message)
+    starts = block_starts(df, ['location'])
+    stops = np.append(starts[1:], len(df))
+    bounds = [(int(start), int(stop)) for start, stop in zip(starts, stops)]
+    initargs = (df[var1].to_numpy(dtype=float),
+                df[var2].to_numpy(dtype=float), min_pairs)
+    LOGGER.info(f'Testing {len(bounds)} locations with {workers} workers')
+    if workers <= 1:
+        init_worker(*initargs)
+        results = [correlate_rows(rows) for rows in bounds]
+    else:
+        with get_pool(workers, initargs) as executor:
+            # chunks of locations per task, to reduce the communication
+            chunksize = max(1, len(bounds) // (4 * workers))
+            results = list(executor.map(correlate_rows, bounds,
+                                        chunksize=chunksize))
+    table = df[['continent', 'location']].iloc[starts].reset_index(
+        drop=True)
+    table[['statistic', 'pvalue', 'n']] = pd.DataFrame(results)
+    table['n'] = table['n'].astype('int64')
+    table['significant'] = ((table['pvalue'] <= pvalthr)
+                            & (table['statistic'] >= corrthr))
+    return table
+
+
 def save_results(outfile, pvalue, coeff, var1, var2):
     ''''The function saves the results of correlation_hptest
         in outfile (.txt).
@@ -74,24 +326,79 @@ def check_results(pvalue, corr_coeff, corrthr, pvalthr):
         pvalthr (float): threshold for pvalue
 
     Returns:
-        None.
+        str: 'True' or 'False', as printed.
     '''
     significance = 'False'
     if ((pvalue <= pvalthr) and (corr_coeff >= corrthr)):
         significance = 'True'
     print(significance)
+    return significance
+
+
+def correlation_result(df, var1, var2, corrthr, pvalthr, store=None,
+                       outfile=None):
+    '''The function runs correlation_hptest on the columns var1 and
+    var2 of df and checks its significance (through the results store,
+    if given: the result is reused if the data and the parameters have
+    not changed).
+
+    Args:
+        df (pd.DataFrame): data
+        var1 (str): first variable
+        var2 (str): second variable
+        corrthr (float): threshold for correlation
+        pvalthr (float): threshold for pvalue
+        store (str, optional): path of the results store
+        outfile (str, optional): output file of the test
+
+    Returns:
+        dict: statistic, pvalue, n1 (pairs without NaN) and
+              significant (bool)'''
+    def run():
+        pvalue, corr_coeff = correlation_hptest(df[var1], df[var2])
+        return {'statistic': corr_coeff, 'pvalue': pvalue,
+                'n1': df[[var1, var2]].notna().all(axis=1).sum(),
+                'significant': (pvalue <= pvalthr
+                                and corr_coeff >= corrthr)}
+
+    if not store:
+        return run()
+    return cached_test(store, 'spearman', df[[var1, var2]],
+                       {'var1': var1, 'var2': var2, 'corrthr': corrthr,
+                        'pvalthr': pvalthr}, run, outfile)
 
 
 def main(csvfile: str, outfile: str,
          var1: str, var2: str, corrthr: float,
-         pvalthr: float):
+         pvalthr: float, store=None, place=None, matrix=None,
+         all_places=False, by_location=False, time='month', workers=1):
     # check correct format of in file
-    if (csvfile[-3:] != 'csv'):
-        message = 'Provide a csv file as infile'
+    if not is_supported(csvfile):
+        message = 'Provide a csv or parquet file as infile'
         LOGGER.exception(message)
         raise OSError(message)
+    if matrix:
+        main_matrix(csvfile, outfile, matrix, corrthr, pvalthr, place,
+                    all_places)
+        return
+    if by_location:
+        if not is_supported(outfile):
+            message = 'Provide a csv or parquet file as outfile'
+            LOGGER.exception(message)
+            raise OSError(message)
+        LOGGER.info(f'Performing correlation hp tests of {var1} and \
+            {var2} by location')
+        results = correlation_by_location(csvfile, var1, var2, corrthr,
+                                          pvalthr, time, workers)
+        LOGGER.info('Saving results')
+        write_processed(results, outfile)
+        LOGGER.info('End')
+        return
     LOGGER.info('Reading data')
-    df = pd.read_csv(csvfile)
+    if place is not None:
+        df = read_place(csvfile, place, columns=[var1, var2])
+    else:
+        df = read_processed(csvfile, columns=[var1, var2])
     # check that var1 and var2 are columns of df
     if (var1 not in df.columns or var2 not in df.columns):
         message = 'Variables must be columns of the provided df'
@@ -99,8 +406,9 @@ def main(csvfile: str, outfile: str,
         raise ValueError(message)
     LOGGER.info(f'Performing correlation hp test with \
         var 1 and 2: {var1}, {var2}')
-    pvalue, corr_coeff = \
-        correlation_hptest(df[var1], df[var2])
+    result = correlation_result(df, var1, var2, corrthr, pvalthr, store,
+                                outfile)
+    pvalue, corr_coeff = result['pvalue'], result['statistic']
     LOGGER.info('Saving results')
     save_results(outfile, pvalue, corr_coeff, var1, var2)
     LOGGER.info('Checking significance of the results')
@@ -108,22 +416,76 @@ def main(csvfile: str, outfile: str,
     LOGGER.info('End')
 
 
+def main_matrix(csvfile, outfile, metrics, corrthr, pvalthr, place=None,
+                all_places=False):
+    '''Helper function for main (matrix mode).
+    The function tests every pair of metrics of csvfile (of every place
+    if all_places) and saves the results with their significance.'''
+    if not is_supported(outfile):
+        message = 'Provide a csv or parquet file as outfile'
+        LOGGER.exception(message)
+        raise OSError(message)
+    LOGGER.info('Reading data')
+    by = [PLACE_COLUMN] if all_places else None
+    if place is not None:
+        df = read_place(csvfile, place, columns=metrics)
+    else:
+        df = read_processed(csvfile, columns=(by or []) + list(metrics))
+    LOGGER.info(f'Performing correlation hp tests of: {metrics}')
+    results = spearman_matrix(df, metrics, by)
+    results['significant'] = ((results['pvalue'] <= pvalthr)
+                              & (results['statistic'] >= corrthr))
+    LOGGER.info('Saving results')
+    write_processed(results, outfile)
+    LOGGER.info('End')
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='The file performs a correlation hp test and states \
             significance of the results')
     parser.add_argument('-i', '--csvfile', required=True,
-                        type=str, help='csvfile name')
+                        type=str, help='csv or parquet file name')
     parser.add_argument('-o', '--outfile', required=True, type=str,
                         help='txt output file name to save results of hp test')
-    parser.add_argument('-v1', '--var1', required=True,
-                        type=str, help='first variable (col of csv)')
-    parser.add_argument('-v2', '--var2', required=True,
-                        type=str, help='second variable (col of csv)')
+    parser.add_argument('-v1', '--var1', type=str, default=None,
+                        help='first variable (col of csv)')
+    parser.add_argument('-v2', '--var2', type=str, default=None,
+                        help='second variable (col of csv)')
     parser.add_argument('--corrthr',
-                        type=float, default=0.85, help='correlation threshold')
+                        type=float, default=CORR_THRESHOLD,
+                        help='correlation threshold')
     parser.add_argument('--pvalthr',
-                        type=float, default=0.0, help='pvalue threshold')
+                        type=float, default=PVALUE_THRESHOLD,
+                        help='pvalue threshold')
+    parser.add_argument('--store', type=str, default=None,
+                        help='results store (SQLite): the result is reused \
+                            if the data and parameters have not changed')
+    parser.add_argument('--place', type=str, default=None,
+                        help='location or continent to test, the input is \
+                            then the output of dataprocessing_w3.py \
+                            --all_places')
+    parser.add_argument('--matrix', type=str, nargs='+', default=None,
+                        help='test every pair of these variables instead \
+                            of var1 and var2, the outfile is a csv or \
+                            parquet table')
+    parser.add_argument('--all_places', action='store_true',
+                        help='with --matrix, test every place of the \
+                            output of dataprocessing_w3.py --all_places')
+    parser.add_argument('--by_location', action='store_true',
+                        help='test var1 and var2 for every location of \
+                            the first processed dataset, the outfile is \
+                            a csv or parquet table')
+    parser.add_argument('--time', type=str, default='month',
+                        choices=['month', 'semester'],
+                        help='with --by_location, time period by which \
+                            data is aggregated')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='with --by_location, number of processes')
     args = parser.parse_args()
+    if args.matrix is None and (args.var1 is None or args.var2 is None):
+        parser.error('-v1 and -v2 are required without --matrix')
+    logging.basicConfig(filename='./logs/correlationtest_w3.log', filemode='w')
     main(args.csvfile, args.outfile, args.var1, args.var2,
-         args.corrthr, args.pvalthr)
+         args.corrthr, args.pvalthr, args.store, args.place, args.matrix,
+         args.all_places, args.by_location, args.time, args.workers)
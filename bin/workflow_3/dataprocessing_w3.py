@@ -4,30 +4,82 @@ The script performs a second processing of the input dataset
 (first processed covid 19 dataset) for Workflow 3.
 The second processing focuses in particular on feature engineering.
 The data can be aggregated either by month or semester.
-The analysis restricts to Europe,
-however it is possibile to restrict it further to Germany.
+The analysis restricts to Europe by default, to Germany (--germany) or
+to any list of locations and continents (--locations, --continents).
+With --all_places the data of every location and every continent is
+aggregated at once, indexed by place: the correlation test and the plots
+then read the rows of one place (read_place, --place option).
 '''
+from bin.io_utils import read_processed, write_processed, is_supported
+from bin.memory_utils import compact_dtypes
 import pandas as pd
 import argparse
 import logging
 
 
-# set logging
-logging.basicConfig(filename='./logs/dataprocessing_w3.log', filemode='w')
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
 COLUMNS_W3 = ['semester', 'month', 'year', 'continent', 'location',
               'new_deaths', 'new_cases', 'new_vaccinations']
+OUTCOMES_W3 = ['new_deaths', 'new_cases', 'new_vaccinations']
+PLACE_COLUMN = 'place'
 
 
-def process_csvfile_w3(filename, time='month', germany=False):
-    '''The function performs a second preprocessing for wprkflow 3.
+def place_label(place):
+    '''The function returns the label of place in the output names,
+    e.g. United States -> united_states.
 
     Args:
-         filename (str): the path to the first
-                        processed csv file
+        place (str): location or continent
+
+    Returns:
+        str
+    '''
+    return place.lower().replace(' ', '_')
+
+
+def check_processed(filename):
+    '''Helper function for process_csvfile_w3 and process_places_w3.
+
+    Args:
+        filename (str or pd.DataFrame): processed dataset
+
+    Raises:
+        ValueError: error when csv hasn't general preprocessing'''
+    if (isinstance(filename, str) and 'processed' not in filename):
+        message = 'The csv must contain the first preprocessed data'
+        LOGGER.exception(message)
+        raise ValueError(message)
+
+
+def add_deaths_over_cases(df):
+    '''Helper function for process_csvfile_w3 and process_places_w3.
+    The function creates the outcome deaths_over_cases.'''
+    df['deaths_over_cases'] = df['new_deaths']/df['new_cases']
+    return df
+
+
+def process_csvfile_w3(filename, time='month', germany=False,
+                       compact=False, locations=None, continents=None):
+    '''The function performs a second preprocessing for wprkflow 3:
+    the outcomes of the chosen places are summed by time.
+
+    Args:
+         filename (str or pd.DataFrame): the path to the first
+                                         processed csv or parquet file,
+                                         or the processed dataset
+         time (str): time period by which data is aggregated
          germany (bool): if True consider just Germany,
                           else consider whole Europe
+         compact (bool): if True the compact dtype schema is used
+                         (floats are kept as float64, they are summed)
+         locations (list, optional): if given, consider just these
+                                     locations (germany is ignored)
+         continents (list, optional): if given, consider just these
+                                      continents (with locations, the
+                                      locations of these continents).
+                                      Defaults to Europe, if no
+                                      locations are given.
 
     Raises:
         ValueError: error when csv hasn't general preprocessing
@@ -36,47 +88,138 @@ def process_csvfile_w3(filename, time='month', germany=False):
         pd.DataFrame
     '''
     # check that the file has first preprocessing:
-    if ('processed' not in filename):
-        message = 'The csv must contain the first preprocessed data'
-        LOGGER.exception(message)
-        raise ValueError(message)
+    check_processed(filename)
+    if locations is None and germany:
+        locations = ['Germany']
+    if continents is None and locations is None:
+        continents = ['Europe']
     # start processing
-    LOGGER.debug('Reading first preprocessed csv')
-    df = pd.read_csv(filename, engine='python', usecols=COLUMNS_W3)
-    df.dropna(inplace=True)
-    cols_to_drop = ['semester', 'month', 'year', 'continent', 'location']
-    cols_to_drop.remove(time)
-    # check wehther restrict to Germany or not
-    if (germany):
-        df = df[df.location == 'Germany']
-        df = df.drop(columns=cols_to_drop)
-        LOGGER.debug(f'Filtered dataset\n: {df.head()}')
-        collapsed_df = df.groupby(time).agg('sum')
-        LOGGER.debug(f'Collapsed by {time} dataset: {collapsed_df.head()}')
-    else:
-        df = df[df.continent == 'Europe']
-        df = df.drop(columns=cols_to_drop)
-        LOGGER.debug(f'Filtered dataset\n: {df.head()}')
-        collapsed_df = df.groupby([time]).agg('sum')
+    LOGGER.debug('Reading first preprocessed dataset')
+    # only the partitions of the continents of a partitioned dataset
+    # are read
+    filters = []
+    if continents:
+        filters.append(('continent', 'in', list(continents)))
+    if locations:
+        filters.append(('location', 'in', list(locations)))
+    df = read_processed(filename, columns=COLUMNS_W3, filters=filters)
+    df = df.dropna()
+    if compact:
+        df = compact_dtypes(df, downcast_floats=False)
+    df = df[[time] + OUTCOMES_W3]
+    LOGGER.debug(f'Filtered dataset\n: {df.head()}')
+    collapsed_df = df.groupby(time).agg('sum')
     LOGGER.debug(f'Collapsed by {time} dataset: {collapsed_df.head()}')
     # create new outcome
-    collapsed_df['deaths_over_cases'] = \
-        collapsed_df['new_deaths']/collapsed_df['new_cases']
+    collapsed_df = add_deaths_over_cases(collapsed_df)
     LOGGER.debug(f'Final processed dataset: {collapsed_df.head()} ')
     return collapsed_df
 
 
-def main(csvfile: str, outfile: str, time: str, germany: bool):
+def sum_by_location(filename, time='month', compact=False):
+    '''Helper function for process_places_w3 and correlationtest_w3.py.
+    The function sums the outcomes by location and time, in one grouped
+    pass: the rows of each location are contiguous.
+
+    Args:
+         filename (str or pd.DataFrame): the path to the first
+                                         processed csv or parquet file,
+                                         or the processed dataset
+         time (str): time period by which data is aggregated
+         compact (bool): if True the compact dtype schema is used
+
+    Raises:
+        ValueError: error when csv hasn't general preprocessing
+
+    Returns:
+        pd.DataFrame: OUTCOMES_W3 indexed by continent, location and
+                      time
+    '''
+    check_processed(filename)
+    LOGGER.debug('Reading first preprocessed dataset')
+    df = read_processed(filename, columns=COLUMNS_W3).dropna()
+    if compact:
+        df = compact_dtypes(df, downcast_floats=False)
+    return df.groupby(['continent', 'location', time],
+                      observed=True)[OUTCOMES_W3].sum()
+
+
+def process_places_w3(filename, time='month', compact=False):
+    '''The function performs the preprocessing of process_csvfile_w3
+    for every location and every continent at once: the outcomes are
+    summed by location and time in one grouped pass, then the sums of
+    the locations are added by continent.
+
+    Args:
+         filename (str or pd.DataFrame): the path to the first
+                                         processed csv or parquet file,
+                                         or the processed dataset
+         time (str): time period by which data is aggregated
+         compact (bool): if True the compact dtype schema is used
+
+    Raises:
+        ValueError: error when csv hasn't general preprocessing
+
+    Returns:
+        pd.DataFrame: indexed by place (location or continent) and
+                      time, the rows of a place are the ones of
+                      process_csvfile_w3 for that place
+    '''
+    by_location = sum_by_location(filename, time, compact)
+    by_continent = by_location.groupby(level=['continent', time],
+                                       observed=True).sum()
+    places = pd.concat([by_location.droplevel('continent'), by_continent])
+    places.index = places.index.set_names([PLACE_COLUMN, time])
+    places = add_deaths_over_cases(places)
+    LOGGER.debug(f'Final processed dataset: {places.head()} ')
+    return places
+
+
+def read_place(filename, place, columns=None):
+    '''The function reads the rows of place from the output of
+    process_places_w3.
+
+    Args:
+        filename (str or pd.DataFrame): output of process_places_w3
+                                        (with the index as columns)
+        place (str): location or continent
+        columns (list, optional): columns to read. Defaults to all.
+
+    Raises:
+        ValueError: error when place is not in filename
+
+    Returns:
+        pd.DataFrame: the rows of place, without the place column
+    '''
+    if columns is not None:
+        columns = [PLACE_COLUMN] + [col for col in columns
+                                    if col != PLACE_COLUMN]
+    df = read_processed(filename, columns=columns,
+                        filters=[(PLACE_COLUMN, '==', place)])
+    if df.empty:
+        message = f'No data for place: {place}'
+        LOGGER.exception(message)
+        raise ValueError(message)
+    return df.drop(columns=PLACE_COLUMN).reset_index(drop=True)
+
+
+def main(csvfile: str, outfile: str, time: str, germany: bool,
+         compact=False, locations=None, continents=None, all_places=False):
     # check correct format of in and out files
-    if ((csvfile[-3:] != 'csv') or (outfile[-3:] != 'csv')):
-        message = 'Provide a csv file'
+    if not (is_supported(csvfile) and is_supported(outfile)):
+        message = 'Provide a csv or parquet file'
         LOGGER.exception(message)
         raise OSError(message)
-    LOGGER.info(f'Started processing data with time:\
-        {time} and place: {germany}')
-    df_processed_w3 = process_csvfile_w3(csvfile, time, germany)
-    LOGGER.info('Saving processed csv')
-    df_processed_w3.to_csv(outfile, index=True)
+    if all_places:
+        LOGGER.info(f'Started processing all the places by {time}')
+        df_processed_w3 = process_places_w3(csvfile, time, compact)
+    else:
+        LOGGER.info(f'Started processing data with time:\
+            {time} and place: {locations or continents or germany}')
+        df_processed_w3 = process_csvfile_w3(csvfile, time, germany,
+                                             compact, locations, continents)
+    LOGGER.info('Saving processed dataset')
+    write_processed(df_processed_w3, outfile, index=True)
     LOGGER.info('End')
 
 
@@ -86,7 +229,8 @@ if __name__ == '__main__':
             steps for Workflow 3')
     choices_time = ['month', 'semester']
     parser.add_argument('-i', '--processedcsvfile', required=True,
-                        type=str, help='first processed csvfile name')
+                        type=str,
+                        help='first processed file name (csv or parquet)')
     parser.add_argument('-o', '--outfile', required=True,
                         type=str, help='output file name')
     parser.add_argument('--time', type=str, default='month',
@@ -94,6 +238,19 @@ if __name__ == '__main__':
                         help='time period by which data is aggregated')
     parser.add_argument('--germany', type=bool, default=False,
                         help='if True analysis is restricted to Germany')
+    parser.add_argument('--compact', action='store_true',
+                        help='use the compact dtype schema')
+    parser.add_argument('--locations', type=str, nargs='+', default=None,
+                        help='locations to consider (--germany is ignored)')
+    parser.add_argument('--continents', type=str, nargs='+', default=None,
+                        help='continents to consider, Europe if neither \
+                            locations nor continents are given')
+    parser.add_argument('--all_places', action='store_true',
+                        help='aggregate every location and continent, \
+                            indexed by place')
     args = parser.parse_args()
+    # set logging
+    logging.basicConfig(filename='./logs/dataprocessing_w3.log', filemode='w')
     main(args.processedcsvfile, args.outfile,
-         args.time, args.germany)
+         args.time, args.germany, args.compact, args.locations,
+         args.continents, args.all_places)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+'''
+The script scans the lagged correlations between the outcomes of
+workflow 3 (e.g. new deaths lag new cases): for every pair of variables
+(var1, var2), every place and every lag k in [-max_lag, max_lag] it
+computes the correlation of var1 at time t with var2 at time t + k,
+and reports the lag of the strongest correlation with its significance.
+The input is the output of dataprocessing_w3.py, of one place or of
+every place (--all_places). The periods missing in a place are
+missing values, so that a lag is always a number of months or
+semesters.
+The correlations of all the lags are computed at once from cross sums
+obtained with the FFT (sum over t of a[t] * b[t + k] for every k) of the
+values, of their squares and of the masks of non-missing values, so
+that the missing values are discarded pair by pair and the coefficient
+of each lag is Pearson's coefficient on the overlapping periods.
+With --ranks the values are replaced by their ranks in the place first
+(a rank correlation robust to outliers, the ranks are not recomputed on
+the overlap of each lag as Spearman's coefficient would).
+The p-value of the best lag is adjusted for the number of scanned lags
+(Bonferroni).
+'''
+from bin.io_utils import read_processed, write_processed, is_supported
+from bin.workflow_3.dataprocessing_w3 import PLACE_COLUMN
+from bin.workflow_3.correlationtest_w3 import correlation_pvalue
+import pandas as pd
+import numpy as np
+import itertools
+import argparse
+import logging
+
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+METRICS_W3 = ['new_deaths', 'new_cases', 'new_vaccinations',
+              'deaths_over_cases']
+DEFAULT_MAX_LAG = 6
+ALPHA = 0.05
+# minimum number of overlapping periods of a lag
+MIN_PERIODS = 3
+# variance (per period, of the standardized values) below which an
+# overlap is constant, up to the round-off of the FFT
+TOLERANCE = 1e-9
+
+
+def time_positions(times):
+    '''Helper function for series_grid.
+    The function returns the position of each period on a regular grid
+    (semesters are integers, months are converted to periods).
+
+    Args:
+        times (pd.Series): time column
+
+    Returns:
+        np.ndarray: positions, starting at 0
+    '''
+    if pd.api.types.is_numeric_dtype(times):
+        ordinals = times.to_numpy(dtype=np.int64)
+    else:
+        ordinals = pd.PeriodIndex(times.astype(str), freq='M').asi8
+    return ordinals - ordinals.min()
+
+
+def series_grid(df, time, metrics, by=None):
+    '''The function arranges the metrics of df as series on a regular
+    grid of periods, one row per group (place).
+
+    Args:
+        df (pd.DataFrame): output of dataprocessing_w3.py (with the
+                           index as columns)
+        time (str): time column
+        metrics (list): metric columns
+        by (list, optional): grouping columns (e.g. place)
+
+    Raises:
+        ValueError: when a group has the same period twice
+
+    Returns:
+        tuple: (pd.DataFrame with the keys of the groups, dict
+                metric -> np.ndarray groups x periods with NaN for the
+                missing periods and values)
+    '''
+    keys = list(by) if by else []
+    if df.duplicated(keys + [time]).any():
+        message = f'Each period must appear once per {keys or "dataset"}'
+        LOGGER.exception(message)
+        raise ValueError(message)
+    positions = time_positions(df[time])
+    if keys:
+        # groups numbered in order of appearance, as drop_duplicates
+        groups = df.groupby(keys, sort=False).ngroup().to_numpy()
+        groups_df = df[keys].drop_duplicates().reset_index(drop=True)
+    else:
+        groups, groups_df = np.zeros(len(df), dtype=np.int64), None
+    shape = (int(groups.max()) + 1 if len(df) else 0,
+             int(positions.max()) + 1 if len(df) else 0)
+    grid = {}
+    for metric in metrics:
+        values = np.full(shape, np.nan)
+        values[groups, positions] = df[metric].to_numpy(dtype=float)
+        # ratios of zero cases are missing values
+        values[~np.isfinite(values)] = np.nan
+        grid[metric] = values
+    return groups_df, grid
+
+
+def standardize(values, ranks=False):
+    '''Helper function for lag_scan.
+    The function standardizes each row of values (or of their ranks)
+    on its non-missing values; the correlations do not change and the
+    cross sums are well conditioned.
+
+    Args:
+        values (np.ndarray): groups x periods
+        ranks (bool): if True the ranks of the values are used
+
+    Returns:
+        np.ndarray
+    '''
+    if ranks:
+        values = pd.DataFrame(values).rank(axis=1).to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nanmean(values, axis=1, keepdims=True)
+        std = np.nanstd(values, axis=1, keepdims=True)
+        return (values - mean) / np.where(std > 0, std, 1)
+
+
+def lag_scan(df, time, metrics=METRICS_W3, max_lag=DEFAULT_MAX_LAG,
+             by=None, ranks=False):
+    '''The function computes the correlation of var1 at time t with
+    var2 at time t + lag, for every pair of metrics (var1, var2), every
+    group of by and every lag in [-max_lag, max_lag].
+
+    Args:
+        df (pd.DataFrame): output of dataprocessing_w3.py (with the
+                           index as columns)
+        time (str): time column (month or semester)
+        metrics (list): metric columns
+        max_lag (int): largest lag, in periods
+        by (list, optional): grouping columns (e.g. place)
+        ranks (bool): if True the values are replaced by their ranks
+
+    Raises:
+        ValueError: when the columns are not in df or max_lag is
+                    negative
+
+    Returns:
+        pd.DataFrame: columns by, var1, var2, lag, n (overlapping
+                      periods), statistic and pvalue (NaN when n is
+                      less than MIN_PERIODS or a variable is constant
+                      on the overlap)
+    '''
+    keys = list(by) if by else []
+    missing_cols = [col for col in keys + [time] + list(metrics)
+                    if col not in df.columns]
+    if missing_cols:
+        message = f'Variables must be columns of the provided df: \
+            {missing_cols}'
+        LOGGER.exception(message)
+        raise ValueError(message)
+    if max_lag < 0:
+        raise ValueError('The largest lag must not be negative')
+    groups_df, grid = series_grid(df, time, metrics, keys)
+    n_periods = next(iter(grid.values())).shape[1]
+    lags = np.arange(-max_lag, max_lag + 1)
+    # zero padding: no circular overlap for the scanned lags
+    size = 1 << int(np.ceil(np.log2(n_periods + max_lag + 1)))
+    spectra = {}
+    for metric in metrics:
+        values = standardize(grid[metric], ranks)
+        mask = ~np.isnan(values)
+        filled = np.where(mask, values, 0)
+        spectra[metric] = [np.fft.rfft(array, size, axis=1)
+                           for array in [mask.astype(float), filled,
+                                         filled * filled]]
+
+    def cross_sums(a, b):
+        # sum over t of a[t] * b[t + lag], for every lag
+        return np.fft.irfft(np.conj(a) * b, size, axis=1)[:, lags % size]
+
+    results = []
+    for x, y in itertools.combinations(metrics, 2):
+        (mx, zx, zxx), (my, zy, zyy) = spectra[x], spectra[y]
+        n = np.rint(cross_sums(mx, my))
+        sx, sy = cross_sums(zx, my), cross_sums(mx, zy)
+        sxx, syy = cross_sums(zxx, my), cross_sums(mx, zyy)
+        sxy = cross_sums(zx, zy)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = sxy - sx * sy / n
+            var_x = sxx - sx ** 2 / n
+            var_y = syy - sy ** 2 / n
+            statistic = np.clip(cov / np.sqrt(var_x * var_y), -1, 1)
+        statistic[(n < MIN_PERIODS) | (var_x <= TOLERANCE * n)
+                  | (var_y <= TOLERANCE * n)] = np.nan
+        pair = pd.DataFrame({
+            'group': np.repeat(np.arange(len(n)), len(lags)),
+            'var1': x, 'var2': y, 'lag': np.tile(lags, len(n)),
+            'n': n.ravel().astype(np.int64),
+            'statistic': statistic.ravel(),
+            'pvalue': correlation_pvalue(statistic.ravel(), n.ravel())})
+        results.append(pair)
+    results = pd.concat(results, ignore_index=True)
+    if keys:
+        results = pd.concat([groups_df.iloc[results.pop('group')]
+                             .reset_index(drop=True), results], axis=1)
+    else:
+        results = results.drop(columns='group')
+    return results
+
+
+def best_lags(scan, alpha=ALPHA):
+    '''The function returns, for every group and pair of the scan, the
+    lag with the largest absolute correlation, with its p-value adjusted
+    for the number of scanned lags (Bonferroni) and its significance.
+
+    Args:
+        scan (pd.DataFrame): output of lag_scan
+        alpha (float): significance level of the adjusted p-value
+
+    Returns:
+        pd.DataFrame: the rows of the best lags, with columns
+                      pvalue_adjusted and significant
+    '''
+    keys = [col for col in scan.columns
+            if col not in ['var1', 'var2', 'lag', 'n', 'statistic',
+                           'pvalue']] + ['var1', 'var2']
+    n_lags = scan.groupby(keys, sort=False)['lag'].transform('size')
+    strength = scan['statistic'].abs()
+    valid = strength.notna()
+    best = strength[valid].groupby([scan.loc[valid, key] for key in keys],
+                                   sort=False).idxmax()
+    best = scan.loc[best.to_numpy()].copy()
+    best['pvalue_adjusted'] = np.minimum(best['pvalue']
+                                         * n_lags[best.index], 1)
+    best['significant'] = best['pvalue_adjusted'] <= alpha
+    return best.reset_index(drop=True)
+
+
+def main(csvfile: str, outfile: str, time: str, metrics=METRICS_W3,
+         max_lag=DEFAULT_MAX_LAG, all_places=False, ranks=False,
+         alpha=ALPHA, scanfile=None):
+    # check correct format of in and out files
+    if not (is_supported(csvfile) and is_supported(outfile)):
+        message = 'Provide a csv or parquet file'
+        LOGGER.exception(message)
+        raise OSError(message)
+    LOGGER.info('Reading data')
+    by = [PLACE_COLUMN] if all_places else None
+    df = read_processed(csvfile, columns=(by or []) + [time]
+                        + list(metrics))
+    LOGGER.info(f'Scanning lags up to {max_lag} of: {metrics}')
+    scan = lag_scan(df, time, metrics, max_lag, by, ranks)
+    if scanfile is not None:
+        LOGGER.info(f'Saving the correlations of every lag: {scanfile}')
+        write_processed(scan, scanfile)
+    LOGGER.info('Saving the best lags')
+    write_processed(best_lags(scan, alpha), outfile)
+    LOGGER.info('End')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='The file scans the lagged correlations between \
+            the outcomes of Workflow 3')
+    parser.add_argument('-i', '--csvfile', required=True, type=str,
+                        help='processed file of W3 (csv or parquet)')
+    parser.add_argument('-o', '--outfile', required=True, type=str,
+                        help='output file of the best lags (csv or parquet)')
+    parser.add_argument('--time', type=str, default='month',
+                        choices=['month', 'semester'],
+                        help='time period by which data is aggregated')
+    parser.add_argument('--metrics', type=str, nargs='+',
+                        default=METRICS_W3, help='variables to correlate')
+    parser.add_argument('--max_lag', type=int, default=DEFAULT_MAX_LAG,
+                        help='largest lag, in periods')
+    parser.add_argument('--all_places', action='store_true',
+                        help='the input is the output of \
+                            dataprocessing_w3.py --all_places')
+    parser.add_argument('--ranks', action='store_true',
+                        help='correlate the ranks of the values')
+    parser.add_argument('--alpha', type=float, default=ALPHA,
+                        help='significance level of the adjusted pvalue')
+    parser.add_argument('--scanfile', type=str, default=None,
+                        help='output file of the correlations of every lag')
+    args = parser.parse_args()
+    logging.basicConfig(filename='./logs/lagscan_w3.log', filemode='w')
+    main(args.csvfile, args.outfile, args.time, args.metrics, args.max_lag,
+         args.all_places, args.ranks, args.alpha, args.scanfile)
@@ -4,18 +4,14 @@ The script produces scatter+regression plot for two columns of a
 given dataframe.
 '''
 from bin.utils import set_plot_params
-import seaborn as sns
-import matplotlib.pyplot as plt
 import logging
-import pandas as pd
+from bin.io_utils import read_processed, is_supported
+from bin.workflow_3.dataprocessing_w3 import read_place
 import argparse
 
 
-logging.basicConfig(filename='./logs/regressionplot_w3.log', filemode='w')
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
-# set plot params
-set_plot_params("../configuration_plots.yaml")
 
 
 def reg_plot(x, y, data, title):
@@ -29,8 +25,11 @@ def reg_plot(x, y, data, title):
     Returns:
         figure (matplotlib.figure.Figure)
     '''
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     fig, ax = plt.subplots()
-    sns.regplot(x=x, y=y, data=data, fit_reg=True, ax=ax)
+    # seeded bootstrap of the confidence band: the same plot every run
+    sns.regplot(x=x, y=y, data=data, fit_reg=True, ax=ax, seed=0)
     ax.set_xlabel(x)
     ax.set_ylabel(y)
     ax.set_title(title)
@@ -38,10 +37,10 @@ def reg_plot(x, y, data, title):
     return fig
 
 
-def main(csvfile: str, outpngfile: str, x: str, y: str):
+def main(csvfile: str, outpngfile: str, x: str, y: str, place=None):
     # check correct format of in and out files
-    if (csvfile[-3:] != 'csv'):
-        message = 'Provide a csv file as infile'
+    if not is_supported(csvfile):
+        message = 'Provide a csv or parquet file as infile'
         LOGGER.exception(message)
         raise OSError(message)
     if (outpngfile[-3:] != 'png'):
@@ -49,7 +48,10 @@ def main(csvfile: str, outpngfile: str, x: str, y: str):
         LOGGER.exception(message)
         raise OSError(message)
     LOGGER.info('Reading data')
-    df = pd.read_csv(csvfile)
+    if place is not None:
+        df = read_place(csvfile, place, columns=[x, y])
+    else:
+        df = read_processed(csvfile, columns=[x, y])
     # check that x and y are existing columns of the input
     if (x not in df.columns or y not in df.columns):
         message = 'x and y must be columns of the provided df'
@@ -68,12 +70,19 @@ if __name__ == '__main__':
         description='The file produces a regression plot between \
         x and y columns of csvfile')
     parser.add_argument('-i', '--csvfile', required=True,
-                        type=str, help='csvfile name')
+                        type=str, help='csv or parquet file name')
     parser.add_argument('-o', '--outpngfile', required=True,
                         type=str, help='output png file name')
     parser.add_argument('-x', '--x', required=True,
                         type=str, help='independent var')
     parser.add_argument('-y', '--y', required=True,
                         type=str, help='dependent var')
+    parser.add_argument('--place', type=str, default=None,
+                        help='location or continent to plot, the input is \
+                            then the output of dataprocessing_w3.py \
+                            --all_places')
     args = parser.parse_args()
-    main(args.csvfile, args.outpngfile, args.x, args.y)
+    logging.basicConfig(filename='./logs/regressionplot_w3.log', filemode='w')
+    # set plot params
+    set_plot_params("../configuration_plots.yaml")
+    main(args.csvfile, args.outpngfile, args.x, args.y, args.place)
@@ -6,18 +6,14 @@ The scales of y1 and y2 are mantained.
 '''
 from bin.utils import set_plot_params
 import logging
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
+from bin.io_utils import read_processed, is_supported
+from bin.workflow_3.dataprocessing_w3 import read_place
 import pandas as pd
 import argparse
 
 
-# set logging
-logging.basicConfig(filename='./logs/trendplots_w3.log', filemode='w')
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
-# set plot params
-set_plot_params("../configuration_plots.yaml")
 
 
 def label_plot_trends(ax1, ax2, xlabel, y1label, y2label, title):
@@ -35,6 +31,8 @@ def label_plot_trends(ax1, ax2, xlabel, y1label, y2label, title):
 
     Returns:
         None.'''
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as ticker
     color1 = 'tab:red'
     # set smart number of xticks, show 11 ticks
     ax1.xaxis.set_major_locator(ticker.MaxNLocator(nbins=10))
@@ -57,11 +55,15 @@ def plot_trends(y1, y2, x):
     Args:
         y1 (pd.Series): first variable
         y2 (pd.Series) : second variable
-        x (pd.Series): variable on x axis
+        x (pd.Series): variable on x axis (periods are
+                       plotted as strings)
 
     Returns:
         fig (matplotlib.figure.Figure).
     '''
+    import matplotlib.pyplot as plt
+    if isinstance(x.dtype, pd.PeriodDtype):
+        x = x.astype(str)
     fig, ax1 = plt.subplots()
     ax1.plot(x, y1, color='tab:red')
     ax2 = ax1.twinx()
@@ -73,10 +75,10 @@ def plot_trends(y1, y2, x):
 
 
 def main(csvfile: str, outpngfile: str, y1: str,
-         y2: str, x: str):
+         y2: str, x: str, place=None):
     # check correct format of in and out files
-    if (csvfile[-3:] != 'csv'):
-        message = 'Provide a csv file as infile'
+    if not is_supported(csvfile):
+        message = 'Provide a csv or parquet file as infile'
         LOGGER.exception(message)
         raise OSError(message)
     if (outpngfile[-3:] != 'png'):
@@ -84,7 +86,10 @@ def main(csvfile: str, outpngfile: str, y1: str,
         LOGGER.exception(message)
         raise OSError(message)
     LOGGER.info('Reading data')
-    df = pd.read_csv(csvfile)
+    if place is not None:
+        df = read_place(csvfile, place, columns=[x, y1, y2])
+    else:
+        df = read_processed(csvfile, columns=[x, y1, y2])
     # check that y1, y2 and x are columns of input
     if any(col not in df.columns for col in [x, y1, y2]):
         message = 'Invalid variables, they are not cols of the input csv'
@@ -102,7 +107,7 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='The file produces a trend plot for y1 vs y2 over x')
     parser.add_argument('-i', '--csvfile', required=True,
-                        type=str, help='csvfile name')
+                        type=str, help='csv or parquet file name')
     parser.add_argument('-o', '--outpngfile',
                         type=str, help='output png file name')
     parser.add_argument('-y1', '--y1', required=True,
@@ -111,6 +116,14 @@ if __name__ == '__main__':
                         type=str, help='second y variable')
     parser.add_argument('-x', '--x',  required=True, type=str,
                         help='x variable')
+    parser.add_argument('--place', type=str, default=None,
+                        help='location or continent to plot, the input is \
+                            then the output of dataprocessing_w3.py \
+                            --all_places')
     args = parser.parse_args()
+    # set logging
+    logging.basicConfig(filename='./logs/trendplots_w3.log', filemode='w')
+    # set plot params
+    set_plot_params("../configuration_plots.yaml")
     main(args.csvfile,
-         args.outpngfile, args.y1, args.y2, args.x)
+         args.outpngfile, args.y1, args.y2, args.x, args.place)